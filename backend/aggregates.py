@@ -0,0 +1,98 @@
+import os
+import sys
+
+import boto3
+from boto3.dynamodb.conditions import Key
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'function'))
+
+# Mismas llaves que escribe la función del stream
+from aggregate_stamps import (
+    AGGREGATE_PK,
+    COMPLETED_SK,
+    HISTOGRAM_SK,
+    SPONSOR_STATS_PREFIX,
+    TOP_SCANNED_SK,
+)
+
+
+def get_table(table_name='communitydaymx24'):
+    dynamodb = boto3.resource('dynamodb')
+    return dynamodb.Table(table_name)
+
+
+def load_aggregates(table):
+    items = []
+    response = table.query(KeyConditionExpression=Key('PK').eq(AGGREGATE_PK))
+    items.extend(response['Items'])
+
+    while 'LastEvaluatedKey' in response:
+        response = table.query(
+            KeyConditionExpression=Key('PK').eq(AGGREGATE_PK),
+            ExclusiveStartKey=response['LastEvaluatedKey']
+        )
+        items.extend(response['Items'])
+
+    return {item['SK']: item for item in items}
+
+
+def get_sponsor_histogram(aggregates):
+    """Return ({sponsors: users}, complete).
+
+    The zero bucket is derived from the profile counter, which only counts
+    profiles the stream saw being created; when fewer profiles than stamped
+    users were counted the bucket is clamped to 0 and complete is False.
+    """
+    histogram_item = aggregates.get(HISTOGRAM_SK, {})
+    histogram = {
+        int(name.rsplit('_', 1)[1]): int(value)
+        for name, value in histogram_item.items()
+        if name.startswith('users_with_')
+    }
+    without_sponsors = int(histogram_item.get('profiles', 0)) - sum(histogram.values())
+    histogram[0] = max(0, without_sponsors)
+    return dict(sorted(histogram.items())), without_sponsors >= 0
+
+
+def get_sponsor_stats(aggregates):
+    return {
+        sk[len(SPONSOR_STATS_PREFIX):]: {
+            'stamps': int(item.get('stamps', 0)),
+            'visitors': int(item.get('visitors', 0)),
+        }
+        for sk, item in aggregates.items()
+        if sk.startswith(SPONSOR_STATS_PREFIX)
+    }
+
+
+def get_completed_users(aggregates):
+    return sorted(aggregates.get(COMPLETED_SK, {}).get('users', set()))
+
+
+def get_top_scanned(aggregates):
+    leaders = aggregates.get(TOP_SCANNED_SK, {}).get('leaders', {})
+    return sorted(
+        ((user_id, int(count)) for user_id, count in leaders.items()),
+        key=lambda leader: leader[1],
+        reverse=True
+    )
+
+
+def get_profiles(table, user_ids):
+    user_ids = list(user_ids)
+    profiles = {}
+
+    for start in range(0, len(user_ids), 100):
+        request = {
+            table.name: {
+                'Keys': [{'PK': f'USER#{user_id}', 'SK': 'PROFILE'} for user_id in user_ids[start:start + 100]],
+                'ProjectionExpression': 'PK, first_name, last_name',
+            }
+        }
+        while request:
+            response = table.meta.client.batch_get_item(RequestItems=request)
+            for item in response['Responses'].get(table.name, []):
+                profiles[item['PK'].split('#', 1)[1]] = item
+            request = response.get('UnprocessedKeys')
+
+    return profiles
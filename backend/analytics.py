@@ -1,28 +1,22 @@
+import argparse
 import boto3
 from boto3.dynamodb.conditions import Key, Attr
 import simplejson as json
 import os
 from datetime import datetime, timedelta
+from aggregates import get_table, load_aggregates, get_top_scanned, get_completed_users, get_profiles
+from scanner import parallel_scan, write_jsonl, read_items
+from profile_index import ProfileIndex
+import snapshot
 
-def scan_dynamo_table():
-    dynamodb = boto3.resource('dynamodb')
+def scan_dynamo_table(segments=4):
     table_name = 'communitydaymx24'
-    table = dynamodb.Table(table_name)
 
-    items = []
-    response = table.scan(
+    return parallel_scan(
+        table_name,
+        total_segments=segments,
         FilterExpression=Attr('PK').begins_with('USER#') & Attr('SK').eq('PROFILE')
     )
-    items.extend(response['Items'])
-
-    while 'LastEvaluatedKey' in response:
-        response = table.scan(
-            FilterExpression=Attr('PK').begins_with('USER#') & Attr('SK').eq('PROFILE'),
-            ExclusiveStartKey=response['LastEvaluatedKey']
-        )
-        items.extend(response['Items'])
-
-    return items
 
 def save_to_file(data, filename):
     with open(filename, 'w') as f:
@@ -38,15 +32,19 @@ def is_file_recent(filename, max_age_hours=24):
     file_time = datetime.fromtimestamp(os.path.getmtime(filename))
     return datetime.now() - file_time < timedelta(hours=max_age_hours)
 
-def get_user_profiles(filename='user_profiles.json', max_age_hours=24):
+def iter_user_profiles(filename='user_profiles.jsonl', max_age_hours=24, segments=4):
     if is_file_recent(filename, max_age_hours):
         print("Loading data from file...")
-        return load_from_file(filename)
     else:
         print("Scanning DynamoDB table...")
-        data = scan_dynamo_table()
-        save_to_file(data, filename)
-        return data
+        write_jsonl(scan_dynamo_table(segments), filename)
+    return read_items(filename)
+
+def get_user_profiles(filename='user_profiles.jsonl', max_age_hours=24, segments=4):
+    return list(iter_user_profiles(filename, max_age_hours, segments))
+
+def get_profile_index(filename='user_profiles.jsonl', max_age_hours=24, segments=4):
+    return ProfileIndex.from_items(iter_user_profiles(filename, max_age_hours, segments))
 
 def get_most_scans(profiles):
     return sorted(profiles, key=lambda x: x.get('scanned_count', 0), reverse=True)
@@ -55,12 +53,57 @@ def save_users_with_completed_passport(profiles, filename='completed_passport_us
     completed_passport_users = [profile for profile in profiles if profile.get('completed_passport', False)]
     save_to_file(completed_passport_users, filename)
 
-# Usage
-user_profiles = get_user_profiles()
-print(f"Total items: {len(user_profiles)}")
+def print_report_from_scan(segments=4):
+    profile_index = get_profile_index(segments=segments)
+    print(f"Total items: {len(profile_index)}")
+
+    print("Most scans:")
+
+    for profile in profile_index.most_scans(10):
+        print(f"\t{profile.full_name} - {profile.scanned_count} scans")
+
+    print(f"Users with completed passport: {len(profile_index.completed_passports())}")
+
+def print_report_from_snapshot(segments=4):
+    with snapshot.get_snapshot(segments=segments) as event_snapshot:
+        profiles = event_snapshot.profiles
+        print(f"Total items: {len(profiles)}")
 
-most_scans = get_most_scans(user_profiles)
-print("Most scans:")
+        print("Most scans:")
 
-for profile in most_scans[:10]:
-    print(f"\t{profile['first_name']} {profile['last_name']} - {profile.get('scanned_count', 0)} scans")
\ No newline at end of file
+        for row in snapshot.get_most_scans(event_snapshot, 10):
+            print(f"\t{profiles.value('first_name', row)} {profiles.value('last_name', row)} - {profiles.value('scanned_count', row)} scans")
+
+        print(f"Users with completed passport: {len(snapshot.get_completed_passport_rows(event_snapshot))}")
+
+def print_report_from_aggregates():
+    table = get_table()
+    aggregates = load_aggregates(table)
+
+    most_scans = get_top_scanned(aggregates)[:10]
+    profiles = get_profiles(table, [user_id for user_id, _ in most_scans])
+    print("Most scans:")
+
+    for user_id, scanned_count in most_scans:
+        profile = profiles.get(user_id, {})
+        print(f"\t{profile.get('first_name', user_id)} {profile.get('last_name', '')} - {scanned_count} scans")
+
+    print(f"Users with completed passport: {len(get_completed_users(aggregates))}")
+
+# Usage
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Attendee scan report')
+    parser.add_argument('--full-scan', action='store_true', help='Scan the whole table (default)')
+    parser.add_argument('--aggregates', action='store_true', help='Read the AGGREGATE items kept by the table stream; they only include changes made after the stream was enabled')
+    parser.add_argument('--snapshot', action='store_true', help='Read the columnar snapshot, rebuilding it when it is older than 24 hours')
+    parser.add_argument('--segments', type=int, default=4, help='Parallel scan segments used with --full-scan and --snapshot')
+    args = parser.parse_args()
+
+    # Los agregados solo reflejan lo que pasó por el stream (no hay backfill), por
+    # eso el scan completo sigue siendo el reporte por defecto
+    if args.aggregates:
+        print_report_from_aggregates()
+    elif args.snapshot:
+        print_report_from_snapshot(args.segments)
+    else:
+        print_report_from_scan(args.segments)
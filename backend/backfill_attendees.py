@@ -0,0 +1,295 @@
+"""Load every attendee of an Eventbrite event into the table.
+
+Pages of the attendee list are fetched concurrently and upserted with the
+same rules as the webhook worker (function/attendees.py): the short_id comes
+from generate_event_code (salted when another attendee already owns the
+code) and initialized profiles are never overwritten.
+Progress is written to a checkpoint file after every saved page, so running
+the command again resumes where an interrupted import stopped. The last page
+is never recorded as saved: a new run fetches it again, together with the
+pages of attendees who registered after the previous run.
+
+Usage:
+    python backfill_attendees.py <event_id> --table communitydaymx24 [--token ... | --secret-name ...]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import requests
+from requests.adapters import HTTPAdapter
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'function'))
+
+from attendees import extract_and_validate_data, save_profiles, send_badges
+from short_ids import ShortIdAllocator, find_short_id_owners, load_existing_short_ids
+
+EVENTBRITE_API = 'https://www.eventbriteapi.com/v3'
+MAX_ATTEMPTS = 8
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 60
+
+
+class PermanentError(Exception):
+    pass
+
+
+class RateLimiter:
+    """Concurrency limit shared by the fetch threads.
+
+    A 429 halves the number of requests in flight and pauses every thread for
+    Retry-After seconds; each run of successful requests lets it grow back by
+    one, up to max_concurrency.
+    """
+
+    def __init__(self, max_concurrency):
+        self.max_concurrency = max_concurrency
+        self.limit = max_concurrency
+        self.active = 0
+        self.successes = 0
+        self.paused_until = 0
+        self.throttled = 0
+        self.condition = threading.Condition()
+
+    def acquire(self):
+        with self.condition:
+            while True:
+                pause = self.paused_until - time.monotonic()
+                if pause > 0:
+                    self.condition.wait(pause)
+                elif self.active < self.limit:
+                    self.active += 1
+                    return
+                else:
+                    self.condition.wait()
+
+    def release(self, response=None):
+        with self.condition:
+            self.active -= 1
+            if response is not None and response.status_code == 429:
+                self.throttled += 1
+                self.successes = 0
+                self.limit = max(1, self.limit // 2)
+                self.pause(retry_after(response))
+            elif response is not None and response.ok:
+                self.successes += 1
+                if self.successes >= self.limit and self.limit < self.max_concurrency:
+                    self.limit += 1
+                    self.successes = 0
+                # Si el API avisa que no quedan llamadas, esperamos al reinicio de la ventana
+                remaining = response.headers.get('X-RateLimit-Remaining')
+                if remaining is not None and int(remaining) <= 0:
+                    self.pause(rate_limit_reset(response))
+            self.condition.notify_all()
+
+    def pause(self, seconds):
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+
+def retry_after(response, default=1.0):
+    try:
+        return min(float(response.headers['Retry-After']), BACKOFF_MAX)
+    except (KeyError, ValueError):
+        return default
+
+
+def rate_limit_reset(response, default=1.0):
+    try:
+        reset = float(response.headers['X-RateLimit-Reset'])
+    except (KeyError, ValueError):
+        return default
+    # Algunos APIs mandan segundos restantes y otros un epoch
+    if reset > 1e9:
+        reset -= time.time()
+    return min(max(reset, 0), BACKOFF_MAX)
+
+
+class Checkpoint:
+    """Pages already saved for an event, persisted as JSON after every page.
+
+    The last page is kept out of the file: it can still grow with new
+    registrations, so it is processed again on the next run. save_profiles is
+    conditional, so saving its attendees twice is safe.
+    """
+
+    def __init__(self, filename, event_id):
+        self.filename = filename
+        self.lock = threading.Lock()
+        self.state = {'event_id': event_id, 'page_count': None, 'done': [], 'saved': 0, 'skipped': 0, 'invalid': 0}
+        if filename and os.path.exists(filename):
+            with open(filename) as f:
+                state = json.load(f)
+            if state.get('event_id') == event_id:
+                self.state = state
+        self.done = set(self.state['done'])
+
+    def mark_done(self, page, saved, skipped, invalid):
+        with self.lock:
+            self.done.add(page)
+            self.state['saved'] += saved
+            self.state['skipped'] += skipped
+            self.state['invalid'] += invalid
+            self.save()
+
+    def save(self):
+        if not self.filename:
+            return
+        self.state['done'] = sorted(page for page in self.done if page < self.state['page_count'])
+        tmp_filename = f'{self.filename}.tmp'
+        with open(tmp_filename, 'w') as f:
+            json.dump(self.state, f)
+        os.replace(tmp_filename, self.filename)
+
+
+class AttendeeClient:
+    def __init__(self, token, api_url=EVENTBRITE_API, concurrency=8):
+        self.api_url = api_url.rstrip('/')
+        self.limiter = RateLimiter(concurrency)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=concurrency)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers.update({'Authorization': f'Bearer {token}', 'Content-Type': 'application/json'})
+
+    def get_page(self, event_id, page):
+        url = f'{self.api_url}/events/{event_id}/attendees/'
+        for attempt in range(MAX_ATTEMPTS):
+            self.limiter.acquire()
+            response = None
+            try:
+                response = self.session.get(url, params={'page': page}, timeout=10)
+            except requests.exceptions.RequestException as e:
+                error = e
+            finally:
+                self.limiter.release(response)
+
+            if response is not None:
+                if response.ok:
+                    return response.json()
+                if response.status_code != 429 and response.status_code < 500:
+                    raise PermanentError(f'Eventbrite answered {response.status_code} for page {page}: {response.text[:200]}')
+                error = f'HTTP {response.status_code}'
+                if response.status_code == 429:
+                    # El limiter ya pausó a todos los hilos
+                    continue
+
+            time.sleep(min(BACKOFF_MAX, BACKOFF_BASE * 2**attempt) * random.uniform(0.5, 1))
+
+        raise RuntimeError(f'Could not fetch page {page} after {MAX_ATTEMPTS} attempts: {error}')
+
+
+def parse_attendees(attendees):
+    valid = []
+    invalid = 0
+    for attendee in attendees:
+        try:
+            data = extract_and_validate_data(attendee)
+        except (KeyError, IndexError):
+            invalid += 1
+            continue
+        valid.append(data)
+    return valid, invalid
+
+
+def backfill(client, event_id, table_name, checkpoint, index_name='ShortIdGSI', badge_queue_url=None, progress=None):
+    """Fetch every page not in the checkpoint and upsert its attendees.
+
+    Pages are fetched by a thread pool and saved on this thread as they
+    arrive; save_profiles writes each profile with a conditional PutItem, so
+    an attendee who initializes the profile during the import keeps it.
+    """
+    # Los códigos existentes se cargan una vez; solo los positivos del Bloom filter se consultan en el GSI
+    allocator = ShortIdAllocator(
+        load_existing_short_ids(table_name, index_name),
+        lambda short_id: find_short_id_owners(short_id, table_name, index_name),
+    )
+
+    # La primera página pendiente trae el page_count actual: el evento pudo sumar
+    # asistentes desde la corrida anterior
+    page_count = checkpoint.state['page_count'] or 1
+    first = next((page for page in range(1, page_count + 1) if page not in checkpoint.done), page_count)
+    first_page = client.get_page(event_id, first)
+    checkpoint.state['page_count'] = first_page['pagination']['page_count']
+    checkpoint.save()
+
+    def save_page(page, response):
+        attendees, invalid = parse_attendees(response.get('attendees', []))
+        allocator.assign(attendees)
+        saved, skipped = save_profiles(attendees, table_name) if attendees else ([], [])
+        if badge_queue_url and saved:
+            failed = send_badges(saved, badge_queue_url)
+            if failed:
+                raise RuntimeError(f'Could not queue the badges of {len(failed)} attendees of page {page}')
+        checkpoint.mark_done(page, len(saved), len(skipped), invalid)
+        if progress:
+            progress(checkpoint)
+
+    save_page(first, first_page)
+    pending = [page for page in range(1, checkpoint.state['page_count'] + 1) if page not in checkpoint.done]
+
+    pending.reverse()
+    window = client.limiter.max_concurrency * 2
+    with ThreadPoolExecutor(max_workers=client.limiter.max_concurrency) as executor:
+        futures = {}
+        try:
+            while pending or futures:
+                while pending and len(futures) < window:
+                    page = pending.pop()
+                    futures[executor.submit(client.get_page, event_id, page)] = page
+                completed, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in completed:
+                    save_page(futures.pop(future), future.result())
+        finally:
+            for future in futures:
+                future.cancel()
+
+    checkpoint.state['collisions'] = checkpoint.state.get('collisions', 0) + allocator.collisions
+    return checkpoint.state
+
+
+def get_token(args):
+    if args.token:
+        return args.token
+    if os.environ.get('EVENTBRITE_TOKEN'):
+        return os.environ['EVENTBRITE_TOKEN']
+    if args.secret_name:
+        import boto3
+
+        return boto3.client('secretsmanager').get_secret_value(SecretId=args.secret_name)['SecretString']
+    sys.exit('An Eventbrite token is required: --token, EVENTBRITE_TOKEN or --secret-name')
+
+
+def print_progress(checkpoint):
+    state = checkpoint.state
+    print(f"\r{len(checkpoint.done)}/{state['page_count']} pages, {state['saved']} saved, {state['skipped']} initialized", end='', flush=True)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Backfill the attendees of an Eventbrite event')
+    parser.add_argument('event_id')
+    parser.add_argument('--table', default='communitydaymx24')
+    parser.add_argument('--index', default='ShortIdGSI')
+    parser.add_argument('--token')
+    parser.add_argument('--secret-name')
+    parser.add_argument('--api-url', default=EVENTBRITE_API)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--checkpoint', help='Defaults to backfill_<event_id>.json')
+    parser.add_argument('--badge-queue-url', help='Also queue a badge message for every saved attendee')
+    args = parser.parse_args()
+
+    checkpoint = Checkpoint(args.checkpoint or f'backfill_{args.event_id}.json', args.event_id)
+    if checkpoint.done:
+        print(f"Resuming: {len(checkpoint.done)}/{checkpoint.state['page_count']} pages already saved")
+
+    client = AttendeeClient(get_token(args), args.api_url, args.concurrency)
+    start = time.perf_counter()
+    state = backfill(client, args.event_id, args.table, checkpoint, args.index, args.badge_queue_url, print_progress)
+    print()
+    print(f"{state['saved']} attendees saved, {state['skipped']} already initialized, {state['invalid']} without barcode, "
+          f"{state['collisions']} short_id collisions resolved "
+          f"in {time.perf_counter() - start:.1f}s ({client.limiter.throttled} throttled requests)")
@@ -0,0 +1,91 @@
+"""Add the stamps written before aggregate_stamps kept them to the sponsor LEAD items.
+
+The stamp rows are read with one parallel scan (the same filter as
+top_sponsors.py), grouped by (sponsor, attendee) and their times are added
+to the stamped_at set of SPONSOR#<sponsor_id>/LEAD#<user_id> with one
+UpdateItem per lead. aggregate_stamps adds to the same set, so a stamp both
+of them see counts once: the command can run while the stream keeps
+processing stamps and can be repeated safely. It also drops the
+first_stamp_at and stamp_count attributes of leads written before the set
+existed, once their stamps are in it.
+
+Usage:
+    python backfill_leads.py --table communitydaymx24 [--segments 4] [--dry-run]
+"""
+import argparse
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import boto3
+from boto3.dynamodb.conditions import Attr
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'function'))
+
+from aggregate_stamps import LEAD_PREFIX
+from scanner import parallel_scan
+
+MAX_WORKERS = 8
+
+
+def group_leads(stamps):
+    """Return {(sponsor_id, user_id): (set of created_at, latest notes)} from stamp rows."""
+    leads = {}
+    for stamp in stamps:
+        user_id = stamp['PK'].split('#', 1)[1]
+        _, sponsor_id, created_at = stamp['SK'].split('#', 2)
+        key = (sponsor_id, user_id)
+        stamped_at, (latest_at, notes) = leads.get(key, (set(), ('', '')))
+        stamped_at.add(created_at)
+        if stamp.get('notes') and created_at >= latest_at:
+            latest_at, notes = created_at, stamp['notes']
+        leads[key] = (stamped_at, (latest_at, notes))
+    return {key: (stamped_at, notes) for key, (stamped_at, (_, notes)) in leads.items()}
+
+
+def merge_lead(client, table_name, sponsor_id, user_id, stamped_at, notes):
+    """Add the stamps to a LEAD item; return how many it did not have yet."""
+    update = 'ADD stamped_at :stamped_at'
+    values = {':stamped_at': {'SS': sorted(stamped_at)}}
+    # Las notas del stream son más recientes que las de los sellos viejos
+    if notes:
+        update += ' SET notes = if_not_exists(notes, :notes)'
+        values[':notes'] = {'S': notes}
+    response = client.update_item(
+        TableName=table_name,
+        Key={'PK': {'S': f'SPONSOR#{sponsor_id}'}, 'SK': {'S': f'{LEAD_PREFIX}{user_id}'}},
+        UpdateExpression=update + ' REMOVE first_stamp_at, stamp_count',
+        ExpressionAttributeValues=values,
+        ReturnValues='ALL_OLD',
+    )
+    known = set(response.get('Attributes', {}).get('stamped_at', {}).get('SS', ()))
+    return len(stamped_at - known)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Backfill the sponsor lead items')
+    parser.add_argument('--table', required=True)
+    parser.add_argument('--segments', type=int, default=4)
+    parser.add_argument('--dry-run', action='store_true', help='Only count the leads')
+    args = parser.parse_args()
+
+    stamps = parallel_scan(
+        args.table,
+        total_segments=args.segments,
+        FilterExpression=Attr('PK').begins_with('USER#') & Attr('SK').begins_with('SPONSOR#'),
+        ProjectionExpression='PK, SK, notes',
+    )
+    leads = group_leads(stamps)
+    sponsors = {sponsor_id for sponsor_id, _ in leads}
+    print(f'{len(leads)} leads for {len(sponsors)} sponsors')
+    if args.dry_run:
+        sys.exit(0)
+
+    client = boto3.client('dynamodb')
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        added = list(executor.map(
+            lambda lead: merge_lead(client, args.table, *lead[0], *lead[1]),
+            leads.items(),
+        ))
+    print(f'{sum(added)} stamps added to {sum(1 for count in added if count)} leads, '
+          f'{len(leads) - sum(1 for count in added if count)} leads already had all their stamps')
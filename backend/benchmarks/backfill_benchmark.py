@@ -0,0 +1,196 @@
+"""Backfill a fake Eventbrite event into a moto table, with an interruption.
+
+The fake API serves the attendee list in pages of 50, answers 429 with
+Retry-After when more than --rate requests arrive in a second, and can be
+made to fail after some pages to check that the checkpoint resumes the
+import without fetching the saved pages again. A last run, after more
+attendees register, only fetches the old last page and the new ones.
+
+Usage:
+    python benchmarks/backfill_benchmark.py [--attendees 50000] [--rate 100] [--concurrency 8]
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+os.environ.setdefault('AWS_ACCESS_KEY_ID', 'testing')
+os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'testing')
+
+import boto3
+from boto3.dynamodb.conditions import Attr
+from moto import mock_aws
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backfill_attendees import AttendeeClient, Checkpoint, PermanentError, backfill
+
+TOKEN = 'fake-private-token'
+TABLE_NAME = 'backfill-benchmark'
+PAGE_SIZE = 50
+INVALID_EVERY = 1000
+
+
+class FakeEventbrite(BaseHTTPRequestHandler):
+    attendees = 50000
+    rate = 100
+    latency = 0.05
+    fail_after = None
+    lock = threading.Lock()
+    window = (0, 0)
+    served_pages = []
+    throttled = 0
+
+    def do_GET(self):
+        time.sleep(self.latency)
+        if self.headers.get('Authorization') != f'Bearer {TOKEN}':
+            return self.reply(401, {'error': 'INVALID_AUTH'})
+
+        with FakeEventbrite.lock:
+            second, count = FakeEventbrite.window
+            now = int(time.time())
+            count = count + 1 if now == second else 1
+            FakeEventbrite.window = (now, count)
+            if count > self.rate:
+                FakeEventbrite.throttled += 1
+                return self.reply(429, {'error': 'HIT_RATE_LIMIT'}, {'Retry-After': '1'})
+            if self.fail_after is not None and len(FakeEventbrite.served_pages) >= self.fail_after:
+                return self.reply(400, {'error': 'ARGUMENTS_ERROR'})
+            page = int(parse_qs(urlparse(self.path).query).get('page', ['1'])[0])
+            FakeEventbrite.served_pages.append(page)
+
+        page_count = (self.attendees + PAGE_SIZE - 1) // PAGE_SIZE
+        start = (page - 1) * PAGE_SIZE
+        attendees = [self.attendee(n) for n in range(start, min(start + PAGE_SIZE, self.attendees))]
+        self.reply(200, {
+            'pagination': {
+                'object_count': self.attendees,
+                'page_number': page,
+                'page_size': PAGE_SIZE,
+                'page_count': page_count,
+                'has_more_items': page < page_count,
+            },
+            'attendees': attendees,
+        }, {'X-RateLimit-Remaining': str(max(self.rate - count, 0)), 'X-RateLimit-Reset': '1'})
+
+    @staticmethod
+    def attendee(n):
+        attendee = {
+            'id': str(n),
+            'profile': {'first_name': f'Attendee{n}', 'last_name': 'Test', 'email': f'attendee{n}@example.com'},
+            'barcodes': [{'barcode': f'BC{n}'}],
+        }
+        if n % INVALID_EVERY == INVALID_EVERY - 1:
+            attendee['barcodes'] = []
+        return attendee
+
+    def reply(self, status, body, headers=None):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+def create_table():
+    boto3.client('dynamodb').create_table(
+        TableName=TABLE_NAME,
+        BillingMode='PAY_PER_REQUEST',
+        AttributeDefinitions=[{'AttributeName': name, 'AttributeType': 'S'} for name in ('PK', 'SK', 'short_id')],
+        KeySchema=[{'AttributeName': 'PK', 'KeyType': 'HASH'}, {'AttributeName': 'SK', 'KeyType': 'RANGE'}],
+        GlobalSecondaryIndexes=[{
+            'IndexName': 'ShortIdGSI',
+            'KeySchema': [{'AttributeName': 'short_id', 'KeyType': 'HASH'}],
+            'Projection': {'ProjectionType': 'ALL'},
+        }],
+    )
+
+
+def count_profiles():
+    table = boto3.resource('dynamodb').Table(TABLE_NAME)
+    kwargs = {'Select': 'COUNT', 'FilterExpression': Attr('SK').eq('PROFILE')}
+    total = 0
+    while True:
+        response = table.scan(**kwargs)
+        total += response['Count']
+        if 'LastEvaluatedKey' not in response:
+            return total
+        kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Attendee backfill against a fake Eventbrite API')
+    parser.add_argument('--attendees', type=int, default=50000)
+    parser.add_argument('--rate', type=int, default=100, help='Requests per second before the fake API answers 429')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--interrupt-at', type=float, default=0.3, help='Fraction of pages served before the first run fails')
+    parser.add_argument('--registered-later', type=int, default=PAGE_SIZE + 10, help='Attendees added before the last run')
+    args = parser.parse_args()
+
+    page_count = (args.attendees + PAGE_SIZE - 1) // PAGE_SIZE
+    FakeEventbrite.attendees = args.attendees
+    FakeEventbrite.rate = args.rate
+    FakeEventbrite.fail_after = int(page_count * args.interrupt_at)
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FakeEventbrite)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    api_url = f'http://127.0.0.1:{server.server_port}/v3'
+
+    checkpoint_file = os.path.join(tempfile.mkdtemp(), 'backfill.json')
+    with mock_aws():
+        create_table()
+        table = boto3.resource('dynamodb').Table(TABLE_NAME)
+        # Perfil ya inicializado que el backfill no debe tocar
+        table.put_item(Item={'PK': 'USER#BC0', 'SK': 'PROFILE', 'user_id': 'BC0', 'first_name': 'Initialized', 'initialized': True})
+
+        start = time.perf_counter()
+        try:
+            backfill(AttendeeClient(TOKEN, api_url, args.concurrency), 'event', TABLE_NAME, Checkpoint(checkpoint_file, 'event'))
+            raise AssertionError('the first run should have been interrupted')
+        except PermanentError as e:
+            interrupted = Checkpoint(checkpoint_file, 'event')
+            print(f'first run interrupted after {len(interrupted.done)}/{page_count} pages: {e}')
+
+        FakeEventbrite.fail_after = None
+        pages_before_resume = len(FakeEventbrite.served_pages)
+        client = AttendeeClient(TOKEN, api_url, args.concurrency)
+        state = backfill(client, 'event', TABLE_NAME, Checkpoint(checkpoint_file, 'event'))
+        elapsed = time.perf_counter() - start
+
+        resumed_pages = FakeEventbrite.served_pages[pages_before_resume:]
+        profiles = count_profiles()
+
+        # Nuevos registros después del import: caen en la última página y en páginas nuevas
+        FakeEventbrite.attendees += args.registered_later
+        pages_before_update = len(FakeEventbrite.served_pages)
+        backfill(AttendeeClient(TOKEN, api_url, args.concurrency), 'event', TABLE_NAME, Checkpoint(checkpoint_file, 'event'))
+        updated_pages = FakeEventbrite.served_pages[pages_before_update:]
+        updated_profiles = count_profiles()
+        initialized = table.get_item(Key={'PK': 'USER#BC0', 'SK': 'PROFILE'})['Item']
+
+    server.shutdown()
+    invalid = args.attendees // INVALID_EVERY
+    print(f"{state['saved']} saved, {state['skipped']} initialized, {state['invalid']} invalid, {profiles} profiles in the table")
+    print(f'{len(FakeEventbrite.served_pages)} pages served, {len(resumed_pages)} after resuming, '
+          f'{FakeEventbrite.throttled} requests throttled, {elapsed:.1f}s')
+    new_page_count = (FakeEventbrite.attendees + PAGE_SIZE - 1) // PAGE_SIZE
+    print(f'{args.registered_later} registered later: pages {updated_pages} fetched again, {updated_profiles} profiles in the table')
+
+    assert profiles == args.attendees - invalid, 'every attendee with a barcode should have a profile'
+    assert state['invalid'] == invalid
+    assert initialized['first_name'] == 'Initialized', 'initialized profiles must not be overwritten'
+    assert not set(resumed_pages) & set(interrupted.done), 'saved pages should not be fetched again'
+    assert set(FakeEventbrite.served_pages[:pages_before_update]) == set(range(1, page_count + 1))
+    assert sorted(updated_pages) == list(range(page_count, new_page_count + 1)), 'only the last page and the new ones'
+    assert updated_profiles == FakeEventbrite.attendees - FakeEventbrite.attendees // INVALID_EVERY
@@ -0,0 +1,349 @@
+"""Compare cold starts and tail latency of the split and consolidated attendee APIs.
+
+The same synthetic event-day trace is replayed against two simulated
+deployments of the attendee and passport routes:
+
+- split: one function per handler, as in template.yaml
+- consolidated: AttendeeApiFunction (attendee_api.py) routing every path
+
+The trace opens with a registration wave (validate, activate, fill the
+profile) and then alternates quiet talks with session-break rushes of badge
+scans and stamps. Each deployment keeps a pool of Lambda environments per
+function: a request reuses the most recently used idle environment or starts
+a new one (cold start) when all of them are busy, and environments idle for
+longer than --idle-timeout are reclaimed. The costs the simulation charges
+are measured on this machine:
+
+- init: importing the function's handler module in a fresh interpreter, plus
+  --runtime-init-ms for the runtime itself
+- first request of an environment: importing boto3 and creating the
+  DynamoDB client
+- warm service time of each route, sampled from in-process runs of the
+  handlers against moto (the load_test harness); the consolidated
+  deployment adds the measured cost of the Powertools resolver
+
+Before the simulation every route is sent once through attendee_api to check
+that the router returns the handler's response.
+
+The service times include moto's own work (it copies the table on every
+transaction), so compare the two deployments with each other rather than
+with production numbers. The "added" columns leave the service time out:
+they are the latency each deployment puts on top of the handler (cold
+start, first client, router), which is what the consolidation changes.
+
+Usage:
+    python benchmarks/consolidation_benchmark.py [--minutes 240] [--peak-rate 40] [--base-rate 0.5]
+        [--idle-timeout 600] [--samples 200] [--json results.json]
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+from collections import Counter, defaultdict
+
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+os.environ.setdefault('AWS_ACCESS_KEY_ID', 'testing')
+os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'testing')
+# Todo el tráfico sale de pocas IPs simuladas
+os.environ['RATE_LIMIT_ENABLED'] = 'false'
+os.environ['POWERTOOLS_TRACE_DISABLED'] = 'true'
+
+from load_test import Dataset, Traffic, create_resources
+from moto import mock_aws
+
+FUNCTION_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'function')
+
+# Ruta de cada handler en el despliegue separado (una función por handler)
+ROUTES = {
+    'get_information': ('GET', '/attendee'),
+    'update_fields': ('POST', '/attendee'),
+    'check_existence': ('GET', '/attendee/validate'),
+    'unlock_activation': ('GET', '/attendee/activate'),
+    'get_passport_status': ('GET', '/attendee/passport'),
+    'stamp_passport': ('POST', '/sponsor/passport'),
+}
+CONSOLIDATED = 'attendee_api'
+
+# Mezcla de operaciones en cada fase del día
+PHASES = {
+    'registration': {'check_existence': 30, 'unlock_activation': 30, 'update_fields': 20, 'get_information': 20},
+    'talks': {'get_information': 40, 'get_passport_status': 30, 'stamp_passport': 20, 'check_existence': 10},
+    'break': {'get_information': 60, 'stamp_passport': 20, 'get_passport_status': 15, 'check_existence': 5},
+}
+
+
+class Context:
+    function_name = CONSOLIDATED
+    aws_request_id = 'consolidation-benchmark'
+
+
+def measure_in_fresh_interpreter(code, runs):
+    """Median of the milliseconds printed by `code`, each run in a new interpreter."""
+    env = dict(
+        os.environ,
+        PYTHONPATH=os.pathsep.join(filter(None, [FUNCTION_DIR, os.environ.get('PYTHONPATH')])),
+        DYNAMODB_TABLE_NAME='table',
+        INDEX_NAME='index',
+    )
+    timings = []
+    for _ in range(runs):
+        result = subprocess.run([sys.executable, '-c', code], env=env, cwd=FUNCTION_DIR, capture_output=True, text=True)
+        if result.returncode != 0:
+            raise RuntimeError(f'Measurement failed:\n{result.stderr}')
+        timings.append(float(result.stdout.split()[-1]))
+    return statistics.median(timings)
+
+
+def import_ms(module, runs):
+    return measure_in_fresh_interpreter(
+        f'import time; start = time.perf_counter(); import {module}; print((time.perf_counter() - start) * 1000)', runs,
+    )
+
+
+def client_ms(runs):
+    return measure_in_fresh_interpreter(
+        'import time; from clients import get_client; start = time.perf_counter(); get_client("dynamodb"); '
+        'print((time.perf_counter() - start) * 1000)', runs,
+    )
+
+
+def router_ms(requests):
+    """Extra milliseconds per request of dispatching through APIGatewayRestResolver."""
+    from aws_lambda_powertools.event_handler import APIGatewayRestResolver, Response
+    from utils import generate_http_response
+
+    app = APIGatewayRestResolver()
+
+    def handler(event, context):
+        return generate_http_response(200, {'exists': True})
+
+    @app.get('/attendee/validate')
+    def validate():
+        response = handler(app.current_event.raw_event, app.lambda_context)
+        return Response(status_code=response['statusCode'], body=response['body'], headers=response['headers'])
+
+    event = rest_event('check_existence', {'queryStringParameters': {'short_id': 'ABC1234'}, 'headers': {}})
+    timings = {}
+    for name, call in (('direct', handler), ('routed', app.resolve)):
+        start = time.perf_counter()
+        for _ in range(requests):
+            call(event, Context())
+        timings[name] = (time.perf_counter() - start) / requests * 1000
+    return max(0.0, timings['routed'] - timings['direct'])
+
+
+def rest_event(operation, event):
+    method, path = ROUTES[operation]
+    return {**event, 'httpMethod': method, 'path': path, 'resource': path}
+
+
+def service_samples(args, rng):
+    """Warm latencies in milliseconds of every route, and a check that attendee_api routes them."""
+    samples = defaultdict(list)
+    with mock_aws():
+        dataset = Dataset(args.attendees, args.sponsors, rng)
+        create_resources(dataset)
+        handlers = {operation: __import__(operation).lambda_handler for operation in ROUTES}
+        import attendee_api
+
+        traffic = Traffic(dataset, rng)
+        for _ in range(2):
+            for requested in ROUTES:
+                operation, event, profile = traffic.build(requested)
+                traffic.observe(operation, profile, handlers[operation](event, None))
+
+        # El router devuelve lo mismo que el handler, con los headers en multiValueHeaders
+        for requested in ROUTES:
+            operation, event, profile = traffic.build(requested)
+            response = attendee_api.lambda_handler(rest_event(operation, event), Context())
+            traffic.observe(operation, profile, response)
+            assert response['statusCode'] < 500, (operation, response)
+            assert response['multiValueHeaders']['Access-Control-Allow-Origin'] == ['*'], response
+            json.loads(response['body'])
+
+        for _ in range(args.samples):
+            for requested in ROUTES:
+                operation, event, profile = traffic.build(requested)
+                start = time.perf_counter()
+                response = handlers[operation](event, None)
+                samples[operation].append((time.perf_counter() - start) * 1000)
+                traffic.observe(operation, profile, response)
+
+        from telemetry import flush_all
+
+        flush_all(timeout=10)
+    missing = set(ROUTES) - set(samples)
+    assert not missing, f'No samples for {missing}'
+    return samples
+
+
+def trace(args, rng):
+    """(second, operation) arrivals of the event day: registration, then talks and breaks."""
+    arrivals = []
+    now = 0.0
+    end = args.minutes * 60
+    while now < end:
+        minute = now / 60
+        if minute < args.registration_minutes:
+            phase, rate = 'registration', args.peak_rate
+        elif (minute - args.registration_minutes) % args.session_minutes >= args.session_minutes - args.break_minutes:
+            phase, rate = 'break', args.peak_rate
+        else:
+            phase, rate = 'talks', args.base_rate
+        now += rng.expovariate(rate)
+        mix = PHASES[phase]
+        arrivals.append((now, rng.choices(list(mix), list(mix.values()))[0]))
+    return arrivals
+
+
+class Environment:
+    __slots__ = ('busy_until', 'client_ready')
+
+    def __init__(self):
+        self.busy_until = 0.0
+        self.client_ready = False
+
+
+class Deployment:
+    """Lambda environments of every function of one deployment."""
+
+    def __init__(self, name, functions, init_ms, first_client_ms, extra_ms, idle_timeout):
+        self.name = name
+        self.functions = functions
+        self.init_ms = init_ms
+        self.first_client_ms = first_client_ms
+        self.extra_ms = extra_ms
+        self.idle_timeout = idle_timeout
+        # Por función, los entornos ordenados del más al menos recientemente usado
+        self.pools = defaultdict(list)
+        self.environments = Counter()
+        self.latencies = defaultdict(list)
+        # Lo que el despliegue suma al tiempo de servicio: arranque en frío, primer cliente, router
+        self.added = []
+        self.cold_starts = Counter()
+
+    def invoke(self, at, operation, service_ms):
+        function = self.functions[operation]
+        pool = self.pools[function]
+        pool[:] = [env for env in pool if at - env.busy_until <= self.idle_timeout]
+        env = next((env for env in pool if env.busy_until <= at), None)
+        latency = service_ms + self.extra_ms
+        if env is None:
+            env = Environment()
+            self.environments[function] += 1
+            self.cold_starts[operation] += 1
+            latency += self.init_ms[function]
+        else:
+            pool.remove(env)
+        if not env.client_ready:
+            env.client_ready = True
+            latency += self.first_client_ms
+        env.busy_until = at + latency / 1000
+        pool.insert(0, env)
+        self.latencies[operation].append(latency)
+        self.added.append(latency - service_ms)
+
+    def summary(self):
+        latencies = sorted(latency for values in self.latencies.values() for latency in values)
+        added = sorted(self.added)
+        requests = len(latencies)
+        return {
+            'requests': requests,
+            'cold_starts': sum(self.cold_starts.values()),
+            'cold_start_rate': sum(self.cold_starts.values()) / requests,
+            'environments': sum(self.environments.values()),
+            'p50_ms': percentile(latencies, 0.5),
+            'p99_ms': percentile(latencies, 0.99),
+            'p999_ms': percentile(latencies, 0.999),
+            'max_ms': latencies[-1],
+            'added_ms': {
+                'total': sum(added),
+                'p99': percentile(added, 0.99),
+                'p999': percentile(added, 0.999),
+            },
+            'routes': {
+                operation: {
+                    'requests': len(values),
+                    'cold_starts': self.cold_starts[operation],
+                    'p99_ms': percentile(sorted(values), 0.99),
+                }
+                for operation, values in sorted(self.latencies.items())
+            },
+        }
+
+
+def percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def report(costs, results):
+    print('measured costs (ms): '
+          + ', '.join(f'import {module} {ms:.1f}' for module, ms in sorted(costs['import_ms'].items()))
+          + f', first DynamoDB client {costs["client_ms"]:.1f}, router {costs["router_ms"]:.3f}/request'
+          + f', runtime init {costs["runtime_init_ms"]:.0f} (assumed)')
+    print(f'{"deployment":14s} {"requests":>8s} {"cold":>6s} {"rate":>7s} {"envs":>5s} '
+          f'{"p50 ms":>8s} {"p99 ms":>8s} {"p99.9 ms":>9s} {"max ms":>8s} {"added p99":>9s} {"p99.9":>8s} {"total s":>8s}')
+    for name, summary in results.items():
+        print(f'{name:14s} {summary["requests"]:8d} {summary["cold_starts"]:6d} {summary["cold_start_rate"]:7.3%} '
+              f'{summary["environments"]:5d} {summary["p50_ms"]:8.2f} {summary["p99_ms"]:8.2f} '
+              f'{summary["p999_ms"]:9.2f} {summary["max_ms"]:8.1f} {summary["added_ms"]["p99"]:9.3f} '
+              f'{summary["added_ms"]["p999"]:8.1f} {summary["added_ms"]["total"] / 1000:8.1f}')
+    print(f'{"route":22s} ' + ' '.join(f'{name + " cold":>18s} {name + " p99":>18s}' for name in results))
+    for operation in ROUTES:
+        row = [results[name]['routes'].get(operation) for name in results]
+        if any(row):
+            print(f'{operation:22s} ' + ' '.join(
+                f'{route["cold_starts"]:18d} {route["p99_ms"]:18.2f}' for route in row
+            ))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Split vs consolidated attendee API cold starts')
+    parser.add_argument('--minutes', type=int, default=240, help='Length of the simulated event day')
+    parser.add_argument('--registration-minutes', type=int, default=30)
+    parser.add_argument('--session-minutes', type=int, default=60, help='A talk plus the break after it')
+    parser.add_argument('--break-minutes', type=int, default=15)
+    parser.add_argument('--peak-rate', type=float, default=40, help='Requests per second during registration and breaks')
+    parser.add_argument('--base-rate', type=float, default=0.5, help='Requests per second during talks')
+    parser.add_argument('--idle-timeout', type=float, default=600, help='Seconds before an idle environment is reclaimed')
+    parser.add_argument('--runtime-init-ms', type=float, default=150, help='Runtime startup before the handler imports')
+    parser.add_argument('--samples', type=int, default=200, help='Warm requests measured per route')
+    parser.add_argument('--import-runs', type=int, default=5)
+    parser.add_argument('--attendees', type=int, default=100)
+    parser.add_argument('--sponsors', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--json', help='Write the results to this file')
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    modules = sorted(set(ROUTES) | {CONSOLIDATED})
+    costs = {
+        'import_ms': {module: import_ms(module, args.import_runs) for module in modules},
+        'client_ms': client_ms(args.import_runs),
+        'router_ms': router_ms(20000),
+        'runtime_init_ms': args.runtime_init_ms,
+    }
+    init_ms = {module: args.runtime_init_ms + ms for module, ms in costs['import_ms'].items()}
+    samples = service_samples(args, rng)
+
+    deployments = [
+        Deployment('split', {operation: operation for operation in ROUTES}, init_ms, costs['client_ms'], 0.0,
+                   args.idle_timeout),
+        Deployment('consolidated', {operation: CONSOLIDATED for operation in ROUTES}, init_ms, costs['client_ms'],
+                   costs['router_ms'], args.idle_timeout),
+    ]
+    # Mismo tráfico y mismo tiempo de servicio por request en los dos despliegues
+    for at, operation in trace(args, rng):
+        service_ms = rng.choice(samples[operation])
+        for deployment in deployments:
+            deployment.invoke(at, operation, service_ms)
+
+    results = {deployment.name: deployment.summary() for deployment in deployments}
+    report(costs, results)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'costs': costs, 'deployments': results, 'arguments': vars(args)}, f, indent=2)
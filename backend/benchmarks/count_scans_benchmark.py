@@ -0,0 +1,183 @@
+"""Drain scan messages through count_scans.lambda_handler against moto.
+
+Scan messages like the ones get_information sends are fed to the handler
+in SQS-sized batches from an in-memory queue, redelivering the ones
+reported as batch item failures, while the profiles live in a moto table.
+A share of the DynamoDB transactions is made to fail with a throttling
+error to exercise the partial batch responses.
+
+Three rounds are run:
+- unique devices: every message is a new device, so after the retries each
+  scanned_count must match the devices sent to that attendee within the
+  HyperLogLog error (nothing lost, retries never counted twice)
+- redelivery: the same messages are delivered again, which must not change
+  any count or write anything
+- refresh storm: each device reloads the profile several times in a row,
+  and the duplicates must collapse into at most one write per attendee per
+  batch
+
+moto copies the tables on every TransactWriteItems call, so the handler's
+throughput printed here is moto's, not DynamoDB's; the counts and the
+number of writes are what this benchmark checks.
+
+Usage:
+    python benchmarks/count_scans_benchmark.py [--users 200] [--messages 3000] [--error-rate 0.1]
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import sys
+import time
+from collections import Counter, deque
+
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+os.environ.setdefault('AWS_ACCESS_KEY_ID', 'testing')
+os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'testing')
+os.environ['DYNAMODB_TABLE_NAME'] = 'count-scans-benchmark'
+
+import boto3
+from botocore.exceptions import ClientError
+from moto import mock_aws
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'function'))
+
+
+class FlakyClient:
+    """DynamoDB client proxy that throttles a share of the writes."""
+
+    def __init__(self, client, error_rate):
+        self.client = client
+        self.error_rate = error_rate
+        self.updates = 0
+        self.throttled = 0
+
+    def transact_write_items(self, **kwargs):
+        self.updates += 1
+        if random.random() < self.error_rate:
+            self.throttled += 1
+            raise ClientError({'Error': {'Code': 'ProvisionedThroughputExceededException', 'Message': 'throttled'}}, 'TransactWriteItems')
+        return self.client.transact_write_items(**kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+
+def create_table(users):
+    client = boto3.client('dynamodb')
+    client.create_table(
+        TableName=os.environ['DYNAMODB_TABLE_NAME'],
+        BillingMode='PAY_PER_REQUEST',
+        AttributeDefinitions=[{'AttributeName': name, 'AttributeType': 'S'} for name in ('PK', 'SK')],
+        KeySchema=[{'AttributeName': 'PK', 'KeyType': 'HASH'}, {'AttributeName': 'SK', 'KeyType': 'RANGE'}],
+    )
+    for n in range(users):
+        client.put_item(
+            TableName=os.environ['DYNAMODB_TABLE_NAME'],
+            Item={'PK': {'S': f'USER#{n:025d}'}, 'SK': {'S': 'PROFILE'}, 'user_id': {'S': f'{n:025d}'}},
+        )
+
+
+class LocalQueue:
+    """In-memory stand-in for the queue and its Lambda event source.
+
+    moto's ReceiveMessage takes about half a second per call, too slow to
+    push tens of thousands of messages; this keeps what matters here:
+    batches of up to batch_size messages, and only the messages reported in
+    batchItemFailures are delivered again.
+    """
+
+    def __init__(self):
+        self.messages = deque()
+        self.sent = 0
+
+    def send(self, bodies):
+        for body in bodies:
+            self.messages.append({'messageId': f'm{self.sent}', 'body': json.dumps(body)})
+            self.sent += 1
+
+    def drain(self, handler, batch_size):
+        invocations = retried = 0
+        elapsed = 0.0
+        while self.messages:
+            batch = [self.messages.popleft() for _ in range(min(batch_size, len(self.messages)))]
+            start = time.perf_counter()
+            # Los errores que el handler imprime por cada throttle no aportan aquí
+            with contextlib.redirect_stdout(io.StringIO()):
+                result = handler({'Records': batch}, None)
+            elapsed += time.perf_counter() - start
+            invocations += 1
+
+            failed = {failure['itemIdentifier'] for failure in result['batchItemFailures']}
+            retried += len(failed)
+            self.messages.extend(record for record in batch if record['messageId'] in failed)
+        return invocations, retried, elapsed
+
+
+def scanned_counts(users):
+    table = boto3.resource('dynamodb').Table(os.environ['DYNAMODB_TABLE_NAME'])
+    items = table.scan()['Items']
+    return {item['PK']: int(item.get('scanned_count', 0)) for item in items if item['SK'] == 'PROFILE'}
+
+
+def within_error(count, expected, precision):
+    # Tres desviaciones estándar del HyperLogLog; con pocos dispositivos cada
+    # colisión en un registro resta uno, de ahí el margen para conteos chicos
+    return abs(count - expected) <= max(3, 3 * 1.04 / (1 << precision) ** 0.5 * expected)
+
+
+def run_round(name, count_scans, flaky, queue, bodies, batch_size):
+    queue.send(bodies)
+    flaky.updates = flaky.throttled = 0
+    invocations, retried, elapsed = queue.drain(count_scans.lambda_handler, batch_size)
+    print(f'{name:15s} {len(bodies):6d} messages  {invocations:4d} invocations  {flaky.updates:6d} writes '
+          f'({flaky.throttled} throttled, {retried} messages retried)  {len(bodies) / elapsed:8.0f} msg/s in the handler')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='CountLegitimateScans consumer benchmark')
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--messages', type=int, default=3000)
+    parser.add_argument('--refreshes', type=int, default=10, help='Reloads per device in the refresh storm')
+    parser.add_argument('--error-rate', type=float, default=0.1)
+    parser.add_argument('--batch-size', type=int, default=100)
+    args = parser.parse_args()
+    random.seed(7)
+
+    with mock_aws():
+        create_table(args.users)
+        queue = LocalQueue()
+        import count_scans
+
+        flaky = FlakyClient(boto3.client('dynamodb'), args.error_rate)
+        count_scans.dynamodb = flaky
+
+        keys = [f'USER#{n:025d}' for n in range(args.users)]
+        bodies = [{'PK': random.choice(keys), 'SK': 'PROFILE', 'device': f'device-{n}'} for n in range(args.messages)]
+        # Mensajes inválidos que se deben descartar sin reintentos
+        bodies += [{'PK': 'SPONSOR#1', 'SK': 'PROFILE', 'device': 'x'}, {'PK': keys[0], 'SK': 'PROFILE'}]
+        run_round('unique devices', count_scans, flaky, queue, bodies, args.batch_size)
+
+        expected = Counter(body['PK'] for body in bodies[:args.messages])
+        counts = scanned_counts(args.users)
+        worst = max(abs(counts[key] - expected.get(key, 0)) / max(expected.get(key, 0), 1) for key in keys)
+        print(f'largest relative error {worst:.1%} for about {args.messages // args.users} devices per attendee')
+        assert all(within_error(counts[key], expected.get(key, 0), count_scans.PRECISION) for key in keys)
+
+        run_round('redelivery', count_scans, flaky, queue, bodies, args.batch_size)
+        assert flaky.updates == 0 and scanned_counts(args.users) == counts, 'redelivered scans must not be counted again'
+
+        storm = []
+        for n in range(args.messages // args.refreshes):
+            body = {'PK': random.choice(keys), 'SK': 'PROFILE', 'device': f'storm-{n}'}
+            storm.extend([body] * args.refreshes)
+        run_round('refresh storm', count_scans, flaky, queue, storm, args.batch_size)
+
+        added = sum(scanned_counts(args.users).values()) - sum(counts.values())
+        devices = len(storm) // args.refreshes
+        print(f'refresh storm added {added} scans for {devices} devices and {len(storm)} messages')
+        expected.update(body['PK'] for body in storm[::args.refreshes])
+        counts = scanned_counts(args.users)
+        assert all(within_error(counts[key], expected.get(key, 0), count_scans.PRECISION) for key in keys)
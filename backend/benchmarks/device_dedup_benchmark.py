@@ -0,0 +1,141 @@
+"""Accuracy, memory and traffic of the device dedup in the scan counting path.
+
+1. HyperLogLog error against the exact number of distinct devices, over
+   several trials per size, next to the theoretical 1.04 / sqrt(registers),
+   and the bytes stored per attendee sketch.
+2. Merging sketches built by separate consumers gives the same registers as
+   one sketch over all the devices.
+3. The producer's WindowedBloomFilter: memory and measured false positive
+   rate per 100k devices, against an exact set of the same keys.
+4. A simulated event: scans go through get_information's dedup window and
+   count_scans' sketches in batches of 100, counting the SQS messages and
+   DynamoDB writes against the previous path (one message per request, one
+   ADD per attendee per batch).
+
+Usage:
+    python benchmarks/device_dedup_benchmark.py [--trials 20] [--attendees 2000] [--requests 200000]
+"""
+import argparse
+import os
+import random
+import sys
+from collections import defaultdict
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'function'))
+
+from sketches import HyperLogLog, WindowedBloomFilter
+
+
+def accuracy(precision, sizes, trials):
+    bound = 1.04 / (1 << precision) ** 0.5
+    print(f'precision {precision}: {(1 << precision) + 1} bytes per sketch, standard error {bound:.1%}')
+    for size in sizes:
+        errors = []
+        for trial in range(trials):
+            sketch = HyperLogLog(precision)
+            sketch.update(f'{trial}-device-{n}' for n in range(size))
+            errors.append(abs(sketch.count() - size) / size)
+        mean = sum(errors) / len(errors)
+        print(f'  {size:7d} devices  mean error {mean:6.2%}  max error {max(errors):6.2%}')
+        assert max(errors) <= max(3 * bound, 2 / size)
+
+
+def merging(precision, devices, consumers):
+    whole = HyperLogLog(precision)
+    whole.update(f'device-{n}' for n in range(devices))
+    merged = HyperLogLog(precision)
+    for consumer in range(consumers):
+        part = HyperLogLog(precision)
+        part.update(f'device-{n}' for n in range(consumer, devices, consumers))
+        merged.merge(part)
+    # Volver a mezclar lo mismo no cambia nada
+    assert not merged.merge(part)
+    assert merged.registers == whole.registers
+    print(f'merge of {consumers} sketches: {merged.count()} == {whole.count()} (exact {devices})')
+
+
+def bloom_memory(devices):
+    window = WindowedBloomFilter(devices, 0.01)
+    for n in range(devices):
+        window.add(f'ABC1234#device-{n}')
+    false_positives = sum(f'XYZ9876#other-{n}' in window for n in range(devices))
+    exact = {f'ABC1234#device-{n}' for n in range(devices)}
+    exact_bytes = sys.getsizeof(exact) + sum(sys.getsizeof(key) for key in exact)
+    print(f'dedup window for {devices} devices: {window.nbytes / 1024:.0f} KiB per generation '
+          f'({false_positives / devices:.2%} false positives) vs {exact_bytes / 1024:.0f} KiB for an exact set')
+    assert false_positives / devices < 0.02
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def simulate(attendees, requests, window):
+    """Replay an event where devices keep refreshing the profiles they scanned."""
+    random.seed(11)
+    clock = Clock()
+    recent = WindowedBloomFilter(requests, 0.01, window, clock=clock)
+    # ~1/4 de las requests son dispositivos nuevos, el resto recargas
+    scans = []
+    for n in range(requests):
+        clock.now = n * 0.05
+        if not scans or random.random() < 0.25:
+            scans.append((f'{random.randrange(attendees):07d}', f'device-{n}'))
+            scan = scans[-1]
+        else:
+            scan = random.choice(scans[-500:])
+        yield scan, recent.add('#'.join(scan))
+
+
+def traffic(attendees, requests, batch_size, window, precision):
+    messages = []
+    sent = 0
+    for scan, duplicate in simulate(attendees, requests, window):
+        if not duplicate:
+            messages.append(scan)
+            sent += 1
+
+    sketches = defaultdict(lambda: HyperLogLog(precision))
+    writes = 0
+    for start in range(0, len(messages), batch_size):
+        devices = defaultdict(set)
+        for short_id, device in messages[start:start + batch_size]:
+            devices[short_id].add(device)
+        writes += sum(sketches[short_id].update(batch) for short_id, batch in devices.items())
+
+    # Camino anterior: un mensaje por request y un ADD por asistente por lote
+    # con los dispositivos distintos de ese lote
+    old_writes = old_counted = 0
+    all_scans = [scan for scan, _ in simulate(attendees, requests, window)]
+    for start in range(0, len(all_scans), batch_size):
+        batch = set(all_scans[start:start + batch_size])
+        old_writes += len({short_id for short_id, _ in batch})
+        old_counted += len(batch)
+
+    distinct = len(set(all_scans))
+    counted = sum(sketch.count() for sketch in sketches.values())
+    print(f'{requests} requests, {distinct} distinct (attendee, device) pairs')
+    print(f'  SQS messages     {requests:8d} -> {sent:8d}')
+    print(f'  DynamoDB writes  {old_writes:8d} -> {writes:8d}')
+    print(f'  scans counted    {old_counted:8d} -> {counted:8d}')
+    assert sent < requests and writes < old_writes
+    assert abs(counted - distinct) <= 0.05 * distinct
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Device dedup accuracy and traffic benchmark')
+    parser.add_argument('--trials', type=int, default=20)
+    parser.add_argument('--attendees', type=int, default=2000)
+    parser.add_argument('--requests', type=int, default=200000)
+    parser.add_argument('--window', type=int, default=600)
+    args = parser.parse_args()
+
+    for precision in (9, 12):
+        accuracy(precision, (10, 100, 1000, 10000, 100000), args.trials)
+    merging(9, 100000, 10)
+    bloom_memory(100000)
+    traffic(args.attendees, args.requests, 100, args.window, 9)
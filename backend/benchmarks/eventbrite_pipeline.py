@@ -0,0 +1,198 @@
+"""Run the Eventbrite webhook -> queue -> worker pipeline locally.
+
+A fake Eventbrite API is served from a local HTTP server (with latency and
+a share of 503 answers), DynamoDB and SQS are mocked with moto, and the
+webhooks go through eventbrite_webhook.lambda_handler. The queued messages
+are then fed to eventbrite_worker.lambda_handler in SQS-sized batches until
+the queue is empty, redelivering the ones reported as batch item failures.
+
+Usage:
+    python benchmarks/eventbrite_pipeline.py [--attendees 500] [--latency-ms 150] [--error-rate 0.05]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+os.environ.setdefault('AWS_ACCESS_KEY_ID', 'testing')
+os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'testing')
+os.environ.setdefault('POWERTOOLS_TRACE_DISABLED', 'true')
+os.environ.setdefault('POWERTOOLS_LOG_LEVEL', 'WARNING')
+os.environ['DYNAMODB_TABLE_NAME'] = 'eventbrite-pipeline'
+os.environ['SECRET_NAME'] = 'eventbrite-pipeline-secret'
+os.environ['INDEX_NAME'] = 'ShortIdGSI'
+# Las métricas EMF de cada invocación solo ensuciarían la salida
+os.environ['INSTRUMENTATION_ENABLED'] = 'false'
+
+import boto3
+from boto3.dynamodb.conditions import Attr
+from moto import mock_aws
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'function'))
+
+TOKEN = 'fake-private-token'
+
+
+class FakeEventbrite(BaseHTTPRequestHandler):
+    latency = 0.1
+    error_rate = 0.0
+    requests = 0
+    lock = threading.Lock()
+
+    def do_GET(self):
+        with FakeEventbrite.lock:
+            FakeEventbrite.requests += 1
+        time.sleep(self.latency)
+
+        if self.headers.get('Authorization') != f'Bearer {TOKEN}':
+            return self.reply(401, {'error': 'INVALID_AUTH'})
+        if random.random() < self.error_rate:
+            return self.reply(503, {'error': 'SERVICE_UNAVAILABLE'})
+
+        attendee_id = self.path.rstrip('/').rsplit('/', 1)[-1]
+        self.reply(200, {
+            'id': attendee_id,
+            'profile': {
+                'first_name': f'Attendee{attendee_id}',
+                'last_name': 'Test',
+                'email': f'attendee{attendee_id}@example.com',
+                'company': 'Example',
+                'job_title': 'Developer',
+            },
+            'barcodes': [{'barcode': f'BC{attendee_id}'}],
+        })
+
+    def reply(self, status, body):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+class Context:
+    function_name = 'eventbrite-pipeline'
+    memory_limit_in_mb = 128
+    invoked_function_arn = 'arn:aws:lambda:us-east-1:123456789012:function:eventbrite-pipeline'
+    aws_request_id = 'local'
+
+
+def create_resources():
+    boto3.client('dynamodb').create_table(
+        TableName=os.environ['DYNAMODB_TABLE_NAME'],
+        BillingMode='PAY_PER_REQUEST',
+        AttributeDefinitions=[{'AttributeName': name, 'AttributeType': 'S'} for name in ('PK', 'SK', 'short_id')],
+        KeySchema=[{'AttributeName': 'PK', 'KeyType': 'HASH'}, {'AttributeName': 'SK', 'KeyType': 'RANGE'}],
+        GlobalSecondaryIndexes=[{
+            'IndexName': os.environ['INDEX_NAME'],
+            'KeySchema': [{'AttributeName': 'short_id', 'KeyType': 'HASH'}],
+            'Projection': {'ProjectionType': 'ALL'},
+        }],
+    )
+    sqs = boto3.client('sqs')
+    os.environ['QUEUE_URL'] = sqs.create_queue(QueueName='eventbrite-webhooks')['QueueUrl']
+    os.environ['BADGE_QUEUE_URL'] = sqs.create_queue(
+        QueueName='badge-attendees.fifo', Attributes={'FifoQueue': 'true'}
+    )['QueueUrl']
+    boto3.client('secretsmanager').create_secret(Name=os.environ['SECRET_NAME'], SecretString=TOKEN)
+
+
+def drain(worker, batch_size, max_rounds=50):
+    """Feed the webhook queue to the worker, like the SQS event source does."""
+    sqs = boto3.client('sqs')
+    queue_url = os.environ['QUEUE_URL']
+    invocations = retried = 0
+
+    for _ in range(max_rounds):
+        messages = []
+        while len(messages) < batch_size:
+            response = sqs.receive_message(QueueUrl=queue_url, MaxNumberOfMessages=min(10, batch_size - len(messages)))
+            if not response.get('Messages'):
+                break
+            messages.extend(response['Messages'])
+        if not messages:
+            break
+
+        event = {'Records': [{'messageId': m['MessageId'], 'receiptHandle': m['ReceiptHandle'], 'body': m['Body']} for m in messages]}
+        result = worker.lambda_handler(event, Context())
+        invocations += 1
+
+        failed = {failure['itemIdentifier'] for failure in result['batchItemFailures']}
+        retried += len(failed)
+        for message in messages:
+            if message['MessageId'] in failed:
+                sqs.change_message_visibility(QueueUrl=queue_url, ReceiptHandle=message['ReceiptHandle'], VisibilityTimeout=0)
+            else:
+                sqs.delete_message(QueueUrl=queue_url, ReceiptHandle=message['ReceiptHandle'])
+
+    return invocations, retried
+
+
+def count_badges():
+    sqs = boto3.client('sqs')
+    attributes = sqs.get_queue_attributes(QueueUrl=os.environ['BADGE_QUEUE_URL'], AttributeNames=['ApproximateNumberOfMessages'])
+    return int(attributes['Attributes']['ApproximateNumberOfMessages'])
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Local run of the Eventbrite webhook pipeline')
+    parser.add_argument('--attendees', type=int, default=500)
+    parser.add_argument('--latency-ms', type=float, default=150)
+    parser.add_argument('--error-rate', type=float, default=0.05)
+    parser.add_argument('--batch-size', type=int, default=25)
+    args = parser.parse_args()
+
+    FakeEventbrite.latency = args.latency_ms / 1000
+    FakeEventbrite.error_rate = args.error_rate
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FakeEventbrite)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f'http://127.0.0.1:{server.server_port}/v3/events/1/attendees'
+
+    with mock_aws():
+        create_resources()
+        import eventbrite_webhook
+        import eventbrite_worker
+
+        # Un perfil ya inicializado no se debe sobrescribir
+        table = boto3.resource('dynamodb').Table(os.environ['DYNAMODB_TABLE_NAME'])
+        table.put_item(Item={'PK': 'USER#BC0', 'SK': 'PROFILE', 'user_id': 'BC0', 'first_name': 'Initialized', 'initialized': True})
+
+        start = time.perf_counter()
+        latencies = []
+        for attendee_id in range(args.attendees):
+            body = {'api_url': f'{base_url}/{attendee_id}/', 'config': {'action': 'attendee.updated'}}
+            request_start = time.perf_counter()
+            response = eventbrite_webhook.lambda_handler({'body': json.dumps(body), 'headers': {}}, Context())
+            latencies.append(time.perf_counter() - request_start)
+            assert response['statusCode'] == 200, response
+        # Reenvío del mismo webhook, debe terminar en un solo perfil
+        eventbrite_webhook.lambda_handler({'body': json.dumps({'api_url': f'{base_url}/1/'}), 'headers': {}}, Context())
+        ack_elapsed = time.perf_counter() - start
+
+        start = time.perf_counter()
+        invocations, retried = drain(eventbrite_worker, args.batch_size)
+        worker_elapsed = time.perf_counter() - start
+
+        profiles = table.scan(Select='COUNT', FilterExpression=Attr('SK').eq('PROFILE'))['Count']
+        initialized = table.get_item(Key={'PK': 'USER#BC0', 'SK': 'PROFILE'})['Item']
+        badges = count_badges()
+
+    server.shutdown()
+    latencies.sort()
+    print(f'{args.attendees} webhooks acknowledged in {ack_elapsed:.2f}s '
+          f'(p50 {latencies[len(latencies) // 2] * 1000:.1f} ms, p99 {latencies[int(len(latencies) * 0.99)] * 1000:.1f} ms)')
+    print(f'worker: {invocations} invocations, {retried} retried messages, {FakeEventbrite.requests} Eventbrite calls, {worker_elapsed:.2f}s')
+    print(f'{profiles} profiles, {badges} badge messages')
+
+    assert profiles == args.attendees, 'every attendee should have a profile'
+    assert initialized['first_name'] == 'Initialized', 'initialized profiles must not be overwritten'
+    assert badges == args.attendees, 'every attendee should get a badge message, initialized or not'
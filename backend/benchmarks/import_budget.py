@@ -0,0 +1,104 @@
+"""Measure the import time of every Lambda handler and fail when one goes over budget.
+
+Each module is imported in a fresh interpreter with ``-X importtime`` and the
+cumulative time of the handler module is compared with its budget. Importing a
+handler must not create AWS clients or call AWS, so no credentials are needed.
+
+Usage:
+    python benchmarks/import_budget.py [--runs 5] [--scale 1.0]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+class MissingDependency(Exception):
+    pass
+
+
+FUNCTION_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'function')
+
+# Presupuesto en milisegundos del import de cada handler
+BUDGETS_MS = {
+    'aggregate_stamps': 60,
+    'attendee_api': 250,
+    'batch_stamp_passport': 60,
+    'check_existence': 60,
+    'count_scans': 60,
+    'create_sponsor_jwt': 60,
+    'eventbrite_webhook': 400,
+    'eventbrite_worker': 400,
+    'get_information': 60,
+    'get_passport_status': 60,
+    'sponsor_leads': 60,
+    'stamp_passport': 60,
+    'unlock_activation': 60,
+    'update_fields': 60,
+}
+
+# Módulos que un handler no debería cargar al importarse
+FORBIDDEN_MODULES = ('boto3',)
+
+
+def measure(module):
+    env = dict(
+        os.environ,
+        PYTHONPATH=FUNCTION_DIR,
+        POWERTOOLS_TRACE_DISABLED='true',
+        AWS_DEFAULT_REGION='us-east-1',
+        DYNAMODB_TABLE_NAME='table',
+        INDEX_NAME='index',
+    )
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        env=env, cwd=FUNCTION_DIR, capture_output=True, text=True
+    )
+    if 'ModuleNotFoundError' in result.stderr:
+        raise MissingDependency(result.stderr.strip().splitlines()[-1])
+    if result.returncode != 0:
+        raise RuntimeError(f'Importing {module} failed:\n{result.stderr}')
+
+    cumulative_us = None
+    loaded = set()
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        loaded.add(name.strip())
+        if name.strip() == module:
+            cumulative_us = int(cumulative)
+    return cumulative_us / 1000, loaded
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Handler import time budget')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--scale', type=float, default=1.0, help='Multiply every budget, for slower machines')
+    args = parser.parse_args()
+
+    failures = set()
+    for module, budget in sorted(BUDGETS_MS.items()):
+        timings = []
+        try:
+            for _ in range(args.runs):
+                elapsed, loaded = measure(module)
+                timings.append(elapsed)
+        except MissingDependency as e:
+            print(f'{module:24} skipped ({e})')
+            continue
+        elapsed = statistics.median(timings)
+        budget *= args.scale
+
+        forbidden = [name for name in FORBIDDEN_MODULES if name in loaded]
+        status = 'ok'
+        if elapsed > budget:
+            status = 'OVER BUDGET'
+            failures.add(module)
+        if forbidden:
+            status = f'imports {", ".join(forbidden)}'
+            failures.add(module)
+        print(f'{module:24} {elapsed:8.1f} ms / {budget:6.0f} ms  {status}')
+
+    if failures:
+        sys.exit(f'{len(failures)} handler(s) over their import budget: {", ".join(sorted(failures))}')
@@ -0,0 +1,160 @@
+"""Check the EMF records of the instrumented handlers and measure their overhead.
+
+1. A few requests per handler run against moto with the instrumentation on;
+   the EMF lines they print are parsed, checked against the metric
+   declarations and summarized per function: AWS calls, time in AWS,
+   consumed RCU/WCU (moto reports capacity for some operations only) and
+   response size.
+2. get_information with an in-memory card (no AWS calls) is timed with and
+   without the decorator to show the cost per invocation.
+
+Usage:
+    python benchmarks/instrumentation_benchmark.py [--requests 20] [--overhead-requests 20000]
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import time
+from collections import defaultdict
+
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+os.environ.setdefault('AWS_ACCESS_KEY_ID', 'testing')
+os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'testing')
+os.environ['DYNAMODB_TABLE_NAME'] = 'instrumentation-benchmark'
+os.environ['INDEX_NAME'] = 'ShortIdGSI'
+os.environ['KEYS_INDEX_NAME'] = 'ShortIdKeysGSI'
+os.environ['RATE_LIMIT_ENABLED'] = 'false'
+os.environ['INSTRUMENTATION_ENABLED'] = 'true'
+
+import boto3
+from moto import mock_aws
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'function'))
+
+from models import serialize
+
+
+def create_table(profiles):
+    client = boto3.client('dynamodb')
+    client.create_table(
+        TableName=os.environ['DYNAMODB_TABLE_NAME'],
+        BillingMode='PAY_PER_REQUEST',
+        AttributeDefinitions=[{'AttributeName': name, 'AttributeType': 'S'} for name in ('PK', 'SK', 'short_id')],
+        KeySchema=[{'AttributeName': 'PK', 'KeyType': 'HASH'}, {'AttributeName': 'SK', 'KeyType': 'RANGE'}],
+        GlobalSecondaryIndexes=[
+            {
+                'IndexName': os.environ[name],
+                'KeySchema': [{'AttributeName': 'short_id', 'KeyType': 'HASH'}],
+                'Projection': {'ProjectionType': projection},
+            }
+            for name, projection in (('INDEX_NAME', 'ALL'), ('KEYS_INDEX_NAME', 'KEYS_ONLY'))
+        ],
+    )
+    for n in range(profiles):
+        profile = {
+            'PK': f'USER#{n:025d}', 'SK': 'PROFILE', 'user_id': f'{n:025d}', 'short_id': f'S{n:06d}',
+            'first_name': f'Nombre {n}', 'last_name': 'Apellido', 'company': 'AWS Community', 'role': 'Engineer',
+            'initialized': True, 'pin': '1234',
+            'contact_information': {'email': f'user{n}@example.com', 'phone': '5512345678', 'share_email': True, 'share_phone': False},
+            'social_links': [{'name': 'LinkedIn', 'url': f'https://example.com/{n}'}],
+        }
+        client.put_item(TableName=os.environ['DYNAMODB_TABLE_NAME'], Item={key: serialize(value) for key, value in profile.items()})
+    sponsor = {'PK': 'SPONSOR#1', 'SK': 'PROFILE', 'sponsor_id': '1', 'sponsor_name': 'Sponsor', 'key': 'secret'}
+    client.put_item(TableName=os.environ['DYNAMODB_TABLE_NAME'], Item={key: serialize(value) for key, value in sponsor.items()})
+
+
+def event(query=None, body=None):
+    return {'queryStringParameters': query, 'body': json.dumps(body) if body is not None else None, 'headers': {}}
+
+
+def emf_records(output):
+    records = []
+    for line in output.splitlines():
+        if line.startswith('{') and '"_aws"' in line:
+            record = json.loads(line)
+            for directive in record['_aws']['CloudWatchMetrics']:
+                for dimensions in directive['Dimensions']:
+                    assert all(isinstance(record[name], str) for name in dimensions), record
+                for metric in directive['Metrics']:
+                    assert isinstance(record[metric['Name']], (int, float)), metric
+            records.append(record)
+    return records
+
+
+def summarize(records):
+    by_function = defaultdict(list)
+    for record in records:
+        by_function[record['function']].append(record)
+    print(f'{"function":22s} {"records":>7s} {"cold":>4s} {"calls":>6s} {"aws ms":>7s} {"RCU":>6s} {"WCU":>6s} {"bytes":>6s}  operations')
+    for function, items in sorted(by_function.items()):
+        count = len(items)
+
+        def mean(name):
+            return sum(item.get(name, 0) for item in items) / count
+
+        operations = sorted({operation for item in items for operation in item['calls']})
+        print(f'{function:22s} {count:7d} {sum(item["ColdStart"] for item in items):4d} {mean("AwsCalls"):6.2f} '
+              f'{mean("AwsTime"):7.2f} {mean("ConsumedRCU"):6.2f} {mean("ConsumedWCU"):6.2f} {mean("ResponseBytes"):6.0f}  '
+              + ', '.join(operations))
+
+
+def overhead(requests):
+    import get_information
+    from models import Profile
+    from public_card import PublicCard, render_card
+
+    item = {key: serialize(value) for key, value in {
+        'PK': 'USER#1', 'SK': 'PROFILE', 'user_id': '1', 'short_id': 'ABC1234', 'first_name': 'Nombre',
+        'initialized': True, 'contact_information': {'email': 'user@example.com'},
+    }.items()}
+    card = PublicCard.from_item(render_card(Profile.from_item(item)))
+    get_information.get_card = lambda short_id: card
+    request = event({'short_id': 'ABC1234'})
+
+    timings = {}
+    for name, handler in (('plain', get_information.lambda_handler.__wrapped__), ('instrumented', get_information.lambda_handler)):
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            for _ in range(requests):
+                handler(request, None)
+            timings[name] = (time.perf_counter() - start) / requests * 1e6
+    print(f'get_information: {timings["plain"]:.1f} us plain, {timings["instrumented"]:.1f} us instrumented '
+          f'(+{timings["instrumented"] - timings["plain"]:.1f} us per invocation)')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Handler instrumentation check')
+    parser.add_argument('--requests', type=int, default=20)
+    parser.add_argument('--overhead-requests', type=int, default=20000)
+    args = parser.parse_args()
+
+    with mock_aws():
+        create_table(args.requests)
+        import check_existence
+        import create_sponsor_jwt
+        import get_information
+        import get_passport_status
+        import stamp_passport
+        import unlock_activation
+
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            login = create_sponsor_jwt.lambda_handler(event(body={'sponsor_id': '1', 'sponsor_key': 'secret'}), None)
+            token = json.loads(login['body'])['token']
+            for n in range(args.requests):
+                short_id = f'S{n:06d}'
+                get_information.lambda_handler(event({'short_id': short_id, 'pin': '1234'}), None)
+                check_existence.lambda_handler(event({'short_id': short_id}), None)
+                get_passport_status.lambda_handler(event({'short_id': short_id}), None)
+                unlock_activation.lambda_handler(event({'short_id': short_id, 'value': 'wrong'}), None)
+                stamp_passport.lambda_handler(event(body={'short_id': short_id, 'jwt': token}), None)
+
+        records = emf_records(output.getvalue())
+        assert len(records) == 1 + 5 * args.requests, len(records)
+        assert sum(record['ColdStart'] for record in records) == 1
+        summarize(records)
+
+    overhead(args.overhead_requests)
@@ -0,0 +1,151 @@
+"""Measure sponsor token verification and stamp throughput with and without caches.
+
+1. verify_jwt on the same token: the previous implementation (split, decode,
+   HMAC with a fresh key, JSON parse on every call) against sponsor_auth's
+   verified-token cache.
+2. stamp_passport.lambda_handler with the token cache cleared before every
+   stamp ("before") and warm ("after"). The short_id lookup and the stamp
+   write are replaced with in-memory dicts so the handler's own work is
+   measured rather than moto's.
+3. create_sponsor_jwt logins with and without the sponsor profile cache,
+   counting the GetItem calls.
+
+Usage:
+    python benchmarks/jwt_benchmark.py [--verifications 100000] [--stamps 20000]
+"""
+import argparse
+import base64
+import hashlib
+import hmac
+import json
+import os
+import sys
+import time
+
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+os.environ.setdefault('AWS_ACCESS_KEY_ID', 'testing')
+os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'testing')
+os.environ['DYNAMODB_TABLE_NAME'] = 'jwt-benchmark'
+os.environ['INDEX_NAME'] = 'ShortIdGSI'
+# Las métricas EMF de cada invocación solo ensuciarían la salida
+os.environ['INSTRUMENTATION_ENABLED'] = 'false'
+
+import boto3
+from moto import mock_aws
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'function'))
+
+import sponsor_auth
+from create_sponsor_jwt import jwt
+from models import serialize
+
+
+def base64url_decode(input):
+    rem = len(input) % 4
+    if rem > 0:
+        input += '=' * (4 - rem)
+    return base64.urlsafe_b64decode(input)
+
+
+def verify_jwt_uncached(token, secret_key):
+    # Implementación anterior de stamp_passport.verify_jwt
+    header_b64, payload_b64, signature_b64 = token.split('.')
+    signing_input = f'{header_b64}.{payload_b64}'.encode()
+    signature = base64url_decode(signature_b64)
+    expected_signature = hmac.new(secret_key.encode(), signing_input, hashlib.sha256).digest()
+    if not hmac.compare_digest(signature, expected_signature):
+        return None
+    payload = json.loads(base64url_decode(payload_b64).decode('utf-8'))
+    if 'exp' in payload and time.time() > payload['exp']:
+        return None
+    return payload
+
+
+def rate(function, count):
+    start = time.perf_counter()
+    for _ in range(count):
+        function()
+    return count / (time.perf_counter() - start)
+
+
+class CountingClient:
+    def __init__(self, client):
+        self.client = client
+        self.get_items = 0
+
+    def get_item(self, **kwargs):
+        self.get_items += 1
+        return self.client.get_item(**kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+
+def create_table():
+    client = boto3.client('dynamodb')
+    client.create_table(
+        TableName=os.environ['DYNAMODB_TABLE_NAME'],
+        BillingMode='PAY_PER_REQUEST',
+        AttributeDefinitions=[{'AttributeName': name, 'AttributeType': 'S'} for name in ('PK', 'SK', 'short_id')],
+        KeySchema=[{'AttributeName': 'PK', 'KeyType': 'HASH'}, {'AttributeName': 'SK', 'KeyType': 'RANGE'}],
+        GlobalSecondaryIndexes=[{
+            'IndexName': os.environ['INDEX_NAME'],
+            'KeySchema': [{'AttributeName': 'short_id', 'KeyType': 'HASH'}],
+            'Projection': {'ProjectionType': 'ALL'},
+        }],
+    )
+    sponsor = {'PK': 'SPONSOR#1', 'SK': 'PROFILE', 'sponsor_id': '1', 'sponsor_name': 'Sponsor', 'key': 'secret'}
+    client.put_item(TableName=os.environ['DYNAMODB_TABLE_NAME'], Item={key: serialize(value) for key, value in sponsor.items()})
+
+
+def stamp_rate(stamp_passport, token, stamps, warm):
+    events = [{'body': json.dumps({'short_id': f'S{n:06d}', 'jwt': token}), 'headers': {}} for n in range(stamps)]
+    start = time.perf_counter()
+    for event in events:
+        if not warm:
+            sponsor_auth.clear_cache()
+        response = stamp_passport.lambda_handler(event, None)
+        assert response['statusCode'] == 200, response
+    return stamps / (time.perf_counter() - start)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Sponsor JWT and stamp throughput benchmark')
+    parser.add_argument('--verifications', type=int, default=100000)
+    parser.add_argument('--stamps', type=int, default=20000)
+    parser.add_argument('--logins', type=int, default=200)
+    args = parser.parse_args()
+
+    token = jwt('1', 'Sponsor', sponsor_auth.SECRET_KEY)
+    assert verify_jwt_uncached(token, sponsor_auth.SECRET_KEY) == sponsor_auth.verify_jwt(token, sponsor_auth.SECRET_KEY)
+    assert sponsor_auth.verify_jwt(token[:-2] + 'xx', sponsor_auth.SECRET_KEY) is None
+
+    before = rate(lambda: verify_jwt_uncached(token, sponsor_auth.SECRET_KEY), args.verifications)
+    after = rate(lambda: sponsor_auth.verify_jwt(token, sponsor_auth.SECRET_KEY), args.verifications)
+    print(f'verify_jwt            {before:10.0f}/s uncached  {after:10.0f}/s cached  ({after / before:.1f}x)')
+
+    import stamp_passport
+
+    user_ids = {f'S{n:06d}': f'{n:025d}' for n in range(args.stamps)}
+    stamped = set()
+    stamp_passport.get_user_id = user_ids.get
+    stamp_passport.register_stamp = lambda user_id, sponsor_id, created_at, notes='': stamped.add((user_id, sponsor_id)) is None
+    before = stamp_rate(stamp_passport, token, args.stamps, warm=False)
+    after = stamp_rate(stamp_passport, token, args.stamps, warm=True)
+    print(f'stamp_passport        {before:10.0f}/s uncached  {after:10.0f}/s cached  ({after / before:.1f}x)')
+
+    with mock_aws():
+        create_table()
+        import create_sponsor_jwt
+
+        counting = CountingClient(boto3.client('dynamodb'))
+        sponsor_auth.dynamodb = counting
+        login = {'body': json.dumps({'sponsor_id': '1', 'sponsor_key': 'secret'})}
+        for ttl in (0, 60):
+            sponsor_auth.SPONSOR_CACHE_TTL_SECONDS = ttl
+            sponsor_auth.clear_cache()
+            counting.get_items = 0
+            elapsed = rate(lambda: create_sponsor_jwt.lambda_handler(login, None), args.logins)
+            print(f'sponsor login ttl={ttl:<3d} {elapsed:10.1f}/s  {counting.get_items} GetItem for {args.logins} logins')
+        wrong = create_sponsor_jwt.lambda_handler({'body': json.dumps({'sponsor_id': '1', 'sponsor_key': 'wrong'})}, None)
+        assert wrong['statusCode'] == 403, wrong
@@ -0,0 +1,106 @@
+"""Check that SponsorVisits matches the current report code and time both.
+
+Both sides start from their cache file: the JSON files the scripts used to
+write, and the columnar snapshot.
+
+Usage:
+    python benchmarks/leaderboard_benchmark.py --users 50000 --stamps 200000
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import snapshot
+from leaderboard import SponsorVisits
+
+
+def synthetic_event(users, stamps, sponsors=12):
+    random.seed(2024)
+    profiles = [
+        {'PK': f'USER#{i:025d}', 'SK': 'PROFILE', 'user_id': f'{i:025d}', 'first_name': f'Nombre {i}', 'last_name': f'Apellido {i}', 'scanned_count': random.randint(0, 60)}
+        for i in range(users)
+    ]
+    stamp_items = [
+        {'PK': f'USER#{random.randrange(users):025d}', 'SK': f'SPONSOR#{random.randint(1, sponsors)}#2024-11-09T{i % 24:02d}:{i % 60:02d}:{i % 59:02d}+00:00'}
+        for i in range(stamps)
+    ]
+    return profiles, stamp_items
+
+
+def current_scripts(profiles_filename, stamps_filename):
+    with open(profiles_filename) as f:
+        profiles = json.load(f)
+    with open(stamps_filename) as f:
+        stamp_items = json.load(f)
+
+    # top_sponsors.get_users_with_four_sponsors
+    user_sponsors = defaultdict(list)
+    for item in stamp_items:
+        user_sponsors[item['PK']].append(item['SK'])
+    users_with_four_sponsors = {user for user, sponsors in user_sponsors.items() if len(sponsors) == 4}
+    # analytics.get_most_scans
+    most_scans = sorted(profiles, key=lambda x: x.get('scanned_count', 0), reverse=True)[:10]
+
+    # La misma distribución calculada con diccionarios
+    distinct = {user: {sk.split('#')[1] for sk in sponsors} for user, sponsors in user_sponsors.items()}
+    histogram = defaultdict(int)
+    for profile in profiles:
+        histogram[len(distinct.get(profile['PK'], ()))] += 1
+    reach = defaultdict(int)
+    for sponsors in distinct.values():
+        for sponsor in sponsors:
+            reach[sponsor] += 1
+
+    return users_with_four_sponsors, [profile['scanned_count'] for profile in most_scans], dict(sorted(histogram.items())), dict(reach)
+
+
+def with_snapshot(filename):
+    with snapshot.Snapshot(filename) as event_snapshot:
+        visits = SponsorVisits(event_snapshot)
+        users_with_four_sponsors = {f'USER#{event_snapshot.string(user)}' for user in visits.users_with_stamps(4)}
+        most_scans = [event_snapshot.profiles.value('scanned_count', row) for row in snapshot.get_most_scans(event_snapshot, 10)]
+        reach = {sponsor_id: visitors for sponsor_id, visitors, _ in visits.sponsor_reach()}
+        return users_with_four_sponsors, most_scans, visits.sponsor_histogram(), reach
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Leaderboard benchmark')
+    parser.add_argument('--users', type=int, default=50000)
+    parser.add_argument('--stamps', type=int, default=200000)
+    parser.add_argument('--directory', default='/tmp')
+    args = parser.parse_args()
+
+    profiles, stamp_items = synthetic_event(args.users, args.stamps)
+    profiles_filename = os.path.join(args.directory, 'leaderboard_profiles.json')
+    stamps_filename = os.path.join(args.directory, 'leaderboard_stamps.json')
+    snapshot_filename = os.path.join(args.directory, 'leaderboard_benchmark.bin')
+
+    with open(profiles_filename, 'w') as f:
+        json.dump(profiles, f)
+    with open(stamps_filename, 'w') as f:
+        json.dump(stamp_items, f)
+    builder = snapshot.SnapshotBuilder()
+    for profile in profiles:
+        builder.add_profile(profile)
+    for item in stamp_items:
+        builder.add_stamp(item)
+    builder.write(snapshot_filename)
+    del profiles, stamp_items, builder
+
+    start = time.perf_counter()
+    expected = current_scripts(profiles_filename, stamps_filename)
+    current = time.perf_counter() - start
+
+    start = time.perf_counter()
+    result = with_snapshot(snapshot_filename)
+    columnar = time.perf_counter() - start
+
+    assert result == expected, 'Snapshot results differ from the current scripts'
+    print(f"{len(expected[0])} users with exactly 4 sponsors, sponsors histogram {expected[2]}")
+    print(f"current scripts: {current * 1000:.0f} ms, snapshot columns: {columnar * 1000:.0f} ms ({current / columnar:.1f}x)")
@@ -0,0 +1,220 @@
+"""Export a sponsor's leads through /sponsor/leads and compare it with a table scan.
+
+Attendees are stamped by the sponsor under test and by other sponsors (some
+notes start with "=" to check the CSV escaping). The stamps go through
+aggregate_stamps as stream records, which writes the LEAD items, and the
+sponsor then downloads every page in JSON, NDJSON and CSV with the
+Authorization header. Each export is checked: one row per distinct attendee,
+the stamp counts, e-mail and phone only when the attendee shares them, and
+formula-looking cells escaped.
+
+For the cost it counts the DynamoDB calls of an export and estimates the
+read units (0.5 RCU per 4 KB, eventually consistent) of the LEAD query pages
+and the BatchGetItem profile reads, next to the scan of the whole table that
+top_sponsors.py needs to answer "who visited sponsor X". BatchGetItem rounds
+every profile up to 4 KB, so an export costs about 0.5 RCU per lead, which
+is what reading the share flags at download time costs; the scan grows with
+the whole table (every sponsor, attendee and aggregate) and has to run to
+the end before the first row of the sponsor is known.
+
+Most of the run time (a few minutes at the defaults) is moto replaying the
+stream; lower --leads and --attendees for a quick check.
+
+Usage:
+    python benchmarks/leads_benchmark.py [--leads 5000] [--attendees 6000] [--page-size 1000]
+"""
+import argparse
+import contextlib
+import csv
+import io
+import json
+import math
+import os
+import random
+import sys
+import time
+from collections import Counter
+
+from passport_progress_benchmark import item_size
+
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+os.environ.setdefault('AWS_ACCESS_KEY_ID', 'testing')
+os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'testing')
+os.environ['DYNAMODB_TABLE_NAME'] = 'leads-benchmark'
+os.environ['INSTRUMENTATION_ENABLED'] = 'false'
+
+import boto3
+from moto import mock_aws
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'function'))
+
+from models import serialize
+
+TABLE = os.environ['DYNAMODB_TABLE_NAME']
+SPONSOR_ID = '1'
+
+
+class CallCounter:
+    def __init__(self):
+        self.calls = Counter()
+
+    def __call__(self, model, **kwargs):
+        self.calls[model.name] += 1
+
+
+def seed(client, args, rng):
+    """Write profiles and stamps; return the profiles and the stamps per lead of SPONSOR_ID."""
+    profiles = {}
+    expected = {}
+    items = []
+    for n in range(args.attendees):
+        user_id = f'{n:025d}'
+        profile = {
+            'PK': f'USER#{user_id}', 'SK': 'PROFILE', 'user_id': user_id, 'short_id': f'L{n:06d}',
+            'first_name': f'Nombre {n}', 'last_name': 'Apellido', 'company': '=HYPERLINK("x")' if n % 97 == 0 else 'AWS Community',
+            'role': 'Engineer', 'initialized': True, 'pin': '1234',
+            'contact_information': {
+                'email': f'user{n}@example.com', 'phone': f'55{n:08d}',
+                'share_email': rng.random() < 0.7, 'share_phone': rng.random() < 0.4,
+            },
+        }
+        profiles[user_id] = profile
+        items.append(profile)
+
+        sponsors = rng.sample(range(2, 13), rng.randint(0, 2))
+        if n < args.leads:
+            sponsors.append(int(SPONSOR_ID))
+        for sponsor in sponsors:
+            stamps = rng.randint(1, 2)
+            if sponsor == int(SPONSOR_ID):
+                expected[user_id] = stamps
+            for k in range(stamps):
+                notes = rng.choice(['', 'Interesado en la demo', '=1+1', 'Pidió precios'])
+                stamp = {'PK': f'USER#{user_id}', 'SK': f'SPONSOR#{sponsor}#2024-10-05T{10 + k}:{n % 60:02d}:00+00:00'}
+                if notes:
+                    stamp['notes'] = notes
+                items.append(stamp)
+    for start in range(0, len(items), 25):
+        client.batch_write_item(RequestItems={
+            TABLE: [{'PutRequest': {'Item': {key: serialize(value) for key, value in item.items()}}} for item in items[start:start + 25]],
+        })
+    return profiles, expected, [item for item in items if item['SK'].startswith('SPONSOR#')]
+
+
+def replay_stream(stamps):
+    import aggregate_stamps
+
+    records = [
+        {'eventName': 'INSERT', 'dynamodb': {
+            'Keys': {'PK': serialize(stamp['PK']), 'SK': serialize(stamp['SK'])},
+            'NewImage': {key: serialize(value) for key, value in stamp.items()},
+        }}
+        for stamp in stamps
+    ]
+    with contextlib.redirect_stdout(io.StringIO()):
+        for start in range(0, len(records), 100):
+            aggregate_stamps.lambda_handler({'Records': records[start:start + 100]}, None)
+
+
+def download(handler, token, output_format, page_size):
+    """Fetch every page; return the rows, the number of pages and the elapsed seconds."""
+    rows = []
+    pages = 0
+    cursor = None
+    start = time.perf_counter()
+    while True:
+        params = {'format': output_format, 'limit': str(page_size)}
+        if cursor:
+            params['cursor'] = cursor
+        response = handler({'queryStringParameters': params, 'headers': {'Authorization': f'Bearer {token}'}}, None)
+        assert response['statusCode'] == 200, response
+        pages += 1
+        body = response['body']
+        if output_format == 'json':
+            page = json.loads(body)
+            rows.extend(page['leads'])
+            cursor = page['next_cursor']
+        elif output_format == 'ndjson':
+            rows.extend(json.loads(line) for line in body.splitlines())
+            cursor = response['headers'].get('X-Next-Cursor')
+        else:
+            reader = csv.DictReader(io.StringIO(body))
+            rows.extend({key: value or None for key, value in row.items()} for row in reader)
+            cursor = response['headers'].get('X-Next-Cursor')
+        if not cursor:
+            return rows, pages, time.perf_counter() - start
+
+
+def check(rows, output_format, profiles, expected):
+    assert len(rows) == len(expected), (output_format, len(rows), len(expected))
+    by_short_id = {profile['short_id']: profile for profile in profiles.values()}
+    for row in rows:
+        profile = by_short_id[row['short_id']]
+        contact = profile['contact_information']
+        assert int(row['stamp_count']) == expected[profile['user_id']], row
+        assert (row['email'] is not None) == contact['share_email'], row
+        assert (row['phone'] is not None) == contact['share_phone'], row
+        if output_format == 'csv':
+            assert not any((value or '').startswith(('=', '+', '@')) for value in row.values()), row
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Sponsor leads export benchmark')
+    parser.add_argument('--leads', type=int, default=5000)
+    parser.add_argument('--attendees', type=int, default=6000)
+    parser.add_argument('--page-size', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    with mock_aws():
+        client = boto3.client('dynamodb')
+        client.create_table(
+            TableName=TABLE,
+            BillingMode='PAY_PER_REQUEST',
+            AttributeDefinitions=[{'AttributeName': name, 'AttributeType': 'S'} for name in ('PK', 'SK')],
+            KeySchema=[{'AttributeName': 'PK', 'KeyType': 'HASH'}, {'AttributeName': 'SK', 'KeyType': 'RANGE'}],
+        )
+        profiles, expected, stamps = seed(client, args, rng)
+        start = time.perf_counter()
+        replay_stream(stamps)
+        print(f'{len(stamps)} stamps through aggregate_stamps in {time.perf_counter() - start:.1f} s')
+
+        import sponsor_leads
+        from clients import get_client
+        from create_sponsor_jwt import jwt
+        from sponsor_auth import SECRET_KEY
+
+        token = jwt(SPONSOR_ID, 'Sponsor', SECRET_KEY)
+        assert sponsor_leads.lambda_handler({'queryStringParameters': {}, 'headers': {}}, None)['statusCode'] == 403
+        assert sponsor_leads.lambda_handler(
+            {'queryStringParameters': {'jwt': token, 'cursor': '!!'}, 'headers': {}}, None,
+        )['statusCode'] == 400
+
+        counter = CallCounter()
+        get_client('dynamodb').meta.events.register('before-call.dynamodb.*', counter)
+
+        print(f'{"format":7s} {"rows":>6s} {"pages":>5s} {"queries":>7s} {"batch gets":>10s} {"seconds":>8s}')
+        for output_format in ('json', 'ndjson', 'csv'):
+            counter.calls.clear()
+            rows, pages, elapsed = download(sponsor_leads.lambda_handler, token, output_format, args.page_size)
+            check(rows, output_format, profiles, expected)
+            print(f'{output_format:7s} {len(rows):6d} {pages:5d} {counter.calls["Query"]:7d} '
+                  f'{counter.calls["BatchGetItem"]:10d} {elapsed:8.2f}')
+
+        sizes = {}
+        for page in client.get_paginator('scan').paginate(TableName=TABLE):
+            for item in page['Items']:
+                sizes[(item['PK']['S'], item['SK']['S'])] = item_size(item)
+
+    lead_bytes = [size for (pk, sk), size in sizes.items() if pk == f'SPONSOR#{SPONSOR_ID}' and sk.startswith('LEAD#')]
+    profile_sizes = [sizes[(f'USER#{user_id}', 'PROFILE')] for user_id in expected]
+    export_units = (
+        math.ceil(sum(lead_bytes) / 4096) * 0.5
+        + sum(math.ceil(size / 4096) * 0.5 for size in profile_sizes)
+    )
+    scan_units = math.ceil(sum(sizes.values()) / 4096) * 0.5
+    scan_pages = math.ceil(sum(sizes.values()) / 2 ** 20)
+    print(f'all formats match the stamps and the share flags; {len(sizes)} items in the table')
+    print(f'export: {export_units:8.1f} RCU (LEAD query {math.ceil(sum(lead_bytes) / 4096) * 0.5:.1f} + profiles)')
+    print(f'scan:   {scan_units:8.1f} RCU (every item, before the FilterExpression, in at least {scan_pages} pages)')
@@ -0,0 +1,475 @@
+"""Load-test the API handlers in-process against a local DynamoDB/SQS.
+
+Every API function in template.yaml is invoked through its lambda_handler
+inside moto, in one process that stays warm like a Lambda environment
+(module caches, the telemetry thread and the shared clients are kept
+between requests). The table mirrors the template (ShortIdGSI,
+ShortIdKeysGSI) and is seeded with attendees whose fields are drawn from
+user_profiles.json, sponsors shaped like sponsor.json and the public cards
+of the initialized profiles.
+
+A traffic mix picks the operation of every request by weight:
+
+- badge_scan_rush: profile views from badge scans, some passport checks
+- stamp_burst: sponsor tablets stamping passports, online and in batches
+- activation_wave: attendees validating, unlocking and filling their profiles
+- all: every handler with the same weight
+
+For each operation it reports the status codes, a latency histogram with
+p50/p90/p99, the AWS calls per request (counted with a botocore hook on the
+shared clients; the background SQS sends of the telemetry thread are
+reported apart) and the memory allocated per request, measured with
+tracemalloc in a separate pass so it does not skew the latencies.
+
+The latencies and allocations include moto's own work (it copies the
+tables on every transaction), so compare them between runs of this
+harness, not with production numbers; the AWS call counts carry over.
+moto applies each DynamoDB request under a lock here, as DynamoDB applies
+them atomically; batch_stamp_passport sends its transactions from threads.
+
+Usage:
+    python benchmarks/load_test.py [--mix badge_scan_rush] [--requests 2000] [--attendees 300]
+        [--json results.json] [--histogram]
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import string
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta, timezone
+
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+os.environ.setdefault('AWS_ACCESS_KEY_ID', 'testing')
+os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'testing')
+os.environ['DYNAMODB_TABLE_NAME'] = 'load-test'
+os.environ['INDEX_NAME'] = 'ShortIdGSI'
+os.environ['KEYS_INDEX_NAME'] = 'ShortIdKeysGSI'
+# Las métricas EMF de cada invocación solo ensuciarían la salida
+os.environ['INSTRUMENTATION_ENABLED'] = 'false'
+
+import boto3
+from moto import mock_aws
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(BACKEND, 'function'))
+
+OPERATIONS = (
+    'get_information',
+    'check_existence',
+    'unlock_activation',
+    'update_fields',
+    'get_passport_status',
+    'stamp_passport',
+    'batch_stamp_passport',
+    'create_sponsor_jwt',
+)
+
+MIXES = {
+    'badge_scan_rush': {'get_information': 80, 'get_passport_status': 10, 'check_existence': 5, 'stamp_passport': 5},
+    'stamp_burst': {
+        'stamp_passport': 60, 'batch_stamp_passport': 10, 'get_passport_status': 15,
+        'get_information': 10, 'create_sponsor_jwt': 5,
+    },
+    'activation_wave': {'check_existence': 30, 'unlock_activation': 30, 'update_fields': 25, 'get_information': 15},
+    'all': {operation: 1 for operation in OPERATIONS},
+}
+
+# Límites superiores de las cubetas del histograma, en milisegundos
+BUCKETS_MS = (0.1, 0.2, 0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, float('inf'))
+
+
+class Dataset:
+    """Attendees and sponsors generated from the shape of the sample exports."""
+
+    def __init__(self, attendees, sponsors, rng):
+        with open(os.path.join(BACKEND, 'user_profiles.json')) as f:
+            samples = json.load(f)
+        with open(os.path.join(os.path.dirname(BACKEND), 'sponsor.json')) as f:
+            sponsor_shape = json.load(f)
+
+        def values(field):
+            return [sample[field] for sample in samples if sample.get(field)]
+
+        self.rng = rng
+        self.initialized_share = sum(sample['initialized'] for sample in samples) / len(samples)
+        self.choices = {field: values(field) for field in (
+            'first_name', 'last_name', 'company', 'role', 'gender', 'profile', 'area_of_interest', 'age_range',
+        )}
+        self.link_names = sorted({link['name'] for sample in samples for link in sample.get('social_links', [])})
+        self.profiles = [self.attendee(n) for n in range(attendees)]
+        self.sponsors = [
+            {**_plain(sponsor_shape),
+             'PK': f'SPONSOR#{n}', 'sponsor_id': str(n), 'sponsor_name': f'Sponsor {n}', 'key': f'key-{n}'}
+            for n in range(1, sponsors + 1)
+        ]
+
+    def attendee(self, n):
+        rng = self.rng
+        user_id = f'{n:025d}'
+        short_id = ''.join(rng.choices(string.ascii_uppercase + string.digits, k=7))
+        profile = {
+            'PK': f'USER#{user_id}',
+            'SK': 'PROFILE',
+            'user_id': user_id,
+            'short_id': short_id,
+            'first_name': rng.choice(self.choices['first_name']),
+            'last_name': rng.choice(self.choices['last_name']),
+            'company': rng.choice(self.choices['company']),
+            'role': rng.choice(self.choices['role']),
+            'gender': rng.choice(self.choices['gender']),
+            'initialized': rng.random() < self.initialized_share,
+            'contact_information': {'email': f'attendee{n}@example.com', 'phone': f'55{rng.randrange(10 ** 8):08d}'},
+        }
+        if profile['initialized']:
+            profile.update({
+                'pin': f'{rng.randrange(10000):04d}',
+                'profile': rng.choice(self.choices['profile']),
+                'area_of_interest': rng.choice(self.choices['area_of_interest']),
+                'age_range': rng.choice(self.choices['age_range']),
+                'social_links': [{'name': name, 'url': f'https://example.com/{name.lower()}/{n}'} for name in self.link_names],
+                'scanned_count': rng.randrange(20),
+            })
+            profile['contact_information'].update(share_email=rng.random() < 0.7, share_phone=rng.random() < 0.4)
+        return profile
+
+
+def _plain(item):
+    from models import deserialize_item
+
+    return deserialize_item(item)
+
+
+def create_resources(dataset):
+    from models import Profile, serialize
+    from public_card import render_card
+
+    client = boto3.client('dynamodb')
+    client.create_table(
+        TableName=os.environ['DYNAMODB_TABLE_NAME'],
+        BillingMode='PAY_PER_REQUEST',
+        AttributeDefinitions=[{'AttributeName': name, 'AttributeType': 'S'} for name in ('PK', 'SK', 'short_id')],
+        KeySchema=[{'AttributeName': 'PK', 'KeyType': 'HASH'}, {'AttributeName': 'SK', 'KeyType': 'RANGE'}],
+        GlobalSecondaryIndexes=[
+            {
+                'IndexName': os.environ['INDEX_NAME'],
+                'KeySchema': [{'AttributeName': 'short_id', 'KeyType': 'HASH'}],
+                'Projection': {'ProjectionType': 'ALL'},
+            },
+            {
+                'IndexName': os.environ['KEYS_INDEX_NAME'],
+                'KeySchema': [{'AttributeName': 'short_id', 'KeyType': 'HASH'}],
+                'Projection': {'ProjectionType': 'KEYS_ONLY'},
+            },
+        ],
+    )
+    items = []
+    for profile in dataset.profiles:
+        item = {key: serialize(value) for key, value in profile.items()}
+        items.append(item)
+        if profile['initialized']:
+            items.append(render_card(Profile.from_item(item)))
+    items.extend({key: serialize(value) for key, value in sponsor.items()} for sponsor in dataset.sponsors)
+    for start in range(0, len(items), 25):
+        client.batch_write_item(RequestItems={
+            os.environ['DYNAMODB_TABLE_NAME']: [{'PutRequest': {'Item': item}} for item in items[start:start + 25]],
+        })
+
+    os.environ['QUEUE_URL'] = boto3.client('sqs').create_queue(QueueName='count-legitimate-scans')['QueueUrl']
+
+
+class Traffic:
+    """Builds the API Gateway event of each operation from the current state of the data."""
+
+    def __init__(self, dataset, rng):
+        from create_sponsor_jwt import jwt
+        from sponsor_auth import SECRET_KEY
+
+        self.rng = rng
+        self.initialized = [profile for profile in dataset.profiles if profile['initialized']]
+        self.pending = [profile for profile in dataset.profiles if not profile['initialized']]
+        self.everyone = dataset.profiles
+        self.sponsors = dataset.sponsors
+        self.tokens = [jwt(sponsor['sponsor_id'], sponsor['sponsor_name'], SECRET_KEY) for sponsor in dataset.sponsors]
+        # (perfil, unlock_key) desbloqueados que todavía no llenan su perfil
+        self.unlocked = []
+        self.devices = [f'device-{n}' for n in range(len(dataset.profiles) * 2)]
+        self.ips = [f'198.51.100.{n}' for n in range(1, 255)]
+
+    def event(self, query=None, body=None):
+        return {
+            'queryStringParameters': query,
+            'body': json.dumps(body) if body is not None else None,
+            'headers': {},
+            'requestContext': {'identity': {'sourceIp': self.rng.choice(self.ips)}},
+        }
+
+    def build(self, operation):
+        """Return (operation, event, profile); operations without data fall back to another one."""
+        rng = self.rng
+        if operation == 'update_fields' and not self.unlocked:
+            operation = 'unlock_activation'
+        if operation == 'unlock_activation' and not self.pending:
+            operation = 'check_existence'
+
+        if operation == 'get_information':
+            profile = rng.choice(self.initialized)
+            query = {'short_id': profile['short_id'], 'device': rng.choice(self.devices)}
+            if rng.random() < 0.25:
+                query['pin'] = profile['pin']
+            return operation, self.event(query), profile
+        if operation == 'check_existence':
+            profile = rng.choice(self.everyone)
+            return operation, self.event({'short_id': profile['short_id']}), profile
+        if operation == 'unlock_activation':
+            profile = rng.choice(self.pending)
+            value = profile['contact_information']['email'] if rng.random() < 0.9 else 'wrong@example.com'
+            return operation, self.event({'short_id': profile['short_id'], 'value': value}), profile
+        if operation == 'update_fields':
+            profile, unlock_key = self.unlocked.pop(rng.randrange(len(self.unlocked)))
+            contact = profile['contact_information']
+            body = {
+                'short_id': profile['short_id'], 'unlock_key': unlock_key,
+                'company': profile['company'], 'role': profile['role'],
+                'email': contact['email'], 'phone': contact['phone'],
+                'share_email': True, 'share_phone': rng.random() < 0.5, 'pin': '1234',
+                'social_links': [{'name': 'LinkedIn', 'url': f'https://linkedin.com/in/{profile["user_id"]}'}],
+                'gender': profile['gender'], 'profile': 'Estudiante', 'age_range': '18-24', 'area_of_interest': 'Serverless',
+            }
+            return operation, self.event(body=body), profile
+        if operation == 'get_passport_status':
+            profile = rng.choice(self.everyone)
+            return operation, self.event({'short_id': profile['short_id']}), profile
+        if operation == 'stamp_passport':
+            profile = rng.choice(self.initialized)
+            body = {'short_id': profile['short_id'], 'jwt': rng.choice(self.tokens), 'notes': 'Interesado en la demo'}
+            return operation, self.event(body=body), profile
+        if operation == 'batch_stamp_passport':
+            now = datetime.now(timezone.utc)
+            stamps = [
+                {
+                    'short_id': rng.choice(self.initialized)['short_id'],
+                    'scanned_at': (now - timedelta(minutes=rng.randrange(120))).isoformat(),
+                }
+                for _ in range(rng.randint(5, 25))
+            ]
+            return operation, self.event(body={'jwt': rng.choice(self.tokens), 'stamps': stamps}), None
+        if operation == 'create_sponsor_jwt':
+            sponsor = rng.choice(self.sponsors)
+            return operation, self.event(body={'sponsor_id': sponsor['sponsor_id'], 'sponsor_key': sponsor['key']}), sponsor
+        raise ValueError(f'Unknown operation {operation}')
+
+    def observe(self, operation, profile, response):
+        # Los desbloqueos exitosos alimentan las actualizaciones de perfil
+        if operation == 'unlock_activation' and response['statusCode'] == 200:
+            self.pending.remove(profile)
+            self.unlocked.append((profile, json.loads(response['body'])['unlock_key']))
+        elif operation == 'update_fields' and response['statusCode'] == 200:
+            self.initialized.append({**profile, 'pin': '1234'})
+
+
+class CallCounter:
+    """botocore before-call hook that attributes AWS calls to the running request."""
+
+    def __init__(self):
+        self.active = False
+        self.request = Counter()
+        self.background = Counter()
+
+    def __call__(self, model, **kwargs):
+        name = f'{model.service_model.service_name}.{model.name}'
+        # El hilo de telemetría envía a SQS fuera de las requests
+        if self.active and threading.current_thread().name != 'telemetry':
+            self.request[name] += 1
+        else:
+            self.background[name] += 1
+
+    def start(self):
+        self.request = Counter()
+        self.active = True
+
+    def stop(self):
+        self.active = False
+        return self.request
+
+
+class Stats:
+    def __init__(self):
+        self.latencies = []
+        self.statuses = Counter()
+        self.calls = Counter()
+        self.allocated = []
+
+    def add(self, latency, status, calls):
+        self.latencies.append(latency)
+        self.statuses[status] += 1
+        self.calls.update(calls)
+
+    def percentile(self, fraction):
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))] * 1000
+
+    def histogram(self):
+        counts = [0] * len(BUCKETS_MS)
+        for latency in self.latencies:
+            ms = latency * 1000
+            counts[next(index for index, limit in enumerate(BUCKETS_MS) if ms <= limit)] += 1
+        return counts
+
+    def to_dict(self):
+        count = len(self.latencies)
+        return {
+            'requests': count,
+            'statuses': {str(status): n for status, n in sorted(self.statuses.items())},
+            'errors': sum(n for status, n in self.statuses.items() if status >= 500),
+            'latency_ms': {
+                'mean': sum(self.latencies) / count * 1000,
+                'p50': self.percentile(0.5),
+                'p90': self.percentile(0.9),
+                'p99': self.percentile(0.99),
+                'max': max(self.latencies) * 1000,
+            },
+            'histogram_ms': [[limit if limit != float('inf') else None, n] for limit, n in zip(BUCKETS_MS, self.histogram())],
+            'aws_calls_per_request': {name: n / count for name, n in sorted(self.calls.items())},
+            'allocated_kib_per_request': sum(self.allocated) / len(self.allocated) / 1024 if self.allocated else None,
+        }
+
+
+def serialize_dynamodb():
+    """Make moto apply one DynamoDB request at a time.
+
+    moto checks a transaction's conditions and copies the tables without a
+    lock, so transactions sent from several threads can corrupt each other.
+    """
+    from moto.dynamodb.responses import DynamoHandler
+
+    lock = threading.Lock()
+    call_action = DynamoHandler.call_action
+
+    def serialized(self):
+        with lock:
+            return call_action(self)
+
+    DynamoHandler.call_action = serialized
+
+
+def invoke(handlers, counter, traffic, operation):
+    operation, event, profile = traffic.build(operation)
+    counter.start()
+    start = time.perf_counter()
+    response = handlers[operation](event, None)
+    latency = time.perf_counter() - start
+    calls = counter.stop()
+    traffic.observe(operation, profile, response)
+    return operation, latency, response['statusCode'], calls
+
+
+def run(args):
+    rng = random.Random(args.seed)
+    serialize_dynamodb()
+    with mock_aws():
+        dataset = Dataset(args.attendees, args.sponsors, rng)
+        create_resources(dataset)
+
+        handlers = {}
+        for operation in OPERATIONS:
+            handlers[operation] = __import__(operation).lambda_handler
+        from clients import get_client
+
+        counter = CallCounter()
+        for service in ('dynamodb', 'sqs'):
+            get_client(service).meta.events.register('before-call.*.*', counter)
+
+        traffic = Traffic(dataset, rng)
+        mix = MIXES[args.mix]
+        operations, weights = list(mix), list(mix.values())
+        stats = defaultdict(Stats)
+
+        for _ in range(args.warmup):
+            invoke(handlers, counter, traffic, rng.choices(operations, weights)[0])
+        counter.background.clear()
+
+        start = time.perf_counter()
+        for _ in range(args.requests):
+            operation, latency, status, calls = invoke(handlers, counter, traffic, rng.choices(operations, weights)[0])
+            stats[operation].add(latency, status, calls)
+        elapsed = time.perf_counter() - start
+
+        # Pasada aparte con tracemalloc, que hace más lentas las requests
+        tracemalloc.start()
+        for operation in list(stats):
+            for _ in range(args.allocation_samples):
+                tracemalloc.reset_peak()
+                before = tracemalloc.get_traced_memory()[0]
+                operation_run, _, _, _ = invoke(handlers, counter, traffic, operation)
+                stats[operation_run].allocated.append(tracemalloc.get_traced_memory()[1] - before)
+        tracemalloc.stop()
+
+        from telemetry import flush_all
+
+        flush_all(timeout=10)
+
+    return {
+        'mix': args.mix,
+        'requests': args.requests,
+        'attendees': args.attendees,
+        'sponsors': args.sponsors,
+        'seed': args.seed,
+        'python': platform.python_version(),
+        'elapsed_seconds': elapsed,
+        'throughput_rps': args.requests / elapsed,
+        'operations': {operation: stats[operation].to_dict() for operation in sorted(stats)},
+        'background_aws_calls': dict(sorted(counter.background.items())),
+    }
+
+
+def report(results, histogram):
+    print(f'mix {results["mix"]}: {results["requests"]} requests in {results["elapsed_seconds"]:.1f} s '
+          f'({results["throughput_rps"]:.0f} req/s), {results["attendees"]} attendees')
+    print(f'{"operation":22s} {"reqs":>6s} {"5xx":>4s} {"p50 ms":>8s} {"p90 ms":>8s} {"p99 ms":>8s} '
+          f'{"calls/req":>9s} {"KiB/req":>8s}  statuses')
+    for operation, result in results['operations'].items():
+        latency = result['latency_ms']
+        calls = sum(result['aws_calls_per_request'].values())
+        allocated = result['allocated_kib_per_request']
+        print(f'{operation:22s} {result["requests"]:6d} {result["errors"]:4d} {latency["p50"]:8.2f} {latency["p90"]:8.2f} '
+              f'{latency["p99"]:8.2f} {calls:9.2f} {allocated if allocated is not None else 0:8.1f}  '
+              + ' '.join(f'{status}:{n}' for status, n in result['statuses'].items()))
+        for name, per_request in result['aws_calls_per_request'].items():
+            print(f'{"":24s}{name:36s} {per_request:6.2f}/req')
+        if histogram:
+            largest = max(n for _, n in result['histogram_ms'])
+            for limit, n in result['histogram_ms']:
+                label = f'<= {limit:g} ms' if limit is not None else '> 1000 ms'
+                print(f'{"":24s}{label:>12s} {n:6d} {"#" * round(40 * n / largest) if largest else ""}')
+    if results['background_aws_calls']:
+        print('background: ' + ', '.join(f'{name} {n}' for name, n in results['background_aws_calls'].items()))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='In-process load test of the API handlers')
+    parser.add_argument('--mix', choices=sorted(MIXES), default='badge_scan_rush')
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--warmup', type=int, default=100)
+    parser.add_argument('--attendees', type=int, default=300)
+    parser.add_argument('--sponsors', type=int, default=10)
+    parser.add_argument('--allocation-samples', type=int, default=20, help='Requests per operation measured with tracemalloc')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--rate-limit', action='store_true', help='Keep the short_id rate limits on')
+    parser.add_argument('--histogram', action='store_true')
+    parser.add_argument('--json', help='Write the results to this file')
+    args = parser.parse_args()
+
+    # Todo el tráfico sale de pocas IPs simuladas, así que por defecto no se limita
+    os.environ['RATE_LIMIT_ENABLED'] = 'true' if args.rate_limit else 'false'
+
+    results = run(args)
+    report(results, args.histogram)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
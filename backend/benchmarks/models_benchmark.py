@@ -0,0 +1,129 @@
+"""Compare ways of reading a profile item returned by the low-level client.
+
+Reads the attributes get_information and update_fields use from a synthetic
+DynamoDB JSON profile with:
+
+- nested `.get(...)` chains, as the handlers did before models.py
+- boto3's TypeDeserializer followed by dict lookups
+- models.Profile.from_item (single deserializer + typed record)
+- models.Profile.from_item on an item projected to the attributes the card uses
+
+Usage:
+    python benchmarks/models_benchmark.py [--items 20000] [--links 4]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'function'))
+
+from boto3.dynamodb.types import TypeDeserializer
+
+from models import Profile, deserialize_item, serialize
+
+CARD_ATTRIBUTES = ('PK', 'first_name', 'last_name', 'company', 'role', 'gender', 'pin', 'unlock_key',
+                   'contact_information', 'social_links')
+
+
+def make_item(n, links):
+    return {key: serialize(value) for key, value in {
+        'PK': f'USER#BC{n}',
+        'SK': 'PROFILE',
+        'user_id': f'BC{n}',
+        'short_id': f'S{n:06d}',
+        'first_name': f'Name{n}',
+        'last_name': 'Test',
+        'company': 'Example',
+        'role': 'Developer',
+        'gender': 'Prefer not to say',
+        'pin': '1234',
+        'initialized': True,
+        'scanned_count': n % 40,
+        'completed_passport': False,
+        'contact_information': {'email': f'name{n}@example.com', 'phone': '5512345678', 'share_email': True, 'share_phone': False},
+        'social_links': [{'name': f'link{i}', 'url': f'https://example.com/{n}/{i}'} for i in range(links)],
+        'profile': 'Developer',
+        'age_range': '25-34',
+        'area_of_interest': 'Cloud',
+    }.items()}
+
+
+def read_with_get_chains(item):
+    contact_info = item.get('contact_information', {}).get('M', {})
+    return (
+        item.get('first_name', {}).get('S', ''),
+        item.get('last_name', {}).get('S', ''),
+        item.get('company', {}).get('S', ''),
+        item.get('role', {}).get('S', ''),
+        item.get('pin', {}).get('S'),
+        contact_info.get('email', {}).get('S'),
+        contact_info.get('share_email', {}).get('BOOL', False),
+        [link.get('M', {}).get('url', {}).get('S') for link in item.get('social_links', {}).get('L', [])],
+    )
+
+
+def read_with_type_deserializer(item, deserializer=TypeDeserializer()):
+    data = {key: deserializer.deserialize(value) for key, value in item.items()}
+    contact_info = data.get('contact_information') or {}
+    return (
+        data.get('first_name', ''),
+        data.get('last_name', ''),
+        data.get('company', ''),
+        data.get('role', ''),
+        data.get('pin'),
+        contact_info.get('email'),
+        bool(contact_info.get('share_email')),
+        [link.get('url') for link in data.get('social_links') or []],
+    )
+
+
+def read_with_profile(item):
+    profile = Profile.from_item(item)
+    return (
+        profile.first_name,
+        profile.last_name,
+        profile.company,
+        profile.role,
+        profile.pin,
+        profile.contact_information.email,
+        profile.contact_information.share_email,
+        [link.url for link in profile.social_links],
+    )
+
+
+def run(reader, items, rounds):
+    best = float('inf')
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for item in items:
+            reader(item)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Profile item deserialization benchmark')
+    parser.add_argument('--items', type=int, default=20000)
+    parser.add_argument('--links', type=int, default=4)
+    parser.add_argument('--rounds', type=int, default=5)
+    args = parser.parse_args()
+
+    items = [make_item(n, args.links) for n in range(args.items)]
+    # Lo que devolvería un GetItem/Query con ProjectionExpression
+    projected = [{key: item[key] for key in CARD_ATTRIBUTES if key in item} for item in items]
+
+    expected = [read_with_get_chains(item) for item in items]
+    for reader in (read_with_type_deserializer, read_with_profile):
+        assert [reader(item) for item in items] == expected, f'{reader.__name__} reads different values'
+    assert [read_with_profile(item) for item in projected] == expected
+    assert deserialize_item(items[0])['scanned_count'] == 0
+
+    results = [
+        ('nested .get chains', run(read_with_get_chains, items, args.rounds)),
+        ('boto3 TypeDeserializer', run(read_with_type_deserializer, items, args.rounds)),
+        ('Profile.from_item', run(read_with_profile, items, args.rounds)),
+        ('Profile.from_item (projected)', run(read_with_profile, projected, args.rounds)),
+    ]
+    for name, elapsed in results:
+        print(f'{name:32s} {elapsed * 1000:8.1f} ms  {elapsed / args.items * 1e6:6.2f} us/item')
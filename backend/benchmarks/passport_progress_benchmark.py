@@ -0,0 +1,234 @@
+"""Compare the cost of reading an attendee's passport progress three ways.
+
+- rollup: get_passport_status reads the PASSPORT item that aggregate_stamps
+  keeps from the stream (one GetItem), falling back to the key-range query
+  when it does not exist yet
+- key range: one `PK = USER#... AND begins_with(SK, "SPONSOR#")` query
+  projected to SK
+- fan-out: one query per sponsor, as a client checking each sponsor would do
+
+Attendees get a random number of sponsors with one to three stamps each
+(with notes, like the tablets send them). The stream is replayed through
+aggregate_stamps for all but --lagging of them, so the fallback path is
+exercised too. Every get_passport_status response is checked against the
+stamps that were written.
+
+moto reports a fixed ConsumedCapacity, so the read units are estimated from
+the size of the items each strategy reads (0.5 RCU per 4 KB, eventually
+consistent, at least 0.5 per call), not from the projected result. The
+milliseconds are moto's, whose queries walk the whole table, so only their
+ratio between strategies means something; keep --attendees small.
+
+Usage:
+    python benchmarks/passport_progress_benchmark.py [--attendees 100] [--sponsors 12] [--lagging 0.1]
+"""
+import argparse
+import contextlib
+import io
+import json
+import math
+import os
+import random
+import sys
+import time
+from collections import Counter
+
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+os.environ.setdefault('AWS_ACCESS_KEY_ID', 'testing')
+os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'testing')
+os.environ['DYNAMODB_TABLE_NAME'] = 'passport-progress-benchmark'
+os.environ['INDEX_NAME'] = 'ShortIdGSI'
+os.environ['PASSPORT_SPONSORS'] = '4'
+os.environ['INSTRUMENTATION_ENABLED'] = 'false'
+
+import boto3
+from moto import mock_aws
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'function'))
+
+from models import serialize
+
+TABLE = os.environ['DYNAMODB_TABLE_NAME']
+
+
+def item_size(item):
+    """Approximate DynamoDB item size in bytes (attribute names plus values)."""
+
+    def value_size(attribute):
+        (tag, value), = attribute.items()
+        if tag == 'S':
+            return len(value.encode())
+        if tag == 'N':
+            return len(value.lstrip('-').replace('.', '')) // 2 + 1
+        if tag == 'BOOL' or tag == 'NULL':
+            return 1
+        if tag == 'SS':
+            return sum(len(member.encode()) for member in value)
+        if tag == 'M':
+            return 3 + sum(len(name.encode()) + value_size(member) for name, member in value.items())
+        if tag == 'L':
+            return 3 + sum(1 + value_size(member) for member in value)
+        return len(value)
+
+    return sum(len(name.encode()) + value_size(attribute) for name, attribute in item.items())
+
+
+def read_units(sizes):
+    return max(0.5, math.ceil(sum(sizes) / 4096) * 0.5)
+
+
+def seed(client, args, rng):
+    """Write profiles and stamps; return {user_id: (short_id, {sponsor_id: stamps})}."""
+    truth = {}
+    items = []
+    for n in range(args.attendees):
+        user_id = f'{n:025d}'
+        short_id = f'P{n:06d}'
+        items.append({
+            'PK': f'USER#{user_id}', 'SK': 'PROFILE', 'user_id': user_id, 'short_id': short_id,
+            'first_name': f'Nombre {n}', 'last_name': 'Apellido', 'company': 'AWS Community', 'role': 'Engineer',
+            'initialized': True,
+        })
+        visited = rng.sample(range(1, args.sponsors + 1), rng.randint(0, args.sponsors))
+        stamps = {}
+        for sponsor in visited:
+            stamps[str(sponsor)] = rng.randint(1, 3)
+            for k in range(stamps[str(sponsor)]):
+                items.append({
+                    'PK': f'USER#{user_id}', 'SK': f'SPONSOR#{sponsor}#2024-10-05T{10 + k}:{rng.randrange(60):02d}:00+00:00',
+                    'sponsor_id': str(sponsor), 'notes': 'Interesado en la demo, pidió información de precios ' * 2,
+                })
+        truth[user_id] = (short_id, stamps)
+    for start in range(0, len(items), 25):
+        client.batch_write_item(RequestItems={
+            TABLE: [{'PutRequest': {'Item': {key: serialize(value) for key, value in item.items()}}} for item in items[start:start + 25]],
+        })
+    return truth
+
+
+def replay_stream(client, user_ids):
+    """Send the INSERT records of the users' stamps through aggregate_stamps in stream-sized batches."""
+    import aggregate_stamps
+
+    records = []
+    for user_id in user_ids:
+        response = client.query(
+            TableName=TABLE,
+            KeyConditionExpression='PK = :pk AND begins_with(SK, :prefix)',
+            ExpressionAttributeValues={':pk': {'S': f'USER#{user_id}'}, ':prefix': {'S': 'SPONSOR#'}},
+        )
+        for item in response['Items']:
+            records.append({'eventName': 'INSERT', 'dynamodb': {'Keys': {'PK': item['PK'], 'SK': item['SK']}, 'NewImage': item}})
+    with contextlib.redirect_stdout(io.StringIO()):
+        for start in range(0, len(records), 100):
+            aggregate_stamps.lambda_handler({'Records': records[start:start + 100]}, None)
+
+
+def fan_out(client, user_id, sponsors):
+    """Progress the way a client checking sponsor by sponsor would get it."""
+    calls = 0
+    units = 0.0
+    collected = set()
+    for sponsor in range(1, sponsors + 1):
+        response = client.query(
+            TableName=TABLE,
+            KeyConditionExpression='PK = :pk AND begins_with(SK, :prefix)',
+            ExpressionAttributeValues={':pk': {'S': f'USER#{user_id}'}, ':prefix': {'S': f'SPONSOR#{sponsor}#'}},
+        )
+        calls += 1
+        units += read_units([item_size(item) for item in response['Items']])
+        if response['Items']:
+            collected.add(str(sponsor))
+    return collected, calls, units
+
+
+class CallCounter:
+    def __init__(self):
+        self.calls = Counter()
+
+    def __call__(self, model, **kwargs):
+        self.calls[model.name] += 1
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Passport progress read cost')
+    parser.add_argument('--attendees', type=int, default=100)
+    parser.add_argument('--sponsors', type=int, default=12)
+    parser.add_argument('--lagging', type=float, default=0.1, help='Share of attendees whose stamps the stream has not processed')
+    parser.add_argument('--seed', type=int, default=3)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    with mock_aws():
+        client = boto3.client('dynamodb')
+        client.create_table(
+            TableName=TABLE,
+            BillingMode='PAY_PER_REQUEST',
+            AttributeDefinitions=[{'AttributeName': name, 'AttributeType': 'S'} for name in ('PK', 'SK', 'short_id')],
+            KeySchema=[{'AttributeName': 'PK', 'KeyType': 'HASH'}, {'AttributeName': 'SK', 'KeyType': 'RANGE'}],
+            GlobalSecondaryIndexes=[{
+                'IndexName': os.environ['INDEX_NAME'],
+                'KeySchema': [{'AttributeName': 'short_id', 'KeyType': 'HASH'}],
+                'Projection': {'ProjectionType': 'ALL'},
+            }],
+        )
+        truth = seed(client, args, rng)
+        lagging = set(rng.sample(sorted(truth), int(len(truth) * args.lagging)))
+        replay_stream(client, [user_id for user_id in truth if user_id not in lagging])
+
+        import get_passport_status
+        from clients import get_client
+        from profile_cache import get_profile
+
+        counter = CallCounter()
+        get_client('dynamodb').meta.events.register('before-call.dynamodb.*', counter)
+
+        # Tamaño de lo que lee cada estrategia, a partir de los ítems completos de la tabla
+        sizes = {}
+        for page in client.get_paginator('scan').paginate(TableName=TABLE):
+            for item in page['Items']:
+                sizes.setdefault(item['PK']['S'], {})[item['SK']['S']] = item_size(item)
+
+        totals = {name: {'calls': 0, 'units': 0.0, 'seconds': 0.0} for name in ('rollup', 'key range', 'fan-out')}
+        completed = 0
+        for user_id, (short_id, stamps) in truth.items():
+            user_sizes = sizes[f'USER#{user_id}']
+            stamp_sizes = [size for sk, size in user_sizes.items() if sk.startswith('SPONSOR#')]
+            get_profile(short_id, attributes=get_passport_status.PROFILE_ATTRIBUTES)
+
+            counter.calls.clear()
+            start = time.perf_counter()
+            response = get_passport_status.lambda_handler({'queryStringParameters': {'short_id': short_id}}, None)
+            totals['rollup']['seconds'] += time.perf_counter() - start
+            assert response['statusCode'] == 200, response
+            passport = json.loads(response['body'])['passport']
+            assert passport['sponsors'] == sorted(stamps), (user_id, passport, stamps)
+            assert passport['stamps'] == sum(stamps.values()), (user_id, passport, stamps)
+            assert passport['completed'] == (len(stamps) >= 4)
+            completed += passport['completed']
+            totals['rollup']['calls'] += sum(counter.calls.values())
+            totals['rollup']['units'] += read_units([user_sizes['PASSPORT']]) if 'PASSPORT' in user_sizes else 0.5 + read_units(stamp_sizes)
+            assert counter.calls == (Counter(GetItem=1) if 'PASSPORT' in user_sizes else Counter(GetItem=1, Query=1)), counter.calls
+
+            counter.calls.clear()
+            start = time.perf_counter()
+            sort_keys = get_passport_status.query_stamp_keys(user_id)
+            totals['key range']['seconds'] += time.perf_counter() - start
+            assert len(sort_keys) == sum(stamps.values())
+            totals['key range']['calls'] += sum(counter.calls.values())
+            totals['key range']['units'] += read_units(stamp_sizes)
+
+            start = time.perf_counter()
+            collected, calls, units = fan_out(client, user_id, args.sponsors)
+            totals['fan-out']['seconds'] += time.perf_counter() - start
+            assert collected == set(stamps)
+            totals['fan-out']['calls'] += calls
+            totals['fan-out']['units'] += units
+
+    count = len(truth)
+    print(f'{count} attendees, {args.sponsors} sponsors, {len(lagging)} without a rollup yet, '
+          f'{completed} completed passports; all responses match the stamps')
+    print(f'{"strategy":10s} {"calls/req":>9s} {"RCU/req":>8s} {"RCU total":>10s} {"ms/req":>7s}')
+    for name, total in totals.items():
+        print(f'{name:10s} {total["calls"] / count:9.2f} {total["units"] / count:8.2f} {total["units"]:10.1f} '
+              f'{total["seconds"] / count * 1000:7.2f}')
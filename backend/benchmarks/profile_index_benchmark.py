@@ -0,0 +1,67 @@
+"""Compare the linear profile join of top_sponsors.py against ProfileIndex.
+
+Usage:
+    python benchmarks/profile_index_benchmark.py --profiles 10000 100000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from profile_index import ProfileIndex
+
+
+def synthetic_profiles(count):
+    return [
+        {
+            'PK': f'USER#{i:025d}',
+            'SK': 'PROFILE',
+            'user_id': f'{i:025d}',
+            'short_id': f'{i:07X}',
+            'first_name': f'Nombre {i}',
+            'last_name': f'Apellido {i}',
+            'company': 'AWS Community',
+            'role': 'Cloud Engineer',
+            'scanned_count': i % 97,
+            'contact_information': {'email': f'user{i}@example.com', 'phone': f'55{i:08d}'},
+        }
+        for i in range(count)
+    ]
+
+
+def measure_memory(build):
+    tracemalloc.start()
+    result = build()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, current
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Profile index benchmark')
+    parser.add_argument('--profiles', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--lookups', type=int, default=500)
+    args = parser.parse_args()
+
+    for count in args.profiles:
+        profiles, dicts_memory = measure_memory(lambda: synthetic_profiles(count))
+        profile_index, index_memory = measure_memory(lambda: ProfileIndex.from_items(profiles))
+        user_ids = [profile['user_id'] for profile in random.sample(profiles, min(args.lookups, count))]
+
+        start = time.perf_counter()
+        for user_id in user_ids:
+            next((profile for profile in profiles if profile['user_id'] == user_id), None)
+        linear = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for user_id in user_ids:
+            profile_index.get(user_id)
+        indexed = time.perf_counter() - start
+
+        print(f"{count} profiles, {len(user_ids)} lookups:")
+        print(f"\tlinear join: {linear * 1000:.1f} ms, index: {indexed * 1000:.3f} ms ({linear / indexed:.0f}x)")
+        print(f"\tmemory: dicts {dicts_memory / 1024 / 1024:.1f} MiB, index {index_memory / 1024 / 1024:.1f} MiB")
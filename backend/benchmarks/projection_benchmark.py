@@ -0,0 +1,174 @@
+"""Check that projected GSI reads keep the handler responses unchanged.
+
+Runs check_existence, get_passport_status, unlock_activation, stamp_passport
+and batch_stamp_passport against a moto table twice: once with every
+short_id lookup forced to read the whole item from ShortIdGSI (as before
+the projections) and once as deployed (ProjectionExpression per endpoint,
+ShortIdKeysGSI for the stamp handlers). The responses must be identical;
+the payload returned by the short_id queries is reported for both runs.
+
+Usage:
+    python benchmarks/projection_benchmark.py [--profiles 200] [--links 4]
+"""
+import argparse
+import json
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+
+from load_test import serialize_dynamodb
+
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+os.environ.setdefault('AWS_ACCESS_KEY_ID', 'testing')
+os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'testing')
+os.environ['DYNAMODB_TABLE_NAME'] = 'projection-benchmark'
+os.environ['INDEX_NAME'] = 'ShortIdGSI'
+os.environ['KEYS_INDEX_NAME'] = 'ShortIdKeysGSI'
+# Miles de requests desde la misma IP: aquí no se mide el rate limit
+os.environ['RATE_LIMIT_ENABLED'] = 'false'
+# Las métricas EMF de cada invocación solo ensuciarían la salida
+os.environ['INSTRUMENTATION_ENABLED'] = 'false'
+
+import boto3
+from moto import mock_aws
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'function'))
+
+from models import serialize
+
+SPONSOR_ID = '1'
+# Mismo momento en las dos corridas, dentro de la ventana offline del lote
+SCANNED_AT = (datetime.now(timezone.utc) - timedelta(hours=1)).isoformat()
+
+
+class CountingClient:
+    """Client proxy that measures what the short_id queries return."""
+
+    def __init__(self, client):
+        self.client = client
+        self.queries = 0
+        self.bytes = 0
+
+    def query(self, **kwargs):
+        response = self.client.query(**kwargs)
+        self.queries += 1
+        self.bytes += len(json.dumps(response['Items']))
+        return response
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+
+def create_table():
+    boto3.client('dynamodb').create_table(
+        TableName=os.environ['DYNAMODB_TABLE_NAME'],
+        BillingMode='PAY_PER_REQUEST',
+        AttributeDefinitions=[{'AttributeName': name, 'AttributeType': 'S'} for name in ('PK', 'SK', 'short_id')],
+        KeySchema=[{'AttributeName': 'PK', 'KeyType': 'HASH'}, {'AttributeName': 'SK', 'KeyType': 'RANGE'}],
+        GlobalSecondaryIndexes=[
+            {
+                'IndexName': os.environ['INDEX_NAME'],
+                'KeySchema': [{'AttributeName': 'short_id', 'KeyType': 'HASH'}],
+                'Projection': {'ProjectionType': 'ALL'},
+            },
+            {
+                'IndexName': os.environ['KEYS_INDEX_NAME'],
+                'KeySchema': [{'AttributeName': 'short_id', 'KeyType': 'HASH'}],
+                'Projection': {'ProjectionType': 'KEYS_ONLY'},
+            },
+        ],
+    )
+
+
+def make_profile(n, links):
+    profile = {
+        'PK': f'USER#{n:025d}',
+        'SK': 'PROFILE',
+        'user_id': f'{n:025d}',
+        'short_id': f'S{n:06d}',
+        'first_name': f'Nombre {n}',
+        'last_name': f'Apellido {n}',
+        'company': 'AWS Community',
+        'initialized': n % 3 != 0,
+        'contact_information': {'email': f'user{n}@example.com', 'share_email': True, 'share_phone': False},
+        'social_links': [{'name': f'link{i}', 'url': f'https://example.com/{n}/{i}'} for i in range(links)],
+        'pin': '1234',
+        'gender': 'Prefer not to say',
+        'profile': 'Developer',
+        'age_range': '25-34',
+        'area_of_interest': 'Cloud',
+    }
+    # Algunos perfiles sin teléfono o sin rol, para cubrir las ramas de las respuestas
+    if n % 2:
+        profile['contact_information']['phone'] = f'55{n:08d}'
+    if n % 5:
+        profile['role'] = 'Cloud Engineer'
+    return {key: serialize(value) for key, value in profile.items()}
+
+
+def event(query=None, body=None):
+    return {'queryStringParameters': query, 'body': json.dumps(body) if body is not None else None, 'headers': {}}
+
+
+def run(profiles, links, full_reads):
+    with mock_aws():
+        create_table()
+        client = boto3.client('dynamodb')
+        for n in range(profiles):
+            client.put_item(TableName=os.environ['DYNAMODB_TABLE_NAME'], Item=make_profile(n, links))
+
+        import batch_stamp_passport
+        import check_existence
+        import create_sponsor_jwt
+        import get_passport_status
+        import profile_cache
+        import stamp_passport
+        import unlock_activation
+
+        profile_cache.clear_cache()
+        counting = CountingClient(client)
+        profile_cache.dynamodb = counting
+        query_short_id = profile_cache._query_short_id
+        if full_reads:
+            profile_cache._query_short_id = lambda short_id, attributes=None, index=None: query_short_id(short_id)
+
+        token = create_sponsor_jwt.jwt(SPONSOR_ID, 'Sponsor', stamp_passport.SECRET_KEY)
+        short_ids = [f'S{n:06d}' for n in range(profiles)] + ['MISSING']
+        responses = []
+        try:
+            for short_id in short_ids:
+                responses.append(check_existence.lambda_handler(event({'short_id': short_id}), None))
+                responses.append(get_passport_status.lambda_handler(event({'short_id': short_id}), None))
+                responses.append(unlock_activation.lambda_handler(event({'short_id': short_id, 'value': 'wrong'}), None))
+            # Segunda vuelta con el cache ya caliente
+            for short_id in short_ids:
+                responses.append(check_existence.lambda_handler(event({'short_id': short_id}), None))
+            for short_id in short_ids[::2]:
+                responses.append(stamp_passport.lambda_handler(event(body={'short_id': short_id, 'jwt': token}), None))
+            stamps = [{'short_id': short_id, 'scanned_at': SCANNED_AT} for short_id in short_ids[1::2]]
+            responses.append(batch_stamp_passport.lambda_handler(event(body={'jwt': token, 'stamps': stamps}), None))
+        finally:
+            profile_cache._query_short_id = query_short_id
+            profile_cache.dynamodb = client
+
+        return [(response['statusCode'], response['body']) for response in responses], counting
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Projected vs full short_id reads')
+    parser.add_argument('--profiles', type=int, default=200)
+    parser.add_argument('--links', type=int, default=4)
+    args = parser.parse_args()
+
+    serialize_dynamodb()
+    full_responses, full = run(args.profiles, args.links, full_reads=True)
+    projected_responses, projected = run(args.profiles, args.links, full_reads=False)
+
+    for label, counting in (('full items', full), ('projected', projected)):
+        print(f'{label:12s} {counting.queries:5d} queries  {counting.bytes / 1024:8.1f} KiB returned  '
+              f'{counting.bytes / max(counting.queries, 1):7.1f} bytes/query')
+
+    mismatches = [(a, b) for a, b in zip(full_responses, projected_responses) if a != b]
+    assert len(full_responses) == len(projected_responses)
+    assert not mismatches, f'{len(mismatches)} responses differ, first: {mismatches[0]}'
+    print(f'{len(full_responses)} responses identical')
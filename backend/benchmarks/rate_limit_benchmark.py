@@ -0,0 +1,202 @@
+"""Load the short_id endpoints through their rate limiters.
+
+The handlers run in-process with a simulated clock; the rate limit counters
+live in a moto table and the profile lookups (the GSI queries the limiter
+protects) are replaced with an in-memory dict that counts the calls.
+Several "instances" of each handler share the counter table, like warm
+Lambda environments behind the same API.
+
+Scenarios:
+- enumeration: one IP walks random short_ids against /attendee/validate
+- rush: many IPs scan the same popular attendee on /attendee
+- brute force: many IPs guess the phone digits of one short_id on
+  /attendee/activate for 15 minutes
+- venue NAT: attendees behind the event WiFi's single IP validate and
+  activate their own short_ids during registration; none is throttled
+
+For each one it prints the requests, how many reached the profile lookup,
+the counter writes, and the handler throughput with the limiter in front.
+
+The shared counter never goes over the limit of a window, but each
+instance can hold up to batch - 1 allowed requests it has not added to it
+yet when the window ends or the counter runs out. The checks therefore
+allow limit + instances * (batch - 1) per window the run touches.
+
+Usage:
+    python benchmarks/rate_limit_benchmark.py [--instances 4] [--rate 200] [--seconds 60]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+os.environ.setdefault('AWS_ACCESS_KEY_ID', 'testing')
+os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'testing')
+os.environ['DYNAMODB_TABLE_NAME'] = 'rate-limit-benchmark'
+# Las métricas EMF de cada invocación solo ensuciarían la salida
+os.environ['INSTRUMENTATION_ENABLED'] = 'false'
+
+import boto3
+from moto import mock_aws
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'function'))
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1_700_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+class CountingClient:
+    def __init__(self, client):
+        self.client = client
+        self.writes = 0
+
+    def update_item(self, **kwargs):
+        self.writes += 1
+        return self.client.update_item(**kwargs)
+
+
+class DiscardingClient:
+    """Accepts the unlock_key writes without storing them."""
+
+    def transact_write_items(self, **kwargs):
+        return {}
+
+
+class Profiles:
+    """In-memory stand-in for profile_cache.get_profile that counts the lookups."""
+
+    def __init__(self, items):
+        self.items = items
+        self.lookups = 0
+
+    def __call__(self, short_id, refresh=False, attributes=None):
+        self.lookups += 1
+        return self.items.get(short_id)
+
+
+def create_table():
+    boto3.client('dynamodb').create_table(
+        TableName=os.environ['DYNAMODB_TABLE_NAME'],
+        BillingMode='PAY_PER_REQUEST',
+        AttributeDefinitions=[{'AttributeName': name, 'AttributeType': 'S'} for name in ('PK', 'SK')],
+        KeySchema=[{'AttributeName': 'PK', 'KeyType': 'HASH'}, {'AttributeName': 'SK', 'KeyType': 'RANGE'}],
+    )
+
+
+def instance(limits, client, clock):
+    """A fresh copy of a handler's RequestLimiter, as in another Lambda environment."""
+    copy = RequestLimiter.__new__(RequestLimiter)
+    for attribute in ('by_ip', 'by_short_id'):
+        limiter = getattr(limits, attribute)
+        setattr(copy, attribute, RateLimiter(
+            limiter.name, limiter.rate, limiter.burst, limiter.window, limiter.limit, client=client, clock=clock,
+        ))
+    return copy
+
+
+def run(name, handler, instances, events, clock, rate, client, profiles):
+    """Send the events round-robin to the instances at `rate` requests per simulated second."""
+    client.writes = profiles.lookups = 0
+    statuses = {}
+    start = time.perf_counter()
+    for n, event in enumerate(events):
+        clock.now += 1 / rate
+        handler.limits = instances[n % len(instances)]
+        status = handler.lambda_handler(event, None)['statusCode']
+        statuses[status] = statuses.get(status, 0) + 1
+    elapsed = time.perf_counter() - start
+    print(f'{name:12s} {len(events):6d} requests  {statuses.get(429, 0):6d} throttled  {profiles.lookups:6d} profile lookups  '
+          f'{client.writes:4d} counter writes  {len(events) / elapsed:8.0f} req/s')
+    return statuses
+
+
+def max_allowed(limiter, instances, start, end):
+    """Requests the limiter may let through between two clock readings."""
+    windows = int(end // limiter.window) - int(start // limiter.window) + 1
+    return windows * (limiter.limit + instances * (limiter.batch - 1))
+
+
+def event(short_id, ip, **params):
+    return {
+        'queryStringParameters': {'short_id': short_id, **params},
+        'requestContext': {'identity': {'sourceIp': ip}},
+        'headers': {},
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Rate limiter load benchmark')
+    parser.add_argument('--instances', type=int, default=4)
+    parser.add_argument('--rate', type=float, default=200, help='Requests per simulated second')
+    parser.add_argument('--seconds', type=int, default=60)
+    parser.add_argument('--nat-rate', type=float, default=20, help='Attendees per second registering behind the venue NAT')
+    args = parser.parse_args()
+    random.seed(5)
+
+    with mock_aws():
+        create_table()
+        from rate_limit import RateLimiter, RequestLimiter
+        import check_existence
+        import get_information
+        import unlock_activation
+        from models import serialize
+        from public_card import PublicCard
+
+        clock = Clock()
+        client = CountingClient(boto3.client('dynamodb'))
+        requests = int(args.rate * args.seconds)
+
+        profile = {key: serialize(value) for key, value in {
+            'PK': 'USER#0000000000000000000000001', 'SK': 'PROFILE', 'short_id': 'POPULAR', 'initialized': True,
+            'contact_information': {'email': 'user@example.com', 'phone': '5512345678'},
+        }.items()}
+        profiles = Profiles({'POPULAR': profile})
+        check_existence.get_profile = profiles
+        unlock_activation.get_profile = profiles
+
+        # Enumeración desde una sola IP: casi todos los short_id no existen
+        handlers = [instance(check_existence.limits, client, clock) for _ in range(args.instances)]
+        events = [event(f'{random.randrange(36 ** 6):06X}', '203.0.113.7') for _ in range(requests)]
+        start = clock.now
+        run('enumeration', check_existence, handlers, events, clock, args.rate, client, profiles)
+        assert profiles.lookups <= max_allowed(handlers[0].by_ip, args.instances, start, clock.now)
+
+        # Muchos asistentes (IPs distintas) escanean al mismo speaker
+        card = PublicCard('USER#1', 'PROFILE', None, None, {'public': ('{}', '"etag"')})
+        get_information.get_card = lambda short_id: profiles(short_id) and card
+        get_information.scans.emit = lambda message: None
+        handlers = [instance(get_information.limits, client, clock) for _ in range(args.instances)]
+        events = [event('POPULAR', f'198.51.100.{random.randrange(256)}', device=f'device-{n}') for n in range(requests)]
+        start = clock.now
+        statuses = run('rush', get_information, handlers, events, clock, args.rate, client, profiles)
+        assert statuses[200] <= max_allowed(handlers[0].by_short_id, args.instances, start, clock.now)
+
+        # Fuerza bruta sobre los 6 dígitos del teléfono durante una ventana de 15 minutos
+        clock.now = (clock.now // 900 + 1) * 900
+        unlock_activation.dynamodb = None
+        handlers = [instance(unlock_activation.limits, client, clock) for _ in range(args.instances)]
+        events = [event('POPULAR', f'192.0.2.{n % 256}', value=f'{n:06d}') for n in range(int(900 * args.rate / 10))]
+        statuses = run('brute force', unlock_activation, handlers, events, clock, args.rate / 10, client, profiles)
+        print(f'{"":12s} {profiles.lookups} guesses checked in 15 minutes, limit {unlock_activation.limits.by_short_id.limit}')
+        assert profiles.lookups <= unlock_activation.limits.by_short_id.limit
+
+        # Registro: cada asistente valida y activa su propio perfil, todos desde la IP del WiFi
+        attendees = [f'A{n:05d}' for n in range(int(args.nat_rate * args.seconds))]
+        profiles.items.update({short_id: dict(profile, short_id={'S': short_id}) for short_id in attendees})
+        unlock_activation.dynamodb = DiscardingClient()
+        unlock_activation.invalidate_profile = lambda short_id: None
+        for name, handler, params in (
+            ('venue NAT', check_existence, {}),
+            ('', unlock_activation, {'value': '345678'}),
+        ):
+            handlers = [instance(handler.limits, client, clock) for _ in range(args.instances)]
+            events = [event(short_id, '203.0.113.50', **params) for short_id in attendees]
+            statuses = run(name, handler, handlers, events, clock, args.nat_rate, client, profiles)
+            assert 429 not in statuses, f'{handler.__name__} throttled attendees behind the venue NAT'
@@ -0,0 +1,79 @@
+"""Benchmark the parallel segmented scan against a moto DynamoDB stand-in.
+
+Usage:
+    python benchmarks/scan_benchmark.py --items 100000 --segments 1 4 8
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import boto3
+from boto3.dynamodb.conditions import Attr
+from moto import mock_aws
+
+from scanner import parallel_scan, write_jsonl
+
+TABLE_NAME = 'communitydaymx24'
+
+
+def seed_table(items):
+    dynamodb = boto3.resource('dynamodb', region_name='us-east-1')
+    table = dynamodb.create_table(
+        TableName=TABLE_NAME,
+        BillingMode='PAY_PER_REQUEST',
+        AttributeDefinitions=[
+            {'AttributeName': 'PK', 'AttributeType': 'S'},
+            {'AttributeName': 'SK', 'AttributeType': 'S'},
+        ],
+        KeySchema=[
+            {'AttributeName': 'PK', 'KeyType': 'HASH'},
+            {'AttributeName': 'SK', 'KeyType': 'RANGE'},
+        ],
+    )
+    with table.batch_writer() as batch:
+        for i in range(items):
+            batch.put_item(Item={
+                'PK': f'USER#{i:025d}',
+                'SK': 'PROFILE' if i % 4 == 0 else f'SPONSOR#{i % 10}#2024-11-09T10:{i % 60:02d}:00+00:00',
+                'first_name': f'Nombre {i}',
+                'last_name': f'Apellido {i}',
+                'scanned_count': i % 50,
+            })
+
+
+def run(segments, filename):
+    tracemalloc.start()
+    start = time.perf_counter()
+    count = write_jsonl(
+        parallel_scan(
+            TABLE_NAME,
+            total_segments=segments,
+            FilterExpression=Attr('PK').begins_with('USER#') & Attr('SK').eq('PROFILE')
+        ),
+        filename
+    )
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return count, elapsed, peak
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Parallel scan benchmark')
+    parser.add_argument('--items', type=int, default=100000)
+    parser.add_argument('--segments', type=int, nargs='+', default=[1, 4, 8])
+    parser.add_argument('--output', default='/tmp/scan_benchmark.jsonl')
+    args = parser.parse_args()
+
+    os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+    with mock_aws():
+        print(f"Seeding {args.items} items...")
+        seed_table(args.items)
+
+        for segments in args.segments:
+            count, elapsed, peak = run(segments, args.output)
+            print(f"{segments} segments: {count} items in {elapsed:.2f}s, peak memory {peak / 1024 / 1024:.1f} MiB")
@@ -0,0 +1,96 @@
+"""Compare loading time and RSS of the JSON cache against the columnar snapshot.
+
+Usage:
+    python benchmarks/snapshot_benchmark.py --profiles 100000
+"""
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+import simplejson as json
+
+import snapshot
+
+
+def synthetic_profiles(count):
+    for i in range(count):
+        yield {
+            'PK': f'USER#{i:025d}',
+            'SK': 'PROFILE',
+            'user_id': f'{i:025d}',
+            'short_id': f'{i:07X}',
+            'first_name': f'Nombre {i}',
+            'last_name': f'Apellido {i}',
+            'company': f'Empresa {i % 300}',
+            'role': 'Cloud Engineer',
+            'scanned_count': i % 97,
+            'completed_passport': i % 5 == 0,
+            'contact_information': {'email': f'user{i}@example.com', 'phone': f'55{i:08d}'},
+        }
+
+
+def report_json(filename):
+    with open(filename) as f:
+        profiles = json.load(f, use_decimal=True)
+    most_scans = sorted(profiles, key=lambda x: x.get('scanned_count', 0), reverse=True)[:10]
+    return [profile['first_name'] for profile in most_scans]
+
+
+def report_snapshot(filename):
+    with snapshot.Snapshot(filename) as event_snapshot:
+        return [event_snapshot.profiles.value('first_name', row) for row in snapshot.get_most_scans(event_snapshot, 10)]
+
+
+def run_child(mode, filename):
+    output = subprocess.run(
+        [sys.executable, __file__, '--child', mode, filename],
+        check=True, capture_output=True, text=True
+    ).stdout.split()
+    return float(output[0]), int(output[1])
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Snapshot benchmark')
+    parser.add_argument('--profiles', type=int, default=100000)
+    parser.add_argument('--directory', default='/tmp')
+    parser.add_argument('--child', nargs=2, help=argparse.SUPPRESS)
+    parser.add_argument('--generate', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    json_filename = os.path.join(args.directory, 'snapshot_benchmark.json')
+    snapshot_filename = os.path.join(args.directory, 'snapshot_benchmark.bin')
+
+    if args.child:
+        mode, filename = args.child
+        # Medimos solo lo que crece el RSS al cargar, no el costo de importar boto3
+        baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        start = time.perf_counter()
+        (report_json if mode == 'json' else report_snapshot)(filename)
+        elapsed = time.perf_counter() - start
+        print(elapsed, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - baseline)
+        sys.exit(0)
+
+    if args.generate:
+        with open(json_filename, 'w') as f:
+            json.dump(list(synthetic_profiles(args.profiles)), f)
+        builder = snapshot.SnapshotBuilder()
+        for profile in synthetic_profiles(args.profiles):
+            builder.add_profile(profile)
+        builder.write(snapshot_filename)
+        sys.exit(0)
+
+    # Generamos los archivos en otro proceso para que los hijos no hereden su memoria
+    subprocess.run(
+        [sys.executable, __file__, '--generate', '--profiles', str(args.profiles), '--directory', args.directory],
+        check=True
+    )
+
+    for mode, filename in (('json', json_filename), ('snapshot', snapshot_filename)):
+        elapsed, max_rss = run_child(mode, filename)
+        print(f"{mode}: {os.path.getsize(filename) / 1024 / 1024:.1f} MiB on disk, top 10 in {elapsed * 1000:.0f} ms, RSS growth {max_rss / 1024:.1f} MiB")
@@ -0,0 +1,142 @@
+"""Compare get_information latency with inline and background scan messages.
+
+get_information is called in-process with a pre-rendered card (no DynamoDB)
+and a fake SQS client that sleeps for --sqs-latency-ms on every call, so
+the only difference between the runs is how the scan message is sent:
+
+- inline: one send_message per request on the response path (as before)
+- emitter: telemetry.TelemetryEmitter, SendMessageBatch from a thread; the
+  handler still waits for the buffer before returning (Lambda freezes the
+  environment afterwards), at most TELEMETRY_RETURN_FLUSH_SECONDS
+
+A last run makes SQS much slower than the request rate: requests wait no
+longer than the flush bound and the bounded buffer drops the oldest
+messages instead of slowing the requests down further.
+
+Usage:
+    python benchmarks/telemetry_benchmark.py [--requests 1000] [--sqs-latency-ms 20] [--request-gap-ms 5]
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+
+# Miles de requests desde la misma IP: aquí no se mide el rate limit
+os.environ['RATE_LIMIT_ENABLED'] = 'false'
+# Las métricas EMF de cada invocación solo ensuciarían la salida
+os.environ['INSTRUMENTATION_ENABLED'] = 'false'
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'function'))
+
+import get_information
+from models import Profile, serialize
+from public_card import PublicCard, render_card
+from sketches import WindowedBloomFilter
+from telemetry import TelemetryEmitter
+
+
+class FakeSQS:
+    def __init__(self, latency):
+        self.latency = latency
+        self.calls = 0
+        self.messages = 0
+        self.lock = threading.Lock()
+
+    def _call(self, count):
+        time.sleep(self.latency)
+        with self.lock:
+            self.calls += 1
+            self.messages += count
+
+    def send_message(self, QueueUrl, MessageBody):
+        self._call(1)
+        return {'MessageId': 'x'}
+
+    def send_message_batch(self, QueueUrl, Entries):
+        self._call(len(Entries))
+        return {'Successful': [{'Id': entry['Id']} for entry in Entries], 'Failed': []}
+
+
+class InlineSender:
+    """The previous behavior: a blocking send_message per scan."""
+
+    def __init__(self, client):
+        self.client = client
+
+    def emit(self, message):
+        self.client.send_message(QueueUrl='scans', MessageBody=json.dumps(message))
+
+    def flush(self, timeout=None):
+        return True
+
+
+def make_card():
+    item = {key: serialize(value) for key, value in {
+        'PK': 'USER#0000000000000000000000001',
+        'SK': 'PROFILE',
+        'user_id': '0000000000000000000000001',
+        'short_id': 'ABC1234',
+        'first_name': 'Nombre',
+        'last_name': 'Apellido',
+        'company': 'AWS Community',
+        'role': 'Cloud Engineer',
+        'initialized': True,
+        'contact_information': {'email': 'user@example.com', 'phone': '5512345678', 'share_email': True, 'share_phone': False},
+        'social_links': [{'name': 'linkedin', 'url': 'https://example.com/in/user'}],
+    }.items()}
+    return PublicCard.from_item(render_card(Profile.from_item(item)))
+
+
+def run(sender, requests, gap):
+    get_information.scans = sender
+    # Cada corrida usa los mismos dispositivos, que la ventana de dedup descartaría;
+    # con una tasa de error mínima ningún dispositivo nuevo pasa por repetido
+    get_information.recent_scans = WindowedBloomFilter(requests, 1e-9)
+    latencies = []
+    for n in range(requests):
+        event = {'queryStringParameters': {'short_id': 'ABC1234', 'device': f'device-{n}'}, 'headers': {}}
+        start = time.perf_counter()
+        response = get_information.lambda_handler(event, None)
+        latencies.append(time.perf_counter() - start)
+        assert response['statusCode'] == 200, response
+        time.sleep(gap)
+    latencies.sort()
+    return latencies
+
+
+def report(name, latencies, client, extra=''):
+    p50 = latencies[len(latencies) // 2] * 1000
+    p99 = latencies[int(len(latencies) * 0.99)] * 1000
+    print(f'{name:10s} p50 {p50:7.3f} ms  p99 {p99:7.3f} ms  {client.calls:5d} SQS calls  {client.messages:5d} messages{extra}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='get_information scan telemetry latency')
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--sqs-latency-ms', type=float, default=20)
+    parser.add_argument('--request-gap-ms', type=float, default=5, help='Pause between requests of the same (warm) function')
+    args = parser.parse_args()
+
+    gap = args.request_gap_ms / 1000
+    card = make_card()
+    get_information.get_card = lambda short_id: card
+
+    inline = FakeSQS(args.sqs_latency_ms / 1000)
+    report('inline', run(InlineSender(inline), args.requests, gap), inline)
+
+    batched = FakeSQS(args.sqs_latency_ms / 1000)
+    emitter = TelemetryEmitter('scans', client=batched)
+    latencies = run(emitter, args.requests, gap)
+    assert emitter.flush(timeout=30)
+    report('emitter', latencies, batched, f'  {emitter.dropped} dropped')
+    assert batched.messages == args.requests
+
+    # SQS 10 veces más lento que la llegada de requests con un buffer chico
+    slow = FakeSQS(args.sqs_latency_ms * 10 / 1000)
+    emitter = TelemetryEmitter('scans', client=slow, max_buffer=50)
+    latencies = run(emitter, args.requests, gap)
+    emitter.flush(timeout=30)
+    report('backlog', latencies, slow, f'  {emitter.dropped} dropped')
+    assert slow.messages + emitter.dropped == args.requests
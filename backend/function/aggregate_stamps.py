@@ -0,0 +1,483 @@
+import os
+import time
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+
+from botocore.exceptions import ClientError
+from clients import LazyClient
+from instrumentation import instrument
+from models import projection
+
+# Inicializar cliente de DynamoDB
+dynamodb = LazyClient("dynamodb")
+
+table_name = os.environ.get("DYNAMODB_TABLE_NAME")
+
+# Sponsors distintos necesarios para completar el pasaporte
+PASSPORT_SPONSORS = int(os.environ.get("PASSPORT_SPONSORS", "4"))
+# Cuántos asistentes guardamos en el leaderboard de escaneos
+TOP_SCANNED_SIZE = int(os.environ.get("TOP_SCANNED_SIZE", "50"))
+TOP_SCANNED_RETRIES = 5
+
+# Todos los contadores viven en una sola partición que los reportes leen con un query
+AGGREGATE_PK = "AGGREGATE"
+HISTOGRAM_SK = "HISTOGRAM"
+COMPLETED_SK = "COMPLETED"
+TOP_SCANNED_SK = "TOP_SCANNED"
+SPONSOR_STATS_PREFIX = "SPONSOR_STATS#"
+# Resumen por asistente: sponsors distintos y total de sellos, más lo que ya se
+# contó de sus registros (stamp_keys, profile_counted, counted_scans) para que
+# un lote reintentado no sume dos veces
+PASSPORT_SK = "PASSPORT"
+PASSPORT_STATE = ("version", "stamp_keys", "sponsors", "profile_counted", "counted_scans")
+# Un ítem por (sponsor, asistente) en la partición del sponsor, para exportar sus leads sin scan
+LEAD_PREFIX = "LEAD#"
+
+# TransactWriteItems acepta hasta 100 ítems distintos por llamada
+MAX_TRANSACTION_ITEMS = 100
+TRANSACTION_RETRIES = 5
+BATCH_GET_SIZE = 100
+
+
+@dataclass
+class UserRecords:
+    """What the records of a batch say about one attendee."""
+
+    # SK del sello -> sponsor_id
+    stamps: dict = field(default_factory=dict)
+    new_profile: bool = False
+    # (scanned_count antes del primer registro, scanned_count después del último)
+    scans: tuple = None
+    sequence_numbers: list = field(default_factory=list)
+
+
+@dataclass
+class UserUpdate:
+    """The part of a batch that one attendee adds to the aggregates."""
+
+    user_id: str
+    # Operación de TransactWriteItems sobre el PASSPORT, None si no hay nada nuevo
+    passport: dict = None
+    histogram: Counter = field(default_factory=Counter)
+    sponsor_stats: dict = field(default_factory=lambda: defaultdict(Counter))
+    completed: bool = False
+    # El asistente tiene el pasaporte completo y el lote repite sellos ya contados:
+    # puede ser el reintento de un lote que falló antes de marcar su perfil
+    recheck_completed: bool = False
+    scanned_count: int = None
+
+
+def parse_records(records):
+    """Group the stream records of a batch by attendee.
+
+    Only INSERT events of stamp rows count as stamps; PROFILE records count
+    new profiles and changes to scanned_count.
+
+    Returns:
+        dict: {user_id: UserRecords}
+    """
+    users = defaultdict(UserRecords)
+
+    for record in records:
+        keys = record["dynamodb"]["Keys"]
+        pk = keys["PK"]["S"]
+        sk = keys["SK"]["S"]
+        if not pk.startswith("USER#"):
+            continue
+        user = users[pk.split("#", 1)[1]]
+        if "SequenceNumber" in record["dynamodb"]:
+            user.sequence_numbers.append(record["dynamodb"]["SequenceNumber"])
+
+        if sk.startswith("SPONSOR#"):
+            # SK = SPONSOR#<sponsor_id>#<timestamp>
+            if record["eventName"] == "INSERT":
+                user.stamps[sk] = sk.split("#")[1]
+        elif sk == "PROFILE":
+            if record["eventName"] == "INSERT":
+                user.new_profile = True
+            new_image = record["dynamodb"].get("NewImage", {})
+            old_image = record["dynamodb"].get("OldImage", {})
+            new_count = int(new_image.get("scanned_count", {}).get("N", "0"))
+            old_count = int(old_image.get("scanned_count", {}).get("N", "0"))
+            if new_count != old_count:
+                first = user.scans[0] if user.scans else old_count
+                user.scans = (first, new_count)
+
+    # Los demás cambios del perfil (update_fields, completed_passport) no cuentan
+    return {
+        user_id: user for user_id, user in users.items()
+        if user.stamps or user.new_profile or user.scans
+    }
+
+
+def get_passports(user_ids):
+    """Read the PASSPORT state of some users with consistent BatchGetItem calls.
+
+    Returns:
+        dict: {user_id: item in DynamoDB JSON}; users without the item are missing
+    """
+    user_ids = list(user_ids)
+    items = {}
+    for start in range(0, len(user_ids), BATCH_GET_SIZE):
+        keys = [
+            {"PK": {"S": f"USER#{user_id}"}, "SK": {"S": PASSPORT_SK}}
+            for user_id in user_ids[start : start + BATCH_GET_SIZE]
+        ]
+        for attempt in range(TRANSACTION_RETRIES):
+            response = dynamodb.batch_get_item(
+                RequestItems={
+                    table_name: {"Keys": keys, "ConsistentRead": True, **projection(("PK", *PASSPORT_STATE))}
+                }
+            )
+            for item in response.get("Responses", {}).get(table_name, []):
+                items[item["PK"]["S"].split("#", 1)[1]] = item
+            keys = response.get("UnprocessedKeys", {}).get(table_name, {}).get("Keys", [])
+            if not keys:
+                break
+            time.sleep(0.05 * 2**attempt)
+        else:
+            raise RuntimeError(f"Could not read {len(keys)} passports")
+    return items
+
+
+def plan_update(user_id, records, item):
+    """Work out what the records of one attendee add, given their PASSPORT state.
+
+    Stamps already in stamp_keys, a profile already counted and a
+    scanned_count equal to counted_scans come from a retried batch and add
+    nothing. The PASSPORT write is conditioned on the version that was
+    read, so the state cannot change between this read and the write.
+    """
+    item = item or {}
+    update = UserUpdate(user_id)
+    applied = set(item.get("stamp_keys", {}).get("SS", ()))
+    old_sponsors = set(item.get("sponsors", {}).get("SS", ()))
+
+    new_stamps = {sk: sponsor_id for sk, sponsor_id in records.stamps.items() if sk not in applied}
+    new_sponsors = set(new_stamps.values()) - old_sponsors
+    before = len(old_sponsors)
+    after = before + len(new_sponsors)
+
+    for sponsor_id in new_stamps.values():
+        update.sponsor_stats[sponsor_id]["stamps"] += 1
+    for sponsor_id in new_sponsors:
+        update.sponsor_stats[sponsor_id]["visitors"] += 1
+    if after != before:
+        update.histogram[f"users_with_{after}"] += 1
+        if before:
+            update.histogram[f"users_with_{before}"] -= 1
+    update.completed = before < PASSPORT_SPONSORS <= after
+    update.recheck_completed = after >= PASSPORT_SPONSORS and len(new_stamps) < len(records.stamps)
+
+    count_profile = records.new_profile and "profile_counted" not in item
+    if count_profile:
+        update.histogram["profiles"] += 1
+
+    counted_scans = None
+    if records.scans:
+        first, update.scanned_count = records.scans
+        counted = int(item["counted_scans"]["N"]) if "counted_scans" in item else first
+        if update.scanned_count != counted:
+            update.histogram["total_scans"] += update.scanned_count - counted
+            counted_scans = update.scanned_count
+
+    if not new_stamps and not count_profile and counted_scans is None:
+        return update
+
+    sets = ["version = :next"]
+    adds = []
+    values = {}
+    if new_stamps:
+        adds.append("stamp_keys :stamp_keys, sponsors :sponsors, stamp_count :stamps")
+        values[":stamp_keys"] = {"SS": list(new_stamps)}
+        values[":sponsors"] = {"SS": sorted(set(new_stamps.values()))}
+        values[":stamps"] = {"N": str(len(new_stamps))}
+    if count_profile:
+        sets.append("profile_counted = :true")
+        values[":true"] = {"BOOL": True}
+    if counted_scans is not None:
+        sets.append("counted_scans = :scans")
+        values[":scans"] = {"N": str(counted_scans)}
+
+    if not item:
+        condition = "attribute_not_exists(PK)"
+        values[":next"] = {"N": "1"}
+    elif "version" not in item:
+        # PASSPORT escrito antes de que tuviera versión
+        condition = "attribute_not_exists(version)"
+        values[":next"] = {"N": "1"}
+    else:
+        condition = "version = :version"
+        values[":version"] = item["version"]
+        values[":next"] = {"N": str(int(item["version"]["N"]) + 1)}
+
+    update.passport = {
+        "Update": {
+            "TableName": table_name,
+            "Key": {"PK": {"S": f"USER#{user_id}"}, "SK": {"S": PASSPORT_SK}},
+            "UpdateExpression": "SET " + ", ".join(sets) + (" ADD " + ", ".join(adds) if adds else ""),
+            "ConditionExpression": condition,
+            "ExpressionAttributeValues": values,
+        }
+    }
+    return update
+
+
+def counters_update(sk, counters):
+    """TransactWriteItems entry that ADDs several numeric counters to an aggregate item."""
+    counters = {name: value for name, value in counters.items() if value}
+    if not counters:
+        return None
+    names = {f"#c{i}": name for i, name in enumerate(counters)}
+    values = {f":c{i}": {"N": str(value)} for i, value in enumerate(counters.values())}
+    return {
+        "Update": {
+            "TableName": table_name,
+            "Key": {"PK": {"S": AGGREGATE_PK}, "SK": {"S": sk}},
+            "UpdateExpression": "ADD " + ", ".join(f"{n} {v}" for n, v in zip(names, values)),
+            "ExpressionAttributeNames": names,
+            "ExpressionAttributeValues": values,
+        }
+    }
+
+
+def transaction_items(updates):
+    """Merge the updates of several attendees into one list of TransactWriteItems entries."""
+    histogram = Counter()
+    sponsor_stats = defaultdict(Counter)
+    items = []
+    for update in updates:
+        items.append(update.passport)
+        histogram.update(update.histogram)
+        for sponsor_id, counters in update.sponsor_stats.items():
+            sponsor_stats[sponsor_id].update(counters)
+
+    items.append(counters_update(HISTOGRAM_SK, histogram))
+    for sponsor_id, counters in sorted(sponsor_stats.items()):
+        items.append(counters_update(f"{SPONSOR_STATS_PREFIX}{sponsor_id}", counters))
+    return [item for item in items if item is not None]
+
+
+def pack_transactions(updates):
+    """Split the updates that write a PASSPORT into groups that fit in one transaction.
+
+    Every group holds its attendees' PASSPORT items plus the aggregate items
+    they touch (HISTOGRAM, SPONSOR_STATS#...), merged.
+    """
+    groups = []
+    group = []
+    for update in updates:
+        if update.passport is None:
+            continue
+        if group and len(transaction_items(group + [update])) > MAX_TRANSACTION_ITEMS:
+            groups.append(group)
+            group = []
+        group.append(update)
+    if group:
+        groups.append(group)
+    return groups
+
+
+def apply_updates(users):
+    """Write the new part of every attendee's records, one transaction per group.
+
+    A group whose transaction fails (a PASSPORT version that moved, a
+    conflict on a hot aggregate item, throttling) is read again and
+    retried; attendees that still fail are returned so their records are
+    reported back to the stream.
+
+    Returns:
+        tuple: (list of applied UserUpdate, set of failed user_ids)
+    """
+    applied = []
+    pending = list(users)
+
+    for attempt in range(TRANSACTION_RETRIES):
+        if attempt:
+            time.sleep(0.05 * 2**attempt)
+        items = get_passports(pending)
+        updates = [plan_update(user_id, users[user_id], items.get(user_id)) for user_id in pending]
+        applied.extend(update for update in updates if update.passport is None)
+
+        pending = []
+        for group in pack_transactions(updates):
+            try:
+                dynamodb.transact_write_items(TransactItems=transaction_items(group))
+            except ClientError as e:
+                print(f"Error writing the aggregates of {len(group)} users: {e}")
+                pending.extend(update.user_id for update in group)
+                continue
+            applied.extend(group)
+
+        if not pending:
+            return applied, set()
+
+    return applied, set(pending)
+
+
+def parse_leads(records):
+    """Group the new stamps of a batch by (sponsor_id, user_id).
+
+    Returns:
+        dict: {(sponsor_id, user_id): (set of created_at, latest notes)}
+    """
+    leads = {}
+    for record in records:
+        keys = record["dynamodb"]["Keys"]
+        pk = keys["PK"]["S"]
+        sk = keys["SK"]["S"]
+        if record["eventName"] != "INSERT" or not pk.startswith("USER#") or not sk.startswith("SPONSOR#"):
+            continue
+        _, sponsor_id, created_at = sk.split("#", 2)
+        notes = record["dynamodb"].get("NewImage", {}).get("notes", {}).get("S", "")
+
+        key = (sponsor_id, pk.split("#", 1)[1])
+        stamped_at, latest = leads.get(key, (set(), ""))
+        stamped_at.add(created_at)
+        leads[key] = (stamped_at, notes or latest)
+    return leads
+
+
+def update_lead(sponsor_id, user_id, stamped_at, notes):
+    """Add stamps to the LEAD item of an attendee in the sponsor's partition.
+
+    The stamp times go into a set, so a batch the stream delivers again
+    leaves the item as it was.
+    """
+    update = "ADD stamped_at :stamped_at"
+    values = {":stamped_at": {"SS": sorted(stamped_at)}}
+    # Guardamos las últimas notas que escribió el sponsor
+    if notes:
+        update += " SET notes = :notes"
+        values[":notes"] = {"S": notes}
+    dynamodb.update_item(
+        TableName=table_name,
+        Key={"PK": {"S": f"SPONSOR#{sponsor_id}"}, "SK": {"S": f"{LEAD_PREFIX}{user_id}"}},
+        UpdateExpression=update,
+        ExpressionAttributeValues=values,
+    )
+
+
+def mark_completed(user_ids):
+    dynamodb.update_item(
+        TableName=table_name,
+        Key={"PK": {"S": AGGREGATE_PK}, "SK": {"S": COMPLETED_SK}},
+        UpdateExpression="ADD #users :users",
+        ExpressionAttributeNames={"#users": "users"},
+        ExpressionAttributeValues={":users": {"SS": list(user_ids)}},
+    )
+    # analytics.py lee la bandera completed_passport directamente del perfil
+    for user_id in user_ids:
+        try:
+            dynamodb.update_item(
+                TableName=table_name,
+                Key={"PK": {"S": f"USER#{user_id}"}, "SK": {"S": "PROFILE"}},
+                UpdateExpression="SET completed_passport = :true",
+                ConditionExpression="attribute_exists(PK)",
+                ExpressionAttributeValues={":true": {"BOOL": True}},
+            )
+        except ClientError as e:
+            # No creamos perfiles vacíos para sellos de asistentes que ya no existen
+            if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+                raise
+
+
+def update_top_scanned(scans):
+    """Merge the latest scanned_count of some users ({user_id: count}) into the leaderboard item."""
+    for _ in range(TOP_SCANNED_RETRIES):
+        response = dynamodb.get_item(
+            TableName=table_name,
+            Key={"PK": {"S": AGGREGATE_PK}, "SK": {"S": TOP_SCANNED_SK}},
+            ConsistentRead=True,
+        )
+        item = response.get("Item", {})
+        version = int(item.get("version", {}).get("N", "0"))
+        leaders = {
+            user_id: int(count["N"])
+            for user_id, count in item.get("leaders", {}).get("M", {}).items()
+        }
+
+        leaders.update(scans)
+        top = sorted(leaders.items(), key=lambda leader: leader[1], reverse=True)
+        top = top[:TOP_SCANNED_SIZE]
+
+        try:
+            # Escritura optimista: si otro lote movió el leaderboard volvemos a leer
+            dynamodb.put_item(
+                TableName=table_name,
+                Item={
+                    "PK": {"S": AGGREGATE_PK},
+                    "SK": {"S": TOP_SCANNED_SK},
+                    "version": {"N": str(version + 1)},
+                    "leaders": {
+                        "M": {user_id: {"N": str(count)} for user_id, count in top}
+                    },
+                },
+                ConditionExpression="attribute_not_exists(PK) OR version = :version",
+                ExpressionAttributeValues={":version": {"N": str(version)}},
+            )
+            return
+        except ClientError as e:
+            if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+                raise
+    raise RuntimeError("Could not update the scanned leaderboard")
+
+
+# Función que mantiene los contadores a partir del stream de DynamoDB
+@instrument
+def lambda_handler(event, context):
+    """Apply a batch of stream records to the aggregates, safely across retries.
+
+    Each attendee's PASSPORT keeps what was already counted, and it is
+    written in the same transaction as the counters derived from it, so a
+    batch that the stream delivers again adds nothing twice. Attendees
+    whose writes fail are reported with ReportBatchItemFailures: the
+    stream retries from their first record and the records before it are
+    not replayed.
+    """
+    records = event.get("Records", [])
+    users = parse_records(records)
+
+    applied, failed = apply_updates(users)
+
+    # El set COMPLETED y la bandera del perfil se marcan aparte; ambos son idempotentes
+    completed = {update.user_id for update in applied if update.completed or update.recheck_completed}
+    if completed:
+        try:
+            mark_completed(completed)
+        except ClientError as e:
+            print(f"Error marking completed passports: {e}")
+            failed |= completed
+
+    for (sponsor_id, user_id), (stamped_at, notes) in parse_leads(records).items():
+        if user_id in failed:
+            continue
+        try:
+            update_lead(sponsor_id, user_id, stamped_at, notes)
+        except ClientError as e:
+            print(f"Error updating the lead of {user_id} for {sponsor_id}: {e}")
+            failed.add(user_id)
+
+    scans = {update.user_id: update.scanned_count for update in applied if update.scanned_count is not None}
+    if scans:
+        try:
+            update_top_scanned(scans)
+        except (ClientError, RuntimeError) as e:
+            print(f"Error updating the scanned leaderboard: {e}")
+            failed |= set(scans)
+
+    print(
+        f"Processed {len(records)} records: {len(users)} users, "
+        f"{sum(update.completed for update in applied)} passports completed, {len(failed)} users failed"
+    )
+
+    # El stream reintenta desde el primer registro fallido; lo que venga después
+    # ya aplicado se ignora gracias al estado del PASSPORT
+    sequence_numbers = [
+        sequence_number for user_id in failed for sequence_number in users[user_id].sequence_numbers
+    ]
+    if failed and not sequence_numbers:
+        raise RuntimeError(f"Could not apply the records of {len(failed)} users")
+    if not sequence_numbers:
+        return {"batchItemFailures": []}
+    return {"batchItemFailures": [{"itemIdentifier": min(sequence_numbers, key=int)}]}
@@ -0,0 +1,67 @@
+from aws_lambda_powertools.event_handler import APIGatewayRestResolver, Response
+
+import check_existence
+import get_information
+import get_passport_status
+import stamp_passport
+import unlock_activation
+import update_fields
+
+# Un solo entorno atiende todas las rutas del asistente: comparte los arranques
+# en frío, los clientes de boto3 y los caches en memoria (perfiles, tarjetas,
+# rate limit) que con funciones separadas se crean una vez por función
+app = APIGatewayRestResolver()
+
+
+def dispatch(handler):
+    """Run an existing lambda_handler with the original API Gateway event.
+
+    The handlers already build complete proxy responses (status, CORS
+    headers, ETag, serialized body), so they are passed through unchanged.
+    """
+    response = handler(app.current_event.raw_event, app.lambda_context)
+    return Response(
+        status_code=response["statusCode"],
+        body=response.get("body"),
+        headers=response.get("headers"),
+    )
+
+
+@app.get("/attendee")
+def attendee_information():
+    return dispatch(get_information.lambda_handler)
+
+
+@app.post("/attendee")
+def attendee_update():
+    return dispatch(update_fields.lambda_handler)
+
+
+@app.get("/attendee/validate")
+def attendee_validate():
+    return dispatch(check_existence.lambda_handler)
+
+
+@app.get("/attendee/activate")
+def attendee_activate():
+    return dispatch(unlock_activation.lambda_handler)
+
+
+@app.get("/attendee/passport")
+def attendee_passport():
+    return dispatch(get_passport_status.lambda_handler)
+
+
+@app.get("/sponsor/passport")
+def sponsor_passport_status():
+    return dispatch(get_passport_status.lambda_handler)
+
+
+@app.post("/sponsor/passport")
+def sponsor_stamp():
+    return dispatch(stamp_passport.lambda_handler)
+
+
+# Cada handler de las rutas ya emite su registro EMF, con el nombre del handler
+def lambda_handler(event, context):
+    return app.resolve(event, context)
@@ -0,0 +1,193 @@
+import hashlib
+import json
+import os
+import string
+from concurrent.futures import ThreadPoolExecutor
+
+from botocore.exceptions import ClientError
+from clients import get_client
+from models import serialize
+from public_card import claim_short_id
+
+TABLE_NAME = os.environ.get("DYNAMODB_TABLE_NAME")
+BADGE_QUEUE_URL = os.environ.get("BADGE_QUEUE_URL")
+
+# Modificamos BASE62 para usar solo mayúsculas y números
+BASE36 = string.digits + string.ascii_uppercase
+
+# Límite de SendMessageBatch y PutItem en paralelo (el pool de conexiones es de 10)
+SQS_BATCH_SIZE = 10
+SAVE_WORKERS = int(os.environ.get("PROFILE_SAVE_WORKERS", "10"))
+# Sales que se prueban antes de rendirse con un short_id
+MAX_SALT = 100
+
+
+class ShortIdExhausted(Exception):
+    """No free short_id was found for an attendee after MAX_SALT salts."""
+
+
+def base36_encode(num, alphabet=BASE36):
+    """Encode a positive number into Base36."""
+    if num == 0:
+        return alphabet[0]
+    arr = []
+    base = len(alphabet)
+    while num:
+        num, rem = divmod(num, base)
+        arr.append(alphabet[rem])
+    arr.reverse()
+    return "".join(arr)
+
+
+def event_code_source(data):
+    # Concatenate relevant data to create a unique string
+    return f"{data['barcode']}_{data['email']}_{data['first_name']}_{data['last_name']}"
+
+
+def generate_event_code(data, salt=0):
+    unique_string = event_code_source(data)
+    # Con colisión se agrega una sal, igual que ShortIdAllocator
+    if salt:
+        unique_string = f"{unique_string}#{salt}"
+
+    # Generate a SHA256 hash of the unique string
+    hash_object = hashlib.sha256(unique_string.encode())
+    hash_int = int(hash_object.hexdigest(), 16)
+
+    # Use the first 36 bits (6 characters in Base36) of the hash
+    truncated_hash = hash_int & ((1 << 36) - 1)
+
+    # Encode to Base36
+    event_code = base36_encode(truncated_hash)
+
+    # Pad with leading zeros if necessary to ensure 6 characters
+    event_code = event_code.zfill(6)
+
+    return event_code
+
+
+def extract_and_validate_data(attendee_data):
+
+    profile = attendee_data.get("profile", {})
+
+    return {
+        "first_name": profile.get("first_name", ""),
+        "last_name": profile.get("last_name", ""),
+        "cell_phone": profile.get("cell_phone", ""),
+        "email": profile.get("email", ""),
+        "job_title": profile.get("job_title", ""),
+        "company": profile.get("company", ""),
+        "gender": profile.get("gender", ""),
+        "barcode": attendee_data["barcodes"][0]["barcode"],
+        "initialized": False,
+    }
+
+
+def build_profile_item(data):
+    return {
+        "PK": f"USER#{data.get('barcode')}",
+        "SK": "PROFILE",
+        "first_name": data.get("first_name"),
+        "last_name": data.get("last_name"),
+        "short_id": data.get("short_id"),
+        "user_id": data.get("barcode"),
+        "initialized": data.get("initialized"),
+        "company": data.get("company"),
+        "contact_information": {
+            "email": data.get("email"),
+            "phone": data.get("cell_phone"),
+        },
+        "gender": data.get("gender"),
+        "role": data.get("job_title"),
+    }
+
+
+def current_salt(data):
+    """Salt that produced data["short_id"], or 0 when it is not a salted code."""
+    return next((salt for salt in range(1, MAX_SALT + 1) if generate_event_code(data, salt) == data["short_id"]), 0)
+
+
+def save_profile(data, table_name=TABLE_NAME):
+    """Create or refresh one profile unless the attendee already initialized it.
+
+    The short_id is claimed first with a conditional write on its
+    CARD#short_id item. The Bloom filter and the GSI lookups of
+    ShortIdAllocator miss codes taken by an import running at the same time;
+    when the claim fails, the source is salted again until a free code is
+    claimed, so data["short_id"] always ends up with the code that was saved.
+
+    Returns:
+        bool: False when the profile exists and is initialized
+    """
+    user_pk = f"USER#{data['barcode']}"
+    salt = None
+    while not claim_short_id(data["short_id"], user_pk, table_name):
+        # Otro perfil ya tiene el código: probamos con la siguiente sal
+        salt = (current_salt(data) if salt is None else salt) + 1
+        if salt > MAX_SALT:
+            raise ShortIdExhausted(f"Could not find a free short_id for {data['barcode']}")
+        data["short_id"] = generate_event_code(data, salt)
+
+    try:
+        get_client("dynamodb").put_item(
+            TableName=table_name,
+            Item={key: serialize(value) for key, value in build_profile_item(data).items()},
+            ConditionExpression="attribute_not_exists(PK) OR initialized = :false",
+            ExpressionAttributeValues={":false": {"BOOL": False}},
+        )
+    except ClientError as e:
+        if e.response["Error"]["Code"] == "ConditionalCheckFailedException":
+            return False
+        raise
+    return True
+
+
+def save_profiles(attendees, table_name=TABLE_NAME):
+    """Create or refresh the profiles of not yet initialized attendees.
+
+    Every profile is written with its own conditional PutItem, sent in
+    parallel, so an attendee who initializes the profile while the batch is
+    being saved is never overwritten. Throttled writes are retried by the
+    client; any other error is raised.
+
+    Returns:
+        tuple: (saved attendees, skipped attendees)
+    """
+    attendees = list({data["barcode"]: data for data in attendees}.values())
+    if not attendees:
+        return [], []
+
+    with ThreadPoolExecutor(max_workers=min(SAVE_WORKERS, len(attendees))) as executor:
+        results = list(executor.map(lambda data: save_profile(data, table_name), attendees))
+
+    saved = [data for data, written in zip(attendees, results) if written]
+    skipped = [data for data, written in zip(attendees, results) if not written]
+    return saved, skipped
+
+
+def send_badges(attendees, queue_url=BADGE_QUEUE_URL):
+    """Queue the badge messages of the attendees, ten per SendMessageBatch call.
+
+    Returns:
+        list: barcodes whose message could not be sent
+    """
+    sqs = get_client("sqs")
+    failed = []
+
+    for start in range(0, len(attendees), SQS_BATCH_SIZE):
+        chunk = attendees[start:start + SQS_BATCH_SIZE]
+        response = sqs.send_message_batch(
+            QueueUrl=queue_url,
+            Entries=[
+                {
+                    "Id": str(index),
+                    "MessageBody": json.dumps(data),
+                    "MessageGroupId": data["barcode"],
+                    "MessageDeduplicationId": data["barcode"],
+                }
+                for index, data in enumerate(chunk)
+            ],
+        )
+        failed.extend(chunk[int(entry["Id"])]["barcode"] for entry in response.get("Failed", []))
+
+    return failed
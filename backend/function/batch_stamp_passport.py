@@ -0,0 +1,241 @@
+import json
+import os
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+from botocore.exceptions import ClientError
+from instrumentation import instrument
+from profile_cache import get_user_id
+from sponsor_auth import SECRET_KEY, verify_sponsor_jwt
+from stamp_passport import (
+    MAX_ATTEMPTS,
+    MAX_TRANSACTION_STAMPS,
+    STAMP_WINDOW,
+    get_existing_stamps,
+    get_last_stamp,
+    is_conflict,
+    valid_notes,
+    write_stamps,
+)
+from utils import generate_http_response
+
+# Máximo de sellos por solicitud (una tablet offline rara vez junta más)
+MAX_BATCH_SIZE = 100
+MAX_WORKERS = 8
+# Tolerancia para relojes de tablets adelantados
+CLOCK_SKEW = timedelta(minutes=2)
+# Una tablet sincroniza lo escaneado durante el evento; sellos más viejos vienen de un
+# reloj mal puesto o de un payload armado
+MAX_OFFLINE_AGE = timedelta(hours=float(os.environ.get("BATCH_STAMP_MAX_AGE_HOURS", "48")))
+# Marca de un short_id que no se pudo resolver por un error de DynamoDB
+LOOKUP_FAILED = object()
+
+
+def parse_scanned_at(value, now):
+    """Parse a client scan timestamp into an aware UTC datetime, or None if invalid."""
+    if not isinstance(value, str):
+        return None
+    try:
+        scanned_at = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+
+    # Si la tablet no manda zona horaria, asumimos UTC
+    if scanned_at.tzinfo is None:
+        scanned_at = scanned_at.replace(tzinfo=timezone.utc)
+    scanned_at = scanned_at.astimezone(timezone.utc)
+
+    if scanned_at > now + CLOCK_SKEW or scanned_at < now - MAX_OFFLINE_AGE:
+        return None
+    return min(scanned_at, now)
+
+
+def resolve_user_id(short_id):
+    try:
+        return get_user_id(short_id)
+    except ClientError as e:
+        print(f"Error resolving short_id {short_id}: {e}")
+        return LOOKUP_FAILED
+
+
+def select_stamps(scans, existing):
+    """Keep the scans that are at least STAMP_WINDOW away from any other stamp.
+
+    Args:
+        scans (list): (scanned_at, index) tuples of a single user
+        existing (list): Timestamps already stored for the user with the sponsor
+
+    Returns:
+        set: Indexes of the accepted scans
+    """
+    accepted = set()
+    stamped = sorted(existing)
+    for scanned_at, index in sorted(scans):
+        if any(abs(scanned_at - other) < STAMP_WINDOW for other in stamped):
+            continue
+        stamped.append(scanned_at)
+        accepted.add(index)
+    return accepted
+
+
+def last_stamp_condition(last):
+    """Condition that the "last stamp" item is still the one that was read."""
+    if last is None:
+        return "attribute_not_exists(PK)", None
+    created_at, version = last
+    if version is None:
+        # Ítems anteriores a la versión: cualquier sello nuevo les agrega una
+        return "attribute_not_exists(version) AND created_at = :last", {":last": {"S": created_at.isoformat()}}
+    return "version = :version", {":version": {"N": str(version)}}
+
+
+def stamp_user(user_id, sponsor_id, scans):
+    """Write the scans of one attendee that respect the window, atomically.
+
+    The "last stamp" item is read first and the history around the scans
+    after it, both strongly consistent. The accepted scans are then written
+    in transactions conditioned on the version that was read, so a live
+    stamp or another batch that lands in between cancels the write and the
+    remaining scans are evaluated again against the new history.
+
+    A DynamoDB error only affects the scans that were not written yet,
+    which come back as "error"; the tablet can send them again.
+
+    Args:
+        scans (list): (scanned_at, index, notes) tuples of the attendee
+
+    Returns:
+        dict: index -> "stamped", "duplicate" or "error"
+    """
+    statuses = {}
+    pending = sorted(scans)
+
+    for _ in range(MAX_ATTEMPTS):
+        try:
+            pending = stamp_attempt(user_id, sponsor_id, pending, statuses)
+        except ClientError as e:
+            pending = [scan for scan in pending if scan[1] not in statuses]
+            # Un conflicto con otra transacción se reintenta; cualquier otro error no
+            if not is_conflict(e):
+                print(f"Error stamping {user_id} for {sponsor_id}: {e}")
+                break
+        if not pending:
+            return statuses
+
+    statuses.update((index, "error") for _, index, _ in pending)
+    return statuses
+
+
+def stamp_attempt(user_id, sponsor_id, pending, statuses):
+    """Evaluate and write the pending scans once; return the ones to try again."""
+    last = get_last_stamp(user_id, sponsor_id)
+    times = [scanned_at for scanned_at, _, _ in pending]
+    existing = get_existing_stamps(
+        user_id, sponsor_id, min(times) - STAMP_WINDOW, max(times) + STAMP_WINDOW
+    )
+    accepted = select_stamps([(scanned_at, index) for scanned_at, index, _ in pending], existing)
+
+    to_write = []
+    for scanned_at, index, notes in pending:
+        if index in accepted:
+            to_write.append((scanned_at, index, notes))
+        else:
+            statuses[index] = "duplicate"
+
+    pending = []
+    for start in range(0, len(to_write), MAX_TRANSACTION_STAMPS):
+        chunk = to_write[start : start + MAX_TRANSACTION_STAMPS]
+        latest = max(scanned_at for scanned_at, _, _ in chunk)
+        if last is not None:
+            latest = max(latest, last[0])
+        condition, values = last_stamp_condition(last)
+        saved, _ = write_stamps(
+            user_id,
+            sponsor_id,
+            [(scanned_at, notes) for scanned_at, _, notes in chunk],
+            latest,
+            condition,
+            values,
+        )
+        if not saved:
+            pending = to_write[start:]
+            break
+        statuses.update((index, "stamped") for _, index, _ in chunk)
+        last = (latest, (last[1] or 0) + 1 if last else 1)
+    return pending
+
+
+# Función para guardar varios sellos escaneados sin conexión
+@instrument
+def lambda_handler(event, context):
+    # Parsear el cuerpo de la solicitud
+    try:
+        body = json.loads(event["body"])
+        stamps = body["stamps"]
+        jwt_token = body["jwt"]
+    except (KeyError, TypeError, json.JSONDecodeError):
+        return generate_http_response(400, {"error": "Invalid input"})
+
+    if not isinstance(stamps, list) or not stamps:
+        return generate_http_response(400, {"error": "stamps must be a non-empty list"})
+    if len(stamps) > MAX_BATCH_SIZE:
+        return generate_http_response(
+            400, {"error": f"A batch can contain at most {MAX_BATCH_SIZE} stamps"}
+        )
+
+    # Verificar el JWT una sola vez para todo el lote
+    jwt_payload = verify_sponsor_jwt(jwt_token, SECRET_KEY)
+    if jwt_payload is None:
+        return generate_http_response(403, {"error": "Invalid or expired JWT"})
+
+    sponsor_id = jwt_payload.get("sponsor_id")
+    if not sponsor_id:
+        return generate_http_response(403, {"error": "JWT does not contain sponsor_id"})
+
+    now = datetime.now(timezone.utc)
+    results = [None] * len(stamps)
+    valid = {}
+
+    # Validar cada sello de manera independiente
+    for index, stamp in enumerate(stamps):
+        short_id = stamp.get("short_id") if isinstance(stamp, dict) else None
+        scanned_at = parse_scanned_at(stamp.get("scanned_at"), now) if short_id else None
+        notes = (stamp.get("notes") or "") if short_id else None
+        if not isinstance(short_id, str) or scanned_at is None or not valid_notes(notes):
+            results[index] = {"short_id": short_id, "status": "invalid"}
+            continue
+        valid[index] = (short_id, scanned_at, notes)
+
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        # Resolver los short_id distintos en paralelo (pasando por el cache)
+        short_ids = list({short_id for short_id, _, _ in valid.values()})
+        resolved = dict(zip(short_ids, executor.map(resolve_user_id, short_ids)))
+
+        scans_by_user = defaultdict(list)
+        for index, (short_id, scanned_at, notes) in valid.items():
+            user_id = resolved[short_id]
+            if user_id is None or user_id is LOOKUP_FAILED:
+                status = "not_found" if user_id is None else "error"
+                results[index] = {"short_id": short_id, "status": status}
+                continue
+            scans_by_user[user_id].append((scanned_at, index, notes))
+
+        # Cada asistente se escribe con su propia transacción condicional; un
+        # error solo marca los sellos de ese asistente, los demás quedan guardados
+        user_ids = list(scans_by_user)
+        statuses = executor.map(
+            lambda user_id: stamp_user(user_id, sponsor_id, scans_by_user[user_id]),
+            user_ids,
+        )
+        for user_statuses in statuses:
+            for index, status in user_statuses.items():
+                results[index] = {"short_id": valid[index][0], "status": status}
+
+    return generate_http_response(
+        200,
+        {
+            "stamped": sum(1 for result in results if result["status"] == "stamped"),
+            "results": results,
+        },
+    )
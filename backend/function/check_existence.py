@@ -1,17 +1,19 @@
-import os
-
-import boto3
 from botocore.exceptions import ClientError
-from utils import generate_http_response
+from instrumentation import instrument
+from models import Profile
+from profile_cache import get_profile
+from rate_limit import RequestLimiter
+from utils import generate_http_response, generate_throttled_response
 
-# Inicializamos el cliente de DynamoDB
-dynamodb = boto3.client("dynamodb")
+# Solo leemos del GSI lo que usa la respuesta
+PROFILE_ATTRIBUTES = ("contact_information.email", "contact_information.phone", "initialized")
 
-# Definir el nombre de la tabla
-table_name = os.environ.get("DYNAMODB_TABLE_NAME")
-index_name = os.environ.get("INDEX_NAME")
+# Un asistente valida su short_id una vez, pero en el registro cientos lo hacen detrás
+# de la misma IP del WiFi: la IP solo frena la enumeración masiva
+limits = RequestLimiter("validate", ip_rate=50, ip_burst=500, short_id_rate=1, short_id_burst=10)
 
 
+@instrument
 def lambda_handler(event, context):
     # Obtener el short_id de la solicitud HTTP enviada por API Gateway
     try:
@@ -19,30 +21,24 @@ def lambda_handler(event, context):
     except KeyError:
         return generate_http_response(400, {"error": "short_id is required"})
 
+    # Cortamos el tráfico excesivo antes de consultar DynamoDB
+    retry_after = limits.check(event, short_id)
+    if retry_after:
+        return generate_throttled_response(retry_after)
+
     try:
-        # Realizamos el query usando el índice global secundario (GSI)
-        response = dynamodb.query(
-            TableName=table_name,
-            IndexName=index_name,
-            KeyConditionExpression="short_id = :sid",
-            ExpressionAttributeValues={":sid": {"S": short_id}},
-        )
+        # Buscamos el perfil en el cache compartido (o en el GSI si no está)
+        item = get_profile(short_id, attributes=PROFILE_ATTRIBUTES)
 
         # Revisar si el ítem existe
-        if "Items" not in response or len(response["Items"]) == 0:
+        if item is None:
             return generate_http_response(404, {"error": "short_id not found"})
 
         # Obtener la información de contacto
-        item = response["Items"][
-            0
-        ]  # Suponemos que el short_id es único y tomamos el primer resultado
-        contact_info = item.get("contact_information", {}).get("M", {})
-
-        email = contact_info.get("email", {}).get("S")
-        phone = contact_info.get("phone", {}).get("S")
-        initialized = item.get("initialized", {}).get(
-            "BOOL", False
-        )  # Obtener el valor de initialized (suponiendo que es un campo booleano)
+        profile = Profile.from_item(item)
+        email = profile.contact_information.email
+        phone = profile.contact_information.phone
+        initialized = profile.initialized
 
         # Revisar si tiene tanto celular como correo electrónico
         if email and phone:
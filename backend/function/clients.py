@@ -0,0 +1,82 @@
+import os
+import random
+import threading
+
+# Los clientes se crean en la primera llamada y se comparten entre módulos,
+# así importar un handler no paga el costo de cargar boto3 ni los modelos de servicio
+_clients = {}
+_resources = {}
+_lock = threading.Lock()
+
+# Intentos por llamada (botocore) y para lo que DynamoDB deja sin procesar en los batch
+MAX_ATTEMPTS = int(os.environ.get("AWS_MAX_ATTEMPTS", "3"))
+RETRY_BASE_SECONDS = 0.05
+RETRY_MAX_SECONDS = float(os.environ.get("AWS_RETRY_MAX_SECONDS", "1"))
+
+
+def _config():
+    from botocore.config import Config
+
+    return Config(
+        connect_timeout=float(os.environ.get("AWS_CONNECT_TIMEOUT", "1")),
+        read_timeout=float(os.environ.get("AWS_READ_TIMEOUT", "3")),
+        retries={
+            "mode": os.environ.get("AWS_RETRY_MODE", "standard"),
+            "max_attempts": MAX_ATTEMPTS,
+        },
+        tcp_keepalive=True,
+        max_pool_connections=int(os.environ.get("AWS_MAX_POOL_CONNECTIONS", "10")),
+    )
+
+
+def retry_delay(attempt):
+    """Capped exponential backoff with full jitter before retry number attempt (from 0)."""
+    return random.uniform(0, min(RETRY_MAX_SECONDS, RETRY_BASE_SECONDS * 2**attempt))
+
+
+def get_client(service_name):
+    """Return the shared boto3 client of a service, creating it on first use."""
+    client = _clients.get(service_name)
+    if client is None:
+        with _lock:
+            client = _clients.get(service_name)
+            if client is None:
+                import boto3
+
+                from instrumentation import register_client
+
+                client = boto3.client(service_name, config=_config())
+                register_client(client)
+                _clients[service_name] = client
+    return client
+
+
+def get_resource(service_name):
+    """Return the shared boto3 resource of a service, creating it on first use."""
+    resource = _resources.get(service_name)
+    if resource is None:
+        with _lock:
+            resource = _resources.get(service_name)
+            if resource is None:
+                import boto3
+
+                from instrumentation import register_client
+
+                resource = boto3.resource(service_name, config=_config())
+                register_client(resource.meta.client)
+                _resources[service_name] = resource
+    return resource
+
+
+class LazyClient:
+    """Module-level stand-in for a boto3 client that is only created when used.
+
+    Handlers keep calling ``dynamodb.query(...)`` as before, but the client
+    (and boto3 itself) is loaded on the first call and reused afterwards.
+    """
+
+    def __init__(self, service_name):
+        self._service_name = service_name
+
+    def __getattr__(self, name):
+        return getattr(get_client(self._service_name), name)
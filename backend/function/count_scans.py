@@ -0,0 +1,222 @@
+import json
+import os
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+from botocore.exceptions import ClientError
+from clients import MAX_ATTEMPTS, LazyClient, retry_delay
+from instrumentation import instrument
+from sketches import HyperLogLog
+
+# Inicializar cliente de DynamoDB
+dynamodb = LazyClient("dynamodb")
+
+table_name = os.environ.get("DYNAMODB_TABLE_NAME")
+
+# Updates en paralelo, uno por asistente del lote
+MAX_WORKERS = int(os.environ.get("COUNT_SCANS_WORKERS", "8"))
+
+# Registros del HyperLogLog de dispositivos por asistente: 2^9 bytes, ~4.6% de error
+PRECISION = int(os.environ.get("SCAN_SKETCH_PRECISION", "9"))
+SKETCH_SK = "SCANS"
+BATCH_GET_SIZE = 100
+
+
+@dataclass
+class Sketch:
+    """Device sketch of a profile, as read before merging a batch into it."""
+
+    sketch: HyperLogLog
+    # 0 si todavía no hay ítem SCANS
+    version: int = 0
+    # scanned_count anterior a los sketches, al que se suma la estimación
+    base_count: int = 0
+    # Último scanned_count escrito
+    scanned_count: int = 0
+
+
+def parse_records(records):
+    """Group the scan messages of a batch by profile.
+
+    Every (profile, device) pair counts once, no matter how many times the
+    device refreshed the profile. Malformed messages are dropped,
+    retrying them would only send them to the dead-letter queue later.
+
+    Returns:
+        tuple: ({(PK, SK): set of devices}, {(PK, SK): [messageId, ...]})
+    """
+    devices = defaultdict(set)
+    message_ids = defaultdict(list)
+
+    for record in records:
+        try:
+            body = json.loads(record["body"])
+            key = (body["PK"], body["SK"])
+            device = body["device"]
+        except (KeyError, TypeError, json.JSONDecodeError) as e:
+            print(f"Dropping scan message {record.get('messageId')}: {e}")
+            continue
+        if not (isinstance(key[0], str) and key[0].startswith("USER#") and key[1] == "PROFILE" and device):
+            print(f"Dropping scan message {record.get('messageId')}: invalid key or device")
+            continue
+
+        devices[key].add(str(device))
+        message_ids[key].append(record["messageId"])
+
+    return devices, message_ids
+
+
+def batch_get(keys, projection):
+    """Read items with consistent BatchGetItem calls, retrying unprocessed keys.
+
+    Unprocessed keys mean the table is throttling, so they are requested
+    again after a capped, jittered exponential backoff, up to the
+    MAX_ATTEMPTS of the clients; then the batch fails and SQS redelivers it.
+    """
+    items = []
+    for start in range(0, len(keys), BATCH_GET_SIZE):
+        request = {
+            table_name: {
+                "Keys": [{"PK": {"S": pk}, "SK": {"S": sk}} for pk, sk in keys[start:start + BATCH_GET_SIZE]],
+                "ProjectionExpression": projection,
+                # Lectura consistente para no competir con una versión vieja
+                "ConsistentRead": True,
+            }
+        }
+        for attempt in range(MAX_ATTEMPTS):
+            response = dynamodb.batch_get_item(RequestItems=request)
+            items.extend(response["Responses"].get(table_name, []))
+            request = response.get("UnprocessedKeys")
+            if not request:
+                break
+            time.sleep(retry_delay(attempt))
+        else:
+            raise RuntimeError(f"Could not read {len(request[table_name]['Keys'])} items")
+    return items
+
+
+def load_sketches(keys):
+    """Read the device sketches of the given profiles.
+
+    Profiles without a sketch yet may carry a scanned_count from before the
+    sketches (one ADD per message); it is kept as the offset the sketch
+    counts from, so the first write does not erase it.
+
+    Returns:
+        dict: {(PK, SK): Sketch}, version 0 if there is no sketch yet
+    """
+    sketches = {key: Sketch(HyperLogLog(PRECISION)) for key in keys}
+    for item in batch_get([(pk, SKETCH_SK) for pk, _ in keys], "PK, sketch, version, base_count, scanned_count"):
+        sketch = HyperLogLog.from_bytes(item["sketch"]["B"])
+        if sketch.precision != PRECISION:
+            # Cambió la precisión configurada: se empieza un sketch nuevo
+            sketch = HyperLogLog(PRECISION)
+        sketches[(item["PK"]["S"], "PROFILE")] = Sketch(
+            sketch,
+            int(item["version"]["N"]),
+            int(item.get("base_count", {"N": "0"})["N"]),
+            int(item.get("scanned_count", {"N": "0"})["N"]),
+        )
+
+    missing = [key for key in keys if not sketches[key].version]
+    for item in batch_get(missing, "PK, SK, scanned_count"):
+        if "scanned_count" in item:
+            count = int(item["scanned_count"]["N"])
+            sketches[(item["PK"]["S"], item["SK"]["S"])] = Sketch(HyperLogLog(PRECISION), 0, count, count)
+    return sketches
+
+
+def add_scans(key, devices, state):
+    """Merge the devices into the profile's sketch and store the new estimate.
+
+    The sketch and scanned_count are written in one transaction guarded by
+    the sketch version, so a concurrent batch for the same attendee makes
+    this one retry instead of overwriting its devices. Devices already in
+    the sketch do not change it and cost no write at all.
+
+    scanned_count is the base count plus the estimate, and never goes below
+    the last value written: the stream aggregates add its differences to
+    total_scans.
+
+    Returns:
+        bool: False if the write failed and its messages must be retried
+    """
+    pk, sk = key
+    sketch = state.sketch
+    if not sketch.update(devices):
+        return True
+    count = max(state.scanned_count, state.base_count + sketch.count())
+
+    try:
+        dynamodb.transact_write_items(
+            TransactItems=[
+                {
+                    "Put": {
+                        "TableName": table_name,
+                        "Item": {
+                            "PK": {"S": pk},
+                            "SK": {"S": SKETCH_SK},
+                            "sketch": {"B": sketch.to_bytes()},
+                            "version": {"N": str(state.version + 1)},
+                            "base_count": {"N": str(state.base_count)},
+                            "scanned_count": {"N": str(count)},
+                        },
+                        "ConditionExpression": "attribute_not_exists(PK) OR version = :version",
+                        "ExpressionAttributeValues": {":version": {"N": str(state.version)}},
+                    }
+                },
+                {
+                    "Update": {
+                        "TableName": table_name,
+                        "Key": {"PK": {"S": pk}, "SK": {"S": sk}},
+                        "UpdateExpression": "SET scanned_count = :count",
+                        # No creamos perfiles a medias si el asistente ya no existe
+                        "ConditionExpression": "attribute_exists(PK)",
+                        "ExpressionAttributeValues": {":count": {"N": str(count)}},
+                    }
+                },
+            ]
+        )
+    except ClientError as e:
+        reasons = [reason.get("Code") for reason in e.response.get("CancellationReasons", [])]
+        if len(reasons) == 2 and reasons[1] == "ConditionalCheckFailed" and reasons[0] in ("None", None):
+            print(f"Dropping {len(devices)} scans of missing profile {pk}")
+            return True
+        print(f"Error updating scanned_count of {pk}: {e}")
+        return False
+    except Exception as e:
+        print(f"Error updating scanned_count of {pk}: {e}")
+        return False
+    return True
+
+
+# Función que cuenta los escaneos legítimos que get_information deja en la cola
+@instrument
+def lambda_handler(event, context):
+    devices, message_ids = parse_records(event.get("Records", []))
+
+    keys = list(devices)
+    if not keys:
+        return {"batchItemFailures": []}
+
+    try:
+        sketches = load_sketches(keys)
+    except Exception as e:
+        print(f"Error reading scan sketches: {e}")
+        return {"batchItemFailures": [{"itemIdentifier": message_id} for key in keys for message_id in message_ids[key]]}
+
+    # Una sola escritura por asistente, y ninguna si todos sus dispositivos ya estaban contados
+    with ThreadPoolExecutor(max_workers=max(1, min(MAX_WORKERS, len(keys)))) as executor:
+        results = list(executor.map(lambda key: add_scans(key, devices[key], sketches[key]), keys))
+
+    # Solo se reintentan los mensajes de los asistentes cuyo update falló; como
+    # el sketch ignora dispositivos repetidos, reintentar nunca cuenta doble
+    failures = [
+        {"itemIdentifier": message_id}
+        for key, ok in zip(keys, results)
+        if not ok
+        for message_id in message_ids[key]
+    ]
+    return {"batchItemFailures": failures}
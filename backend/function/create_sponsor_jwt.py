@@ -1,30 +1,14 @@
-import base64
-import hashlib
-import hmac
 import json
-import os
 from datetime import datetime, timedelta
 
-import boto3
 from botocore.exceptions import ClientError
+from instrumentation import instrument
+from sponsor_auth import SECRET_KEY, base64url_encode, get_sponsor, key_version, sign
 from utils import generate_http_response
 
-# Inicializar el cliente de DynamoDB
-dynamodb = boto3.client("dynamodb")
-
-table_name = os.environ.get("DYNAMODB_TABLE_NAME")
-
-# Clave secreta para firmar el JWT (debería almacenarse de forma segura)
-SECRET_KEY = "my_super_secret_key"
-
-
-# Función para codificar en base64 URL-safe
-def base64url_encode(input: bytes):
-    return base64.urlsafe_b64encode(input).decode("utf-8").replace("=", "")
-
 
 # Función para generar el JWT
-def jwt(sponsor_id, sponsor_name, secret_key):
+def jwt(sponsor_id, sponsor_name, secret_key, sponsor_key_version=None):
     segments = []
 
     # Crear el encabezado y el payload
@@ -35,6 +19,9 @@ def jwt(sponsor_id, sponsor_name, secret_key):
         "sponsor_name": sponsor_name,
         "exp": int(expiration_time.timestamp()),
     }
+    # Con la versión de la llave, cambiarla en el perfil del sponsor revoca el token
+    if sponsor_key_version:
+        payload["key_version"] = sponsor_key_version
 
     # Convertir a JSON y codificar en Base64
     json_header = json.dumps(header, separators=(",", ":")).encode()
@@ -46,8 +33,7 @@ def jwt(sponsor_id, sponsor_name, secret_key):
 
     # Firmar con HMAC usando HS256
     signing_input = ".".join(segments).encode()
-    key = secret_key.encode()
-    signature = hmac.new(key, signing_input, hashlib.sha256).digest()
+    signature = sign(signing_input, secret_key)
 
     # Codificar la firma en Base64 y agregar a los segmentos
     segments.append(base64url_encode(signature))
@@ -58,6 +44,7 @@ def jwt(sponsor_id, sponsor_name, secret_key):
     return encoded_string
 
 
+@instrument
 def lambda_handler(event, context):
     try:
         # Obtener el body de la solicitud y validarlo
@@ -69,30 +56,28 @@ def lambda_handler(event, context):
         sponsor_id = body["sponsor_id"]
         sponsor_key = body["sponsor_key"]
 
-        # Formatear el PK utilizando el id_sponsor
-        pk = f"SPONSOR#{sponsor_id}"
+        # Consultar el sponsor (cache de corta duración o DynamoDB) para verificar la key;
+        # una key revocada puede seguir entrando hasta SPONSOR_CACHE_TTL_SECONDS
+        sponsor = get_sponsor(sponsor_id)
 
-        # Consultar en DynamoDB para verificar el PK y key
-        response = dynamodb.get_item(
-            TableName=table_name, Key={"PK": {"S": pk}, "SK": {"S": "PROFILE"}}
-        )
+        # Si la key no coincide la volvemos a leer, por si se cambió hace poco
+        if sponsor is not None and sponsor.key != sponsor_key:
+            sponsor = get_sponsor(sponsor_id, refresh=True)
 
         # Verificar si el sponsor existe
-        if "Item" not in response:
+        if sponsor is None:
             return generate_http_response(404, {"error": "Sponsor not found"})
 
-        sponsor = response["Item"]
-
         # Verificar si la key proporcionada coincide
-        if sponsor["key"]["S"] != sponsor_key:
+        if sponsor.key != sponsor_key:
             return generate_http_response(403, {"error": "Invalid sponsor key"})
 
         # Obtener sponsor_id y sponsor_name
-        sponsor_id = sponsor["sponsor_id"]["S"]
-        sponsor_name = sponsor["sponsor_name"]["S"]
+        sponsor_id = sponsor.sponsor_id
+        sponsor_name = sponsor.sponsor_name
 
         # Generar el JWT firmado por 24 horas
-        token = jwt(sponsor_id, sponsor_name, SECRET_KEY)
+        token = jwt(sponsor_id, sponsor_name, SECRET_KEY, key_version(sponsor.key))
 
         # Devolver el JWT
         return generate_http_response(200, {"token": token})
@@ -0,0 +1,143 @@
+import json
+import os
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from attendees import extract_and_validate_data, save_profiles, send_badges
+from aws_lambda_powertools import Logger, Tracer
+from clients import get_client
+from instrumentation import instrument
+from short_ids import ShortIdAllocator
+
+logger = Logger()
+# Only patch what this handler calls instead of every library X-Ray supports
+tracer = Tracer(patch_modules=["botocore", "requests"])
+
+# Configuration from environment variables
+SECRET_NAME = os.environ.get("SECRET_NAME")
+EVENTBRITE_TIMEOUT = float(os.environ.get("EVENTBRITE_TIMEOUT", "3"))
+FETCH_WORKERS = int(os.environ.get("EVENTBRITE_FETCH_WORKERS", "10"))
+
+_private_token = None
+_session = None
+
+
+class PermanentError(Exception):
+    """The message can never succeed, retrying it would only block the queue."""
+
+
+def get_private_token():
+    """Retrieve the private token from Secrets Manager on first use."""
+    global _private_token
+    if _private_token is None:
+        secret = get_client("secretsmanager").get_secret_value(SecretId=SECRET_NAME)
+        token = secret.get("SecretString")
+        if not token:
+            raise ValueError("Private token not found in Secrets Manager")
+        _private_token = token
+    return _private_token
+
+
+def get_session():
+    """Return a pooled HTTP session reused across the batch and invocations."""
+    global _session
+    if _session is None:
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=FETCH_WORKERS)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        session.headers.update(
+            {
+                "Authorization": f"Bearer {get_private_token()}",
+                "Content-Type": "application/json",
+            }
+        )
+        _session = session
+    return _session
+
+
+def fetch_attendee(record):
+    """Fetch the attendee of a queued webhook and return its profile data."""
+    body = json.loads(record["body"])
+    response = get_session().get(body["api_url"], timeout=EVENTBRITE_TIMEOUT)
+
+    # 429 and 5xx are worth retrying, any other client error is not
+    if 400 <= response.status_code < 500 and response.status_code != 429:
+        raise PermanentError(f"Eventbrite answered {response.status_code} for {body['api_url']}")
+    response.raise_for_status()
+
+    try:
+        data = extract_and_validate_data(response.json())
+    except (KeyError, IndexError, ValueError) as e:
+        raise PermanentError(f"Error extracting data from JSON: {str(e)}")
+    return data
+
+
+@instrument
+@logger.inject_lambda_context(log_event=False)
+@tracer.capture_lambda_handler
+def lambda_handler(event, context):
+    """Process queued Eventbrite webhooks in batches.
+
+    Attendees are fetched in parallel, the profiles are saved with
+    conditional writes and the badge messages are sent with
+    SendMessageBatch, also for attendees whose profile was already
+    initialized. Only the messages that failed in a retryable way are
+    reported back to SQS.
+    """
+    records = event.get("Records", [])
+    failures = []
+    # Eventbrite can send the same attendee twice in a batch, we keep the last one
+    attendees = {}
+    message_ids = defaultdict(list)
+
+    with ThreadPoolExecutor(max_workers=min(FETCH_WORKERS, len(records) or 1)) as executor:
+        results = executor.map(_fetch_or_error, records)
+        for record, (data, error) in zip(records, results):
+            if isinstance(error, PermanentError):
+                logger.error(f"Dropping webhook {record['messageId']}: {str(error)}")
+            elif error is not None:
+                logger.error(f"Error retrieving attendee data: {str(error)}")
+                failures.append(record["messageId"])
+            else:
+                attendees[data["barcode"]] = data
+                message_ids[data["barcode"]].append(record["messageId"])
+
+    if attendees:
+        try:
+            # Los short_id se asignan por lote, revisando colisiones contra el GSI
+            ShortIdAllocator().assign(list(attendees.values()))
+            saved, skipped = save_profiles(attendees.values())
+        except Exception as e:
+            logger.error(f"Error saving to DynamoDB: {str(e)}")
+            failures.extend(message_id for ids in message_ids.values() for message_id in ids)
+            return {"batchItemFailures": [{"itemIdentifier": message_id} for message_id in failures]}
+
+        for data in skipped:
+            logger.warning(
+                f"Record with barcode {data['barcode']} already exists and is initialized. No update performed."
+            )
+
+        # Como antes de la cola: el gafete se envía aunque el perfil no se haya actualizado
+        badges = saved + skipped
+        try:
+            failed_badges = send_badges(badges)
+        except Exception as e:
+            logger.error(f"Error sending messages to SQS: {str(e)}")
+            failed_badges = [data["barcode"] for data in badges]
+        for barcode in failed_badges:
+            failures.extend(message_ids[barcode])
+
+        logger.info(f"{len(saved)} profiles saved, {len(skipped)} skipped, {len(failed_badges)} badges failed")
+
+    return {"batchItemFailures": [{"itemIdentifier": message_id} for message_id in failures]}
+
+
+def _fetch_or_error(record):
+    try:
+        return fetch_attendee(record), None
+    except Exception as e:
+        return None, e
@@ -1,22 +1,45 @@
-import json
 import os
 
-import boto3
 from botocore.exceptions import ClientError
-from utils import generate_http_response
+from instrumentation import instrument
+from profile_cache import get_profile
+from public_card import get_card, refresh_card
+from rate_limit import RequestLimiter
+from sketches import WindowedBloomFilter
+from telemetry import RETURN_FLUSH_SECONDS, get_emitter
+from utils import etag_matches, generate_http_response, generate_raw_response, generate_throttled_response
 
-# Inicializamos el cliente de DynamoDB
-dynamodb = boto3.client("dynamodb")
-# Inicializar cliente de SQS
-sqs = boto3.client("sqs")
-
-# Definir el nombre de la tabla y el índice global secundario (GSI)
-table_name = os.environ.get("DYNAMODB_TABLE_NAME")
-index_name = os.environ.get("INDEX_NAME")
 queue_url = os.environ.get("QUEUE_URL")
 
+# Los escaneos se envían a SQS en lotes desde un hilo, fuera de la respuesta
+scans = get_emitter(queue_url)
+
+# Un mismo dispositivo se envía una sola vez por ventana aunque recargue el perfil
+DEVICE_DEDUP_WINDOW_SECONDS = int(os.environ.get("DEVICE_DEDUP_WINDOW_SECONDS", "600"))
+DEVICE_DEDUP_CAPACITY = int(os.environ.get("DEVICE_DEDUP_CAPACITY", "100000"))
+MAX_DEVICE_LENGTH = 128
+
+recent_scans = WindowedBloomFilter(DEVICE_DEDUP_CAPACITY, 0.01, DEVICE_DEDUP_WINDOW_SECONDS)
+
+# En el evento muchos asistentes comparten la IP del WiFi, el límite por IP es amplio
+limits = RequestLimiter("attendee", ip_rate=100, ip_burst=500, short_id_rate=10, short_id_burst=50)
+
 
+def valid_device(device):
+    # Identificadores vacíos, enormes o con caracteres de control no vienen del frontend
+    return 0 < len(device) <= MAX_DEVICE_LENGTH and device.isprintable()
+
+
+@instrument
 def lambda_handler(event, context):
+    try:
+        return get_information(event)
+    finally:
+        # Lambda congela el entorno al responder: el escaneo se envía antes, con un tiempo acotado
+        scans.flush(RETURN_FLUSH_SECONDS)
+
+
+def get_information(event):
     try:
         # Obtener parámetros
         short_id = event["queryStringParameters"]["short_id"]
@@ -25,132 +48,46 @@ def lambda_handler(event, context):
     except KeyError:
         return generate_http_response(400, {"error": "short_id is required"})
 
-    try:
-        # Query DynamoDB
-        response = dynamodb.query(
-            TableName=table_name,
-            IndexName=index_name,
-            KeyConditionExpression="short_id = :sid",
-            ExpressionAttributeValues={":sid": {"S": short_id}},
-        )
-
-        if not response.get("Items"):
-            return generate_http_response(404, {"error": "short_id not found"})
-
-        item = response["Items"][0]
-
-        # Validación de PIN/unlock_key
-        stored_pin = item.get("pin", {}).get("S")
-        stored_unlock_key = item.get("unlock_key", {}).get("S")
+    # Cortamos el tráfico excesivo antes de consultar DynamoDB
+    retry_after = limits.check(event, short_id)
+    if retry_after:
+        return generate_throttled_response(retry_after)
 
-        if pin and pin != stored_pin:
+    try:
+        # La tarjeta ya renderizada se lee con un solo GetItem
+        card = get_card(short_id)
+
+        # Sin tarjeta (perfil sin inicializar o anterior a las tarjetas) o si las
+        # credenciales no coinciden, la regeneramos desde el perfil por si cambió
+        if card is None or not card.credentials_match(pin, unlock_key):
+            item = get_profile(short_id, refresh=True)
+            if item is None:
+                return generate_http_response(404, {"error": "short_id not found"})
+            card = refresh_card(short_id, item, card)
+
+        if pin and pin != card.pin:
             return generate_http_response(403, {"error": "Invalid PIN"})
-        elif unlock_key and unlock_key != stored_unlock_key:
+        elif unlock_key and unlock_key != card.unlock_key:
             return generate_http_response(403, {"error": "Invalid unlock_key"})
 
         # Procesar registro SQS
         try:
-            pk = item["PK"]["S"]
-            sk = item["SK"]["S"]
             device = event["queryStringParameters"].get("device")
 
-            if device:
-                sqs.send_message(
-                    QueueUrl=queue_url,
-                    MessageBody=json.dumps({"PK": pk, "SK": sk, "device": device}),
-                )
+            if device and valid_device(device) and not recent_scans.add(f"{short_id}#{device}"):
+                scans.emit({"PK": card.user_pk, "SK": card.user_sk, "device": device})
         except Exception as e:
-            print(f"Error sending message to SQS: {e}")
-
-        # Extraer información básica
-        first_name = item.get("first_name", {}).get("S", "")
-        last_name = item.get("last_name", {}).get("S", "")
-        role = item.get("role", {}).get("S", "")
-        gender = item.get("gender", {}).get("S", "")
-        company = item.get("company", {}).get("S", "")
-
-        # Procesar información de contacto
-        contact_info = item.get("contact_information", {}).get("M", {})
-
-        # Debug
-        print("Contact info from DynamoDB:", json.dumps(contact_info))
-        print(
-            "Auth method - PIN:", pin is not None, "unlock_key:", unlock_key is not None
-        )
-
-        # Determinar qué información compartir basado en el método de autenticación
-        is_using_unlock_key = unlock_key is not None and unlock_key == stored_unlock_key
-
-        if is_using_unlock_key:
-            # Si usa unlock_key, mostrar toda la información
-            email = contact_info.get("email", {}).get("S")
-            phone = contact_info.get("phone", {}).get("S")
-            print("Using unlock_key - Email:", email, "Phone:", phone)
-        else:
-            # Si usa PIN, aplicar preferencias de privacidad
-            share_email = contact_info.get("share_email", {}).get("BOOL")
-            share_phone = contact_info.get("share_phone", {}).get("BOOL")
-            print(
-                "Privacy settings - Share email:",
-                share_email,
-                "Share phone:",
-                share_phone,
-            )
-
-            # Aplicar preferencias
-            email = contact_info.get("email", {}).get("S") if share_email else None
-            phone = contact_info.get("phone", {}).get("S") if share_phone else None
-            print("After privacy check - Email:", email, "Phone:", phone)
-
-        # Procesar social links
-        social_links = [
-            {
-                "name": link.get("M", {}).get("name", {}).get("S"),
-                "url": link.get("M", {}).get("url", {}).get("S"),
-            }
-            for link in item.get("social_links", {}).get("L", [])
-            if link.get("M", {}).get("url", {}).get("S", "").strip()
-        ]
-
-        # Construir vCard
-        vcard_parts = [
-            "BEGIN:VCARD",
-            "VERSION:3.0",
-            f"N:{first_name} {last_name}",
-            f"ORG:{company}",
-            f"ROLE:{role}",
-        ]
-
-        if email:
-            vcard_parts.append(f"EMAIL:{email}")
-        if phone:
-            vcard_parts.append(f"TEL:{phone}")
-
-        for link in social_links:
-            if link["url"]:
-                vcard_parts.append(f'URL;TYPE={link["name"]}:{link["url"]}')
-
-        vcard_parts.append("END:VCARD")
-        vcard = "\n".join(vcard_parts)
-
-        # Construir respuesta
-        response_data = {
-            "first_name": first_name,
-            "last_name": last_name,
-            "role": role,
-            "company": company,
-            "gender": gender,
-            "social_links": social_links,
-            "vcard": vcard,
-        }
-
-        # Solo incluir información de contacto si está disponible
-        if email:
-            response_data["email"] = email
-        if phone:
-            response_data["phone"] = phone
-
-        return generate_http_response(200, response_data)
+            print(f"Error queueing scan message: {e}")
+
+        # Con unlock_key válido se muestra toda la información, con PIN se respetan las preferencias
+        variant = "full" if unlock_key else "public"
+        body, etag = card.variants[variant]
+        headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+
+        if etag_matches(event, etag):
+            return generate_raw_response(304, "", headers)
+
+        return generate_raw_response(200, body, headers)
 
     except ClientError as e:
         print(f"DynamoDB error: {e}")
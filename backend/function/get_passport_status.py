@@ -1,45 +1,93 @@
-import json
 import os
 
-import boto3
 from botocore.exceptions import ClientError
+from clients import LazyClient
+from instrumentation import instrument
+from models import Passport, Profile, projection
+from profile_cache import get_profile
 from utils import generate_http_response
 
-# Inicializar cliente de DynamoDB
-dynamodb = boto3.client("dynamodb")
+# Inicializamos el cliente de DynamoDB
+dynamodb = LazyClient("dynamodb")
 
 table_name = os.environ.get("DYNAMODB_TABLE_NAME")
-index_name = os.environ.get("INDEX_NAME")
+
+# Solo leemos del GSI lo que usa la respuesta (PK para llegar al pasaporte)
+PROFILE_ATTRIBUTES = ("PK", "first_name", "last_name", "role", "company")
+# Sponsors distintos necesarios para completar el pasaporte, igual que en aggregate_stamps
+PASSPORT_SPONSORS = int(os.environ.get("PASSPORT_SPONSORS", "4"))
+PASSPORT_SK = "PASSPORT"
+STAMP_PREFIX = "SPONSOR#"
+
+
+def query_stamp_keys(user_id):
+    """Return the SK of every stamp row of a user with one key-range query."""
+    kwargs = {
+        "TableName": table_name,
+        "KeyConditionExpression": "PK = :pk AND begins_with(SK, :prefix)",
+        "ExpressionAttributeValues": {
+            ":pk": {"S": f"USER#{user_id}"},
+            ":prefix": {"S": STAMP_PREFIX},
+        },
+        # Solo la llave: el sponsor viene en el SK, no necesitamos las notas
+        "ProjectionExpression": "SK",
+    }
+    sort_keys = []
+    while True:
+        response = dynamodb.query(**kwargs)
+        sort_keys.extend(item["SK"]["S"] for item in response.get("Items", []))
+        if "LastEvaluatedKey" not in response:
+            return sort_keys
+        kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+
+def get_passport(user_id):
+    """Read the PASSPORT rollup of a user, or rebuild it from the stamps when it does not exist.
+
+    aggregate_stamps keeps the rollup from the table stream, so the usual
+    cost is a single GetItem. The SPONSOR# key-range query only runs when
+    the user has no rollup with sponsors yet: attendees without stamps,
+    stamps from before the rollup existed, or a first stamp the stream has
+    not processed. Once the rollup exists it is returned as is, and a stamp
+    still in the stream shows up when aggregate_stamps processes it
+    (usually within a second, longer while a batch is being retried).
+    """
+    response = dynamodb.get_item(
+        TableName=table_name,
+        Key={"PK": {"S": f"USER#{user_id}"}, "SK": {"S": PASSPORT_SK}},
+        **projection(Passport.ATTRIBUTES),
+    )
+    # aggregate_stamps también crea el ítem al contar el perfil o sus escaneos;
+    # sin sponsors la proyección viene vacía y revisamos los sellos
+    item = response.get("Item")
+    if item:
+        return Passport.from_item(user_id, item)
+    return Passport.from_stamp_keys(user_id, query_stamp_keys(user_id))
 
 
 # Función para consultar los sellos que un asistente ya tiene
+@instrument
 def lambda_handler(event, context):
     try:
         # Obtener el short_id del asistente desde los parámetros
         short_id = event["queryStringParameters"]["short_id"]
 
         # Buscar al usuario por short_id
-        response_user = dynamodb.query(
-            TableName=table_name,
-            IndexName=index_name,
-            KeyConditionExpression="short_id = :sid",
-            ExpressionAttributeValues={":sid": {"S": short_id}},
-        )
-        print(f"Querying DynamoDB table {table_name} for short_id {short_id} in GSI {index_name}")
-
-        print(f"Response: {response_user}")
+        user = get_profile(short_id, attributes=PROFILE_ATTRIBUTES)
 
         # Verificar si el usuario existe
-        if not response_user["Items"]:
+        if user is None:
             return generate_http_response(404, {"error": "User not found"})
 
-        user_id = response_user["Items"][0]["user_id"]["S"]
+        profile = Profile.from_item(user)
+        passport = get_passport(profile.user_id)
 
         return generate_http_response(200, {
-            "first_name": response_user["Items"][0]["first_name"]["S"],
-            "last_name": response_user["Items"][0]["last_name"]["S"],
-            "role": response_user["Items"][0].get("role", {}).get("S"),
-            "company": response_user["Items"][0].get("company", {}).get("S"),
+            "first_name": profile.first_name,
+            "last_name": profile.last_name,
+            "role": profile.role or None,
+            "company": profile.company or None,
+            "passport": passport.progress(PASSPORT_SPONSORS),
         })
 
     except ClientError as e:
@@ -0,0 +1,210 @@
+import functools
+import json
+import os
+import threading
+import time
+
+# Métricas por invocación en formato EMF; se pueden apagar sin redeploy del código
+INSTRUMENTATION_ENABLED = os.environ.get("INSTRUMENTATION_ENABLED", "true").lower() == "true"
+NAMESPACE = os.environ.get("POWERTOOLS_METRICS_NAMESPACE", "NetworkingPassport")
+SERVICE = os.environ.get("POWERTOOLS_SERVICE_NAME", "networking-passport")
+
+# Operaciones de DynamoDB que aceptan ReturnConsumedCapacity
+CAPACITY_OPERATIONS = {
+    "GetItem", "PutItem", "UpdateItem", "DeleteItem", "Query", "Scan",
+    "BatchGetItem", "BatchWriteItem", "TransactGetItems", "TransactWriteItems",
+}
+
+# Se apaga después de la primera invocación del entorno
+_cold_start = True
+# Invocación en curso; los hilos de trabajo de un handler (ThreadPoolExecutor)
+# registran sus llamadas en ella, el hilo de telemetría no
+_current = None
+_lock = threading.Lock()
+
+
+class Invocation:
+    """AWS calls, time and consumed capacity of one handler invocation."""
+
+    def __init__(self):
+        # "servicio.Operacion" -> [llamadas, milisegundos, RCU, WCU]
+        self.calls = {}
+        # "servicio.Operacion" -> llamadas que terminaron en excepción (conexión, timeout)
+        self.errors = {}
+
+    def record(self, name, elapsed_ms, read_units, write_units):
+        with _lock:
+            entry = self.calls.setdefault(name, [0, 0.0, 0.0, 0.0])
+            entry[0] += 1
+            entry[1] += elapsed_ms
+            entry[2] += read_units
+            entry[3] += write_units
+
+    def record_error(self, name, elapsed_ms):
+        self.record(name, elapsed_ms, 0.0, 0.0)
+        with _lock:
+            self.errors[name] = self.errors.get(name, 0) + 1
+
+    def totals(self, service=None):
+        entries = [entry for name, entry in self.calls.items() if service is None or name.startswith(service + ".")]
+        return [sum(values) for values in zip(*entries)] if entries else [0, 0.0, 0.0, 0.0]
+
+
+# Con TOTAL las operaciones simples solo traen CapacityUnits; se asigna según el tipo
+_READ_OPERATIONS = {"GetItem", "Query", "Scan", "BatchGetItem", "TransactGetItems"}
+
+
+def _capacity_units(operation, consumed):
+    """Split a ConsumedCapacity value (dict or list of dicts) into (RCU, WCU)."""
+    read_units = write_units = 0.0
+    for capacity in consumed if isinstance(consumed, list) else [consumed]:
+        if "ReadCapacityUnits" in capacity or "WriteCapacityUnits" in capacity:
+            read_units += capacity.get("ReadCapacityUnits", 0.0)
+            write_units += capacity.get("WriteCapacityUnits", 0.0)
+        elif operation in _READ_OPERATIONS:
+            read_units += capacity.get("CapacityUnits", 0.0)
+        else:
+            write_units += capacity.get("CapacityUnits", 0.0)
+    return read_units, write_units
+
+
+def _provide_params(params, model, **kwargs):
+    if model.name in CAPACITY_OPERATIONS:
+        params.setdefault("ReturnConsumedCapacity", "TOTAL")
+
+
+def _before_call(model, context, **kwargs):
+    # after-call-error no recibe el modelo: guardamos aquí el nombre de la operación
+    context["instrumentation_operation"] = f"{model.service_model.service_name}.{model.name}"
+    context["instrumentation_started"] = time.perf_counter()
+
+
+def _elapsed_ms(context):
+    """Milliseconds since before-call, or None if the call must not be recorded."""
+    started = (context or {}).get("instrumentation_started")
+    if _current is None or started is None or threading.current_thread().name == "telemetry":
+        return None
+    return (time.perf_counter() - started) * 1000
+
+
+def _after_call(model, context, parsed=None, **kwargs):
+    invocation = _current
+    elapsed_ms = _elapsed_ms(context)
+    if invocation is None or elapsed_ms is None:
+        return
+
+    read_units, write_units = _capacity_units(model.name, (parsed or {}).get("ConsumedCapacity") or [])
+
+    invocation.record(context["instrumentation_operation"], elapsed_ms, read_units, write_units)
+
+
+def _after_call_error(exception=None, context=None, **kwargs):
+    # botocore solo pasa exception y context; la excepción sigue su curso
+    invocation = _current
+    elapsed_ms = _elapsed_ms(context)
+    if invocation is None or elapsed_ms is None:
+        return
+    invocation.record_error(context["instrumentation_operation"], elapsed_ms)
+
+
+def register_client(client):
+    """Hook a boto3 client so its calls are counted in the running invocation."""
+    if not INSTRUMENTATION_ENABLED:
+        return
+    events = client.meta.events
+    service = client.meta.service_model.service_name
+    if service == "dynamodb":
+        events.register(f"provide-client-params.{service}.*", _provide_params)
+    events.register(f"before-call.{service}.*", _before_call)
+    events.register(f"after-call.{service}.*", _after_call)
+    events.register(f"after-call-error.{service}.*", _after_call_error)
+
+
+def _response_bytes(response):
+    if isinstance(response, dict) and isinstance(response.get("body"), str):
+        return len(response["body"].encode())
+    return None
+
+
+def metrics_record(function_name, invocation, cold_start, duration_ms, response, handler=None):
+    """Build the Embedded Metric Format log line of an invocation."""
+    calls, aws_ms, read_units, write_units = invocation.totals()
+    dynamodb_calls = invocation.totals("dynamodb")[0]
+    sqs_calls = invocation.totals("sqs")[0]
+    metrics = {
+        "Duration": (duration_ms, "Milliseconds"),
+        "ColdStart": (1 if cold_start else 0, "Count"),
+        "AwsCalls": (calls, "Count"),
+        "DynamoDBCalls": (dynamodb_calls, "Count"),
+        "SQSCalls": (sqs_calls, "Count"),
+        "AwsTime": (aws_ms, "Milliseconds"),
+        "AwsErrors": (sum(invocation.errors.values()), "Count"),
+        "ConsumedRCU": (read_units, "Count"),
+        "ConsumedWCU": (write_units, "Count"),
+    }
+    response_bytes = _response_bytes(response)
+    if response_bytes is not None:
+        metrics["ResponseBytes"] = (response_bytes, "Bytes")
+
+    record = {
+        "_aws": {
+            "Timestamp": int(time.time() * 1000),
+            "CloudWatchMetrics": [
+                {
+                    "Namespace": NAMESPACE,
+                    "Dimensions": [["service", "function"]],
+                    "Metrics": [{"Name": name, "Unit": unit} for name, (_, unit) in metrics.items()],
+                }
+            ],
+        },
+        "service": SERVICE,
+        "function": function_name,
+        **{name: value for name, (value, _) in metrics.items()},
+        # Detalle por operación, para consultarlo en Logs Insights sin crear métricas
+        "calls": {
+            name: {"count": count, "ms": round(ms, 3), "rcu": rcu, "wcu": wcu, "errors": invocation.errors.get(name, 0)}
+            for name, (count, ms, rcu, wcu) in invocation.calls.items()
+        },
+    }
+    # En el despliegue consolidado varios handlers comparten la función
+    if handler is not None:
+        record["handler"] = handler
+    if isinstance(response, dict) and "statusCode" in response:
+        record["status_code"] = response["statusCode"]
+    return record
+
+
+def instrument(handler):
+    """Decorate a lambda_handler to emit one EMF record per invocation.
+
+    The record carries the duration, cold start, response size and, per
+    DynamoDB/SQS operation, the number of calls, the time spent in them and
+    the consumed RCU/WCU (ReturnConsumedCapacity is requested automatically
+    on the shared clients). Failing to emit metrics never fails the request.
+    """
+    if not INSTRUMENTATION_ENABLED:
+        return handler
+    default_name = handler.__module__
+
+    @functools.wraps(handler)
+    def wrapper(event, context):
+        global _cold_start, _current
+        cold_start, _cold_start = _cold_start, False
+        invocation = _current = Invocation()
+        started = time.perf_counter()
+        response = None
+        try:
+            response = handler(event, context)
+            return response
+        finally:
+            duration_ms = (time.perf_counter() - started) * 1000
+            _current = None
+            try:
+                function_name = getattr(context, "function_name", None) or default_name
+                print(json.dumps(metrics_record(
+                    function_name, invocation, cold_start, duration_ms, response, handler=default_name,
+                )))
+            except Exception as e:
+                print(f"Error emitting metrics: {e}")
+
+    return wrapper
@@ -1,13 +1,347 @@
-from typing import Optional
+"""Typed records for the items stored in the table.
 
-from pydantic import BaseModel
+Handlers read items with the low-level client, so every attribute arrives
+as DynamoDB JSON ({"S": ...}, {"M": ...}). `deserialize_item` is the one
+place that turns them into Python values, and the records below expose
+them as attributes instead of nested `.get(...)` chains.
+"""
+from dataclasses import dataclass, field
+from decimal import Decimal
+from typing import ClassVar, Optional
 
 
-class Profile(BaseModel):
-    name: str
-    position: Optional[str] = None
-    company: Optional[str] = None
+def _number(value):
+    try:
+        return int(value)
+    except ValueError:
+        return Decimal(value)
+
+
+def _map(value):
+    return {key: deserialize(attribute) for key, attribute in value.items()}
+
+
+def _list(value):
+    return [deserialize(attribute) for attribute in value]
+
+
+_DESERIALIZERS = {
+    "N": _number,
+    "BOOL": bool,
+    "NULL": lambda value: None,
+    "M": _map,
+    "L": _list,
+    "SS": set,
+    "NS": lambda value: {_number(number) for number in value},
+    "B": bytes,
+    "BS": set,
+}
+
+
+def deserialize(attribute):
+    """Convert one DynamoDB JSON attribute to a Python value.
+
+    Numbers become int when they are integral (Decimal otherwise), unlike
+    boto3's TypeDeserializer which always returns Decimal.
+    """
+    for tag, value in attribute.items():
+        # Casi todos los atributos son strings, los resolvemos sin pasar por el dict
+        if tag == "S":
+            return value
+        return _DESERIALIZERS[tag](value)
+
+
+def deserialize_item(item, names=None):
+    """Deserialize an item, optionally keeping only some top-level attributes."""
+    if names is None:
+        return {key: deserialize(attribute) for key, attribute in item.items()}
+    return {key: deserialize(item[key]) for key in names if key in item}
+
+
+def serialize(value):
+    """Convert a Python value to DynamoDB JSON."""
+    if value is None:
+        return {"NULL": True}
+    if isinstance(value, str):
+        return {"S": value}
+    if isinstance(value, bool):
+        return {"BOOL": value}
+    if isinstance(value, (int, Decimal)):
+        return {"N": str(value)}
+    if isinstance(value, dict):
+        return {"M": {key: serialize(item) for key, item in value.items()}}
+    if isinstance(value, (list, tuple)):
+        return {"L": [serialize(item) for item in value]}
+    if isinstance(value, (set, frozenset)):
+        if all(isinstance(item, str) for item in value):
+            return {"SS": sorted(value)}
+        return {"NS": sorted(str(item) for item in value)}
+    raise TypeError(f"Cannot serialize {type(value).__name__} to DynamoDB")
+
+
+def projection(names):
+    """Build ProjectionExpression kwargs for a list of attribute paths.
+
+    Every name goes through ExpressionAttributeNames, so reserved words
+    (role, key, name, ...) and nested paths like "contact_information.email"
+    work without special cases.
+    """
+    aliases = {}
+    paths = []
+    for name in names:
+        parts = []
+        for part in name.split("."):
+            alias = aliases.setdefault(part, f"#p{len(aliases)}")
+            parts.append(alias)
+        paths.append(".".join(parts))
+    return {
+        "ProjectionExpression": ", ".join(paths),
+        "ExpressionAttributeNames": {alias: part for part, alias in aliases.items()},
+    }
+
+
+_EMPTY = {}
+
+_PROFILE_STRINGS = (
+    "user_id", "short_id", "first_name", "last_name", "company", "role", "gender",
+    "pin", "unlock_key", "profile", "age_range", "area_of_interest",
+)
+
+
+def _user_id(data):
+    if data.get("user_id"):
+        return data["user_id"]
+    pk = data.get("PK", "")
+    return pk.split("#", 1)[1] if "#" in pk else ""
+
+
+@dataclass(slots=True)
+class ContactInformation:
     email: Optional[str] = None
     phone: Optional[str] = None
-    website: Optional[str] = None
-    linkedin: Optional[str] = None
+    share_email: bool = False
+    share_phone: bool = False
+
+    @classmethod
+    def from_dict(cls, data):
+        data = data or {}
+        return cls(
+            data.get("email"),
+            data.get("phone"),
+            bool(data.get("share_email")),
+            bool(data.get("share_phone")),
+        )
+
+
+@dataclass(slots=True)
+class SocialLink:
+    name: Optional[str]
+    url: Optional[str]
+
+
+@dataclass(slots=True)
+class Profile:
+    """Attendee profile (PK=USER#<user_id>, SK=PROFILE)."""
+
+    user_id: str
+    short_id: Optional[str] = None
+    first_name: str = ""
+    last_name: str = ""
+    company: str = ""
+    role: str = ""
+    gender: str = ""
+    pin: Optional[str] = None
+    unlock_key: Optional[str] = None
+    initialized: bool = False
+    contact_information: ContactInformation = field(default_factory=ContactInformation)
+    social_links: list = field(default_factory=list)
+    profile: Optional[str] = None
+    age_range: Optional[str] = None
+    area_of_interest: Optional[str] = None
+    scanned_count: int = 0
+    completed_passport: bool = False
+
+    ATTRIBUTES: ClassVar[tuple] = (
+        "PK", "user_id", "short_id", "first_name", "last_name", "company", "role", "gender",
+        "pin", "unlock_key", "initialized", "contact_information", "social_links",
+        "profile", "age_range", "area_of_interest", "scanned_count", "completed_passport",
+    )
+
+    @classmethod
+    def from_item(cls, item):
+        """Build a Profile from a (possibly projected) DynamoDB JSON item.
+
+        The attributes are read by their known type instead of going through
+        `deserialize`, which halves the cost for a full profile (see
+        benchmarks/models_benchmark.py).
+        """
+        text = {name: item[name].get("S") for name in _PROFILE_STRINGS if name in item}
+        contact = item.get("contact_information", _EMPTY).get("M", _EMPTY)
+        return cls(
+            user_id=text.get("user_id") or item.get("PK", _EMPTY).get("S", "").partition("#")[2],
+            short_id=text.get("short_id"),
+            first_name=text.get("first_name") or "",
+            last_name=text.get("last_name") or "",
+            company=text.get("company") or "",
+            role=text.get("role") or "",
+            gender=text.get("gender") or "",
+            pin=text.get("pin"),
+            unlock_key=text.get("unlock_key"),
+            initialized=item.get("initialized", _EMPTY).get("BOOL", False),
+            contact_information=ContactInformation(
+                contact.get("email", _EMPTY).get("S"),
+                contact.get("phone", _EMPTY).get("S"),
+                contact.get("share_email", _EMPTY).get("BOOL", False),
+                contact.get("share_phone", _EMPTY).get("BOOL", False),
+            ),
+            social_links=[
+                SocialLink(link["M"].get("name", _EMPTY).get("S"), link["M"].get("url", _EMPTY).get("S"))
+                for link in item.get("social_links", _EMPTY).get("L", ())
+                if "M" in link
+            ],
+            profile=text.get("profile"),
+            age_range=text.get("age_range"),
+            area_of_interest=text.get("area_of_interest"),
+            scanned_count=int(item.get("scanned_count", _EMPTY).get("N", 0)),
+            completed_passport=item.get("completed_passport", _EMPTY).get("BOOL", False),
+        )
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            user_id=_user_id(data),
+            short_id=data.get("short_id"),
+            first_name=data.get("first_name") or "",
+            last_name=data.get("last_name") or "",
+            company=data.get("company") or "",
+            role=data.get("role") or "",
+            gender=data.get("gender") or "",
+            pin=data.get("pin"),
+            unlock_key=data.get("unlock_key"),
+            initialized=bool(data.get("initialized")),
+            contact_information=ContactInformation.from_dict(data.get("contact_information")),
+            social_links=[
+                SocialLink(link.get("name"), link.get("url"))
+                for link in data.get("social_links") or []
+                if isinstance(link, dict)
+            ],
+            profile=data.get("profile"),
+            age_range=data.get("age_range"),
+            area_of_interest=data.get("area_of_interest"),
+            scanned_count=int(data.get("scanned_count") or 0),
+            completed_passport=bool(data.get("completed_passport")),
+        )
+
+    @property
+    def pk(self):
+        return f"USER#{self.user_id}"
+
+
+@dataclass(slots=True)
+class Sponsor:
+    """Sponsor profile (PK=SPONSOR#<sponsor_id>, SK=PROFILE)."""
+
+    sponsor_id: str
+    sponsor_name: str = ""
+    key: Optional[str] = None
+    required: bool = False
+
+    ATTRIBUTES: ClassVar[tuple] = ("sponsor_id", "sponsor_name", "key", "required")
+
+    @classmethod
+    def from_item(cls, item):
+        data = deserialize_item(item, cls.ATTRIBUTES + ("PK",))
+        sponsor_id = data.get("sponsor_id") or data.get("PK", "").split("#", 1)[-1]
+        return cls(sponsor_id, data.get("sponsor_name") or "", data.get("key"), bool(data.get("required")))
+
+
+@dataclass(slots=True)
+class Stamp:
+    """Stamp history row (PK=USER#<user_id>, SK=SPONSOR#<sponsor_id>#<created_at>)."""
+
+    user_id: str
+    sponsor_id: str
+    created_at: str
+    notes: str = ""
+
+    ATTRIBUTES: ClassVar[tuple] = ("PK", "SK", "notes")
+
+    @classmethod
+    def from_item(cls, item):
+        data = deserialize_item(item, cls.ATTRIBUTES)
+        _, sponsor_id, created_at = data["SK"].split("#", 2)
+        return cls(_user_id(data), sponsor_id, created_at, data.get("notes") or "")
+
+
+@dataclass(slots=True)
+class Passport:
+    """Per-attendee stamp rollup (PK=USER#<user_id>, SK=PASSPORT), kept by aggregate_stamps."""
+
+    user_id: str
+    sponsors: set = field(default_factory=set)
+    stamp_count: int = 0
+
+    ATTRIBUTES: ClassVar[tuple] = ("sponsors", "stamp_count")
+
+    @classmethod
+    def from_item(cls, user_id, item):
+        return cls(
+            user_id,
+            set(item.get("sponsors", _EMPTY).get("SS", ())),
+            int(item.get("stamp_count", _EMPTY).get("N", 0)),
+        )
+
+    @classmethod
+    def from_stamp_keys(cls, user_id, sort_keys):
+        """Build the rollup from the SK of the user's stamp rows (SPONSOR#<sponsor_id>#<created_at>)."""
+        sponsors = set()
+        stamp_count = 0
+        for sort_key in sort_keys:
+            sponsors.add(sort_key.split("#", 2)[1])
+            stamp_count += 1
+        return cls(user_id, sponsors, stamp_count)
+
+    def progress(self, required):
+        """Compact progress for the API: which sponsors, how many stamps, N of M."""
+        return {
+            "sponsors": sorted(self.sponsors),
+            "stamps": self.stamp_count,
+            "collected": len(self.sponsors),
+            "required": required,
+            "completed": len(self.sponsors) >= required,
+        }
+
+
+@dataclass(slots=True)
+class Lead:
+    """One attendee a sponsor stamped (PK=SPONSOR#<sponsor_id>, SK=LEAD#<user_id>), kept by aggregate_stamps.
+
+    The item keeps the time of every stamp in the stamped_at set, so the
+    stream and backfill_leads can both add stamps any number of times; the
+    count and the first stamp come from the set. first_stamp_at and
+    stamp_count are only read from items written before the set existed.
+    """
+
+    sponsor_id: str
+    user_id: str
+    first_stamp_at: Optional[str] = None
+    stamp_count: int = 0
+    notes: str = ""
+
+    ATTRIBUTES: ClassVar[tuple] = ("PK", "SK", "stamped_at", "first_stamp_at", "stamp_count", "notes")
+
+    @classmethod
+    def from_item(cls, item):
+        stamped_at = item.get("stamped_at", _EMPTY).get("SS")
+        if stamped_at:
+            first_stamp_at, stamp_count = min(stamped_at), len(stamped_at)
+        else:
+            first_stamp_at = item.get("first_stamp_at", _EMPTY).get("S")
+            stamp_count = int(item.get("stamp_count", _EMPTY).get("N", 0))
+        return cls(
+            item["PK"]["S"].partition("#")[2],
+            item["SK"]["S"].partition("#")[2],
+            first_stamp_at,
+            stamp_count,
+            item.get("notes", _EMPTY).get("S") or "",
+        )
@@ -0,0 +1,160 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from clients import LazyClient
+from models import projection
+
+# Inicializamos el cliente de DynamoDB
+dynamodb = LazyClient("dynamodb")
+
+table_name = os.environ.get("DYNAMODB_TABLE_NAME")
+index_name = os.environ.get("INDEX_NAME")
+# GSI KEYS_ONLY (short_id -> PK) para los handlers que solo necesitan el user_id
+keys_index_name = os.environ.get("KEYS_INDEX_NAME") or index_name
+
+# El cache vive a nivel de módulo, así que sobrevive entre invocaciones "warm"
+CACHE_TTL_SECONDS = float(os.environ.get("PROFILE_CACHE_TTL_SECONDS", "30"))
+CACHE_MAX_ITEMS = int(os.environ.get("PROFILE_CACHE_MAX_ITEMS", "1024"))
+
+# Cada Lambda tiene su propio cache y invalidate_profile solo limpia el del proceso
+# actual, así que nunca guardamos los atributos que los escritores cambian y que
+# protegen el perfil; quien los necesite lee el GSI (o la tarjeta pública)
+SECRET_ATTRIBUTES = ("pin", "unlock_key", "contact_information.share_email", "contact_information.share_phone")
+
+# (short_id, atributos) -> (expira_en, item)
+_cache = OrderedDict()
+# short_id -> user_id, la relación no cambia una vez asignado el short_id
+_user_ids = OrderedDict()
+# Algunos handlers resuelven short_ids en paralelo con hilos
+_lock = threading.Lock()
+
+
+def _query_short_id(short_id, attributes=None, index=None):
+    # Realizamos el query usando el índice global secundario (GSI), trayendo
+    # solo los atributos que pide el handler cuando los indica
+    response = dynamodb.query(
+        TableName=table_name,
+        IndexName=index or index_name,
+        KeyConditionExpression="short_id = :sid",
+        ExpressionAttributeValues={":sid": {"S": short_id}},
+        **(projection(attributes) if attributes else {}),
+    )
+    items = response.get("Items", [])
+    # Los short_id nuevos se asignan sin colisiones (short_ids.py), pero los
+    # generados antes pueden repetirse; tomamos el primero y lo reportamos
+    if len(items) > 1:
+        print(f"short_id {short_id} is shared by {len(items)} profiles")
+    return items[0] if items else None
+
+
+def _is_cacheable(item):
+    # Los perfiles en proceso de activación cambian seguido (unlock_key, initialized),
+    # solo guardamos los perfiles ya inicializados que son los que se escanean en el evento
+    return item.get("initialized", {}).get("BOOL", False) and "unlock_key" not in item
+
+
+def _reads_secrets(attributes):
+    # Sin proyección se lee el ítem completo; pedir un mapa completo
+    # (contact_information) también trae las banderas share_*
+    if not attributes:
+        return True
+    return any(
+        secret == path or secret.startswith(path + ".")
+        for path in attributes
+        for secret in SECRET_ATTRIBUTES
+    )
+
+
+def _cached(key, now):
+    entry = _cache.get(key)
+    if entry is None:
+        return None
+    expires_at, item = entry
+    if expires_at <= now:
+        del _cache[key]
+        return None
+    _cache.move_to_end(key)
+    return item
+
+
+def get_profile(short_id, refresh=False, attributes=None):
+    """Return the raw DynamoDB item for a short_id, or None if it does not exist.
+
+    Args:
+        short_id (str): Short ID printed on the attendee badge
+        refresh (bool): Skip the cache and read the GSI (used by writers)
+        attributes (tuple): Attribute paths the caller needs. Only those are
+            read from the GSI (plus initialized and unlock_key, to know whether
+            the item can be cached). Full items and projections that include
+            SECRET_ATTRIBUTES are never cached: another function can change
+            them and its invalidate_profile does not reach this process
+
+    Returns:
+        dict: Item in DynamoDB JSON format, or None
+    """
+    if _reads_secrets(attributes):
+        return _query_short_id(short_id, attributes)
+
+    now = time.monotonic()
+    attributes = tuple(dict.fromkeys((*attributes, "initialized", "unlock_key")))
+    key = (short_id, attributes)
+
+    if not refresh:
+        with _lock:
+            item = _cached(key, now)
+            if item is not None:
+                return item
+
+    item = _query_short_id(short_id, attributes)
+
+    # No guardamos los short_id inexistentes para no llenar el cache con basura
+    with _lock:
+        if item is None or not _is_cacheable(item):
+            _cache.pop(key, None)
+            return item
+
+        _cache[key] = (now + CACHE_TTL_SECONDS, item)
+        _cache.move_to_end(key)
+        while len(_cache) > CACHE_MAX_ITEMS:
+            _cache.popitem(last=False)
+
+    return item
+
+
+def get_user_id(short_id):
+    """Resolve a short_id to its user_id through the KEYS_ONLY index.
+
+    Returns:
+        str: user_id, or None if the short_id does not exist
+    """
+    with _lock:
+        user_id = _user_ids.get(short_id)
+        if user_id is not None:
+            _user_ids.move_to_end(short_id)
+            return user_id
+
+    item = _query_short_id(short_id, ("PK",), keys_index_name)
+    if item is None:
+        return None
+
+    user_id = item["PK"]["S"].partition("#")[2]
+    with _lock:
+        _user_ids[short_id] = user_id
+        while len(_user_ids) > CACHE_MAX_ITEMS:
+            _user_ids.popitem(last=False)
+    return user_id
+
+
+def invalidate_profile(short_id):
+    """Drop a short_id from the cache after its profile was written."""
+    with _lock:
+        for key in [key for key in _cache if key[0] == short_id]:
+            del _cache[key]
+
+
+def clear_cache():
+    with _lock:
+        _cache.clear()
+        _user_ids.clear()
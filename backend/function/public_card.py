@@ -0,0 +1,204 @@
+import hashlib
+import json
+import os
+from dataclasses import dataclass, field
+from typing import Optional
+
+from botocore.exceptions import ClientError
+from clients import LazyClient
+from models import Profile, deserialize_item
+
+# Inicializamos el cliente de DynamoDB
+dynamodb = LazyClient("dynamodb")
+
+table_name = os.environ.get("DYNAMODB_TABLE_NAME")
+
+# La tarjeta vive en su propio ítem para leerla con un GetItem por short_id
+CARD_PREFIX = "CARD#"
+CARD_SK = "CARD"
+# Variantes: "public" para PIN o sin credenciales (respeta share_email/share_phone),
+# "full" para quien tiene el unlock_key
+VARIANTS = ("public", "full")
+
+
+def card_key(short_id):
+    return {"PK": {"S": f"{CARD_PREFIX}{short_id}"}, "SK": {"S": CARD_SK}}
+
+
+@dataclass(slots=True)
+class PublicCard:
+    user_pk: str
+    user_sk: str
+    pin: Optional[str] = None
+    unlock_key: Optional[str] = None
+    # variante -> (body ya serializado, ETag)
+    variants: dict = field(default_factory=dict)
+
+    @classmethod
+    def from_item(cls, item):
+        data = deserialize_item(item)
+        return cls(
+            data["user_pk"],
+            data["user_sk"],
+            data.get("pin"),
+            data.get("unlock_key"),
+            {variant: (data[f"{variant}_body"], data[f"{variant}_etag"]) for variant in VARIANTS},
+        )
+
+    def credentials_match(self, pin, unlock_key):
+        if pin and pin != self.pin:
+            return False
+        if unlock_key and unlock_key != self.unlock_key:
+            return False
+        return True
+
+
+def build_card_body(profile, full):
+    """Build the get_information response body from a Profile."""
+    contact_info = profile.contact_information
+    email = contact_info.email
+    phone = contact_info.phone
+    if not full:
+        # Con PIN se aplican las preferencias de privacidad
+        if not contact_info.share_email:
+            email = None
+        if not contact_info.share_phone:
+            phone = None
+
+    social_links = [
+        {"name": link.name, "url": link.url}
+        for link in profile.social_links
+        if (link.url or "").strip()
+    ]
+
+    vcard_parts = [
+        "BEGIN:VCARD",
+        "VERSION:3.0",
+        f"N:{profile.first_name} {profile.last_name}",
+        f"ORG:{profile.company}",
+        f"ROLE:{profile.role}",
+    ]
+    if email:
+        vcard_parts.append(f"EMAIL:{email}")
+    if phone:
+        vcard_parts.append(f"TEL:{phone}")
+    for link in social_links:
+        if link["url"]:
+            vcard_parts.append(f'URL;TYPE={link["name"]}:{link["url"]}')
+    vcard_parts.append("END:VCARD")
+
+    body = {
+        "first_name": profile.first_name,
+        "last_name": profile.last_name,
+        "role": profile.role,
+        "company": profile.company,
+        "gender": profile.gender,
+        "social_links": social_links,
+        "vcard": "\n".join(vcard_parts),
+    }
+    if email:
+        body["email"] = email
+    if phone:
+        body["phone"] = phone
+    return body
+
+
+def etag_for(body):
+    return '"' + hashlib.sha256(body.encode()).hexdigest()[:32] + '"'
+
+
+def render_card(profile):
+    """Render the card item (both variants, serialized, with ETags) of a Profile."""
+    card = {
+        **card_key(profile.short_id),
+        "user_pk": {"S": profile.pk},
+        "user_sk": {"S": "PROFILE"},
+    }
+    if profile.pin:
+        card["pin"] = {"S": profile.pin}
+    if profile.unlock_key:
+        card["unlock_key"] = {"S": profile.unlock_key}
+    for variant in VARIANTS:
+        body = json.dumps(build_card_body(profile, full=variant == "full"))
+        card[f"{variant}_body"] = {"S": body}
+        card[f"{variant}_etag"] = {"S": etag_for(body)}
+    return card
+
+
+def card_put_request(profile):
+    """TransactWriteItems entry that stores the card of a Profile."""
+    return {"Put": {"TableName": table_name, "Item": render_card(profile)}}
+
+
+def card_unlock_key_request(short_id, user_pk, unlock_key):
+    """TransactWriteItems entry that copies a new unlock_key to the card of a profile.
+
+    The card item is created with only the owner when it does not exist yet,
+    and the write fails when another profile owns the short_id.
+    """
+    return {
+        "Update": {
+            "TableName": table_name,
+            "Key": card_key(short_id),
+            "UpdateExpression": "SET unlock_key = :unlock_key, user_pk = :user_pk, user_sk = :user_sk",
+            "ConditionExpression": "attribute_not_exists(PK) OR user_pk = :user_pk",
+            "ExpressionAttributeValues": {
+                ":unlock_key": {"S": unlock_key},
+                ":user_pk": {"S": user_pk},
+                ":user_sk": {"S": "PROFILE"},
+            },
+        }
+    }
+
+
+def get_card(short_id, consistent=False):
+    response = dynamodb.get_item(
+        TableName=table_name, Key=card_key(short_id), ConsistentRead=consistent
+    )
+    item = response.get("Item")
+    # Un ítem que solo reserva el short_id todavía no tiene la tarjeta renderizada
+    if not item or "public_body" not in item:
+        return None
+    return PublicCard.from_item(item)
+
+
+def refresh_card(short_id, item, card=None):
+    """Render the card of a profile and store it if the profile is initialized.
+
+    The card is only written when it changed, so failed PIN checks do not
+    turn into writes. Profiles that are not initialized yet still change
+    through the Eventbrite import, so their card is rendered but not stored.
+    """
+    profile = Profile.from_item(item)
+    new_item = render_card(profile)
+    new_card = PublicCard.from_item(new_item)
+    if not profile.initialized or new_card == card:
+        return new_card
+    try:
+        dynamodb.put_item(TableName=table_name, Item=new_item)
+    except ClientError as e:
+        print(f"Error saving card for {short_id}: {e}")
+    return new_card
+
+
+def claim_short_id(short_id, user_pk, table=None):
+    """Reserve a short_id for a profile, creating its card item with only the owner.
+
+    A card that was already rendered for the same profile is left as is.
+
+    Returns:
+        bool: False when another profile owns the short_id
+    """
+    try:
+        dynamodb.update_item(
+            TableName=table or table_name,
+            Key=card_key(short_id),
+            UpdateExpression="SET user_pk = :user_pk, user_sk = :user_sk",
+            ConditionExpression="attribute_not_exists(PK) OR user_pk = :user_pk",
+            ExpressionAttributeValues={":user_pk": {"S": user_pk}, ":user_sk": {"S": "PROFILE"}},
+        )
+    except ClientError as e:
+        if e.response["Error"]["Code"] == "ConditionalCheckFailedException":
+            return False
+        raise
+    return True
@@ -0,0 +1,183 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from botocore.exceptions import ClientError
+from clients import LazyClient
+
+# Inicializamos el cliente de DynamoDB
+dynamodb = LazyClient("dynamodb")
+
+table_name = os.environ.get("DYNAMODB_TABLE_NAME")
+
+# Permite apagar los límites (pruebas locales, migraciones)
+RATE_LIMIT_ENABLED = os.environ.get("RATE_LIMIT_ENABLED", "true").lower() == "true"
+# Llaves (IP o short_id) con estado en memoria como máximo
+RATE_LIMIT_MAX_KEYS = int(os.environ.get("RATE_LIMIT_MAX_KEYS", "4096"))
+# Parte del límite global que cada instancia acumula antes de escribir en DynamoDB
+RATE_LIMIT_BATCH_FRACTION = float(os.environ.get("RATE_LIMIT_BATCH_FRACTION", "0.1"))
+
+
+class _Key:
+    __slots__ = ("tokens", "updated", "window", "unsynced", "blocked_until")
+
+    def __init__(self, tokens, now):
+        self.tokens = tokens
+        self.updated = now
+        self.window = None
+        self.unsynced = 0
+        self.blocked_until = 0.0
+
+
+class RateLimiter:
+    """Token bucket per key, enforced in-process and across instances.
+
+    Every instance keeps a token bucket per key (rate tokens per second up
+    to burst), so a client hammering the same warm instance is rejected
+    without any AWS call. The limit across instances is a counter item per
+    key and fixed window in the table (PK=RATE#<name>#<key>, SK=<window>,
+    expired through the table's TTL). Instead of one write per request,
+    each instance counts the requests of a key locally and adds them to the
+    counter every `batch` requests (a tenth of the limit) with one
+    conditional ADD; once the counter is exhausted the key is rejected
+    locally until the window ends. Keys with little traffic never write,
+    and the shared count lags at most one batch per instance.
+
+    If DynamoDB fails the request is allowed: the limiter protects the
+    table, it must not take the endpoints down with it.
+    """
+
+    def __init__(self, name, rate, burst, window=60, limit=None, client=dynamodb, clock=time.time):
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+        self.window = window
+        self.limit = limit if limit is not None else int(burst + rate * window)
+        self.batch = max(1, int(self.limit * RATE_LIMIT_BATCH_FRACTION))
+        self.client = client
+        self.clock = clock
+        self._keys = OrderedDict()
+        self._lock = threading.Lock()
+        self.writes = 0
+
+    def rejected(self, key):
+        """Return the seconds to wait if key would be rejected right now, without taking a token."""
+        now = self.clock()
+        with self._lock:
+            state = self._keys.get(key)
+            if state is None:
+                return 0
+            if now < state.blocked_until:
+                return state.blocked_until - now
+            tokens = min(self.burst, state.tokens + (now - state.updated) * self.rate)
+            return (1 - tokens) / self.rate if tokens < 1 else 0
+
+    def check(self, key):
+        """Take one token for key.
+
+        Returns:
+            float: 0 if the request is allowed, otherwise seconds until it may be retried
+        """
+        now = self.clock()
+        window = int(now // self.window)
+        with self._lock:
+            state = self._keys.get(key)
+            if state is None:
+                state = self._keys[key] = _Key(self.burst, now)
+                while len(self._keys) > RATE_LIMIT_MAX_KEYS:
+                    self._keys.popitem(last=False)
+            else:
+                self._keys.move_to_end(key)
+
+            if now < state.blocked_until:
+                return state.blocked_until - now
+
+            state.tokens = min(self.burst, state.tokens + (now - state.updated) * self.rate)
+            state.updated = now
+            if state.tokens < 1:
+                return (1 - state.tokens) / self.rate
+            state.tokens -= 1
+
+            if state.window != window:
+                state.window = window
+                state.unsynced = 0
+            state.unsynced += 1
+            if state.unsynced < self.batch:
+                return 0
+            hits, state.unsynced = state.unsynced, 0
+
+        # El contador compartido se actualiza fuera del lock
+        if self._add_hits(key, window, hits):
+            return 0
+        with self._lock:
+            state.blocked_until = (window + 1) * self.window
+        return state.blocked_until - now
+
+    def _add_hits(self, key, window, hits):
+        """Add hits to the shared counter of key; False if that goes over the limit."""
+        self.writes += 1
+        try:
+            self.client.update_item(
+                TableName=table_name,
+                Key={"PK": {"S": f"RATE#{self.name}#{key}"}, "SK": {"S": str(window)}},
+                UpdateExpression="ADD hits :hits SET expires_at = if_not_exists(expires_at, :expires_at)",
+                ConditionExpression="attribute_not_exists(hits) OR hits <= :max_hits",
+                ExpressionAttributeValues={
+                    ":hits": {"N": str(hits)},
+                    ":max_hits": {"N": str(self.limit - hits)},
+                    ":expires_at": {"N": str((window + 2) * self.window)},
+                },
+            )
+        except ClientError as e:
+            if e.response["Error"]["Code"] == "ConditionalCheckFailedException":
+                return False
+            print(f"Error updating rate limit of {self.name}#{key}: {e}")
+        except Exception as e:
+            print(f"Error updating rate limit of {self.name}#{key}: {e}")
+        return True
+
+    def clear(self):
+        with self._lock:
+            self._keys.clear()
+
+
+class RequestLimiter:
+    """Per source IP and per short_id limits of one endpoint.
+
+    The source IP limit stops a client enumerating short_ids, the short_id
+    limit protects a single profile (hot key, PIN or phone digit guesses)
+    from many clients at once. At the venue hundreds of attendees share the
+    IP of the WiFi NAT, so the IP limits are sized for that crowd and the
+    per-profile protection comes from the short_id limit. Each endpoint's IP
+    limit can be tuned with RATE_LIMIT_<NAME>_IP_RATE and
+    RATE_LIMIT_<NAME>_IP_BURST.
+    """
+
+    def __init__(self, name, ip_rate, ip_burst, short_id_rate, short_id_burst, short_id_window=60, **kwargs):
+        prefix = f"RATE_LIMIT_{name.upper()}"
+        ip_rate = float(os.environ.get(f"{prefix}_IP_RATE", ip_rate))
+        ip_burst = float(os.environ.get(f"{prefix}_IP_BURST", ip_burst))
+        self.by_ip = RateLimiter(f"{name}#ip", ip_rate, ip_burst, **kwargs)
+        self.by_short_id = RateLimiter(f"{name}#sid", short_id_rate, short_id_burst, window=short_id_window, **kwargs)
+
+    def check(self, event, short_id):
+        """Return 0 if the request is allowed, or the seconds to wait before retrying."""
+        if not RATE_LIMIT_ENABLED:
+            return 0
+        ip = source_ip(event)
+        # Si alguno de los dos ya rechaza en memoria no gastamos tokens ni escrituras del otro
+        retry_after = self.by_ip.rejected(ip) or self.by_short_id.rejected(short_id)
+        if retry_after:
+            return retry_after
+        return self.by_ip.check(ip) or self.by_short_id.check(short_id)
+
+    def clear(self):
+        self.by_ip.clear()
+        self.by_short_id.clear()
+
+
+def source_ip(event):
+    """Client IP as seen by API Gateway."""
+    identity = (event.get("requestContext") or {}).get("identity") or {}
+    return identity.get("sourceIp") or "unknown"
@@ -0,0 +1,146 @@
+import hashlib
+import os
+from concurrent.futures import ThreadPoolExecutor
+from itertools import repeat
+from operator import add, and_, floordiv, itemgetter, methodcaller, mod
+
+from attendees import BASE36, MAX_SALT, ShortIdExhausted, event_code_source
+from clients import LazyClient
+from sketches import BloomFilter
+
+dynamodb = LazyClient("dynamodb")
+
+TABLE_NAME = os.environ.get("DYNAMODB_TABLE_NAME")
+INDEX_NAME = os.environ.get("INDEX_NAME")
+
+CODE_MASK = (1 << 36) - 1
+# Los 36 bits bajos del hash están en los últimos 5 bytes del digest
+LOW_BYTES = itemgetter(slice(-5, None))
+# Pares de dígitos base36 precalculados: 4 búsquedas por código en lugar de un divmod por dígito
+PAIRS = [a + b for a in BASE36 for b in BASE36]
+PAIR_BASE = len(PAIRS)
+# Un valor de 36 bits tiene a lo más 7 dígitos base36, el primero sin cero a la izquierda
+HEAD = [""] + list(BASE36[1:])
+LOOKUP_WORKERS = 8
+
+
+def hash_codes(sources):
+    """Return the 36-bit code values of the given strings, as generate_event_code does."""
+    digests = map(methodcaller("digest"), map(hashlib.sha256, map(str.encode, sources)))
+    return list(map(and_, map(int.from_bytes, map(LOW_BYTES, digests), repeat("big")), repeat(CODE_MASK)))
+
+
+def encode_base36_batch(values):
+    """Encode 36-bit values like base36_encode(value).zfill(6), column by column."""
+    rest = list(map(floordiv, values, repeat(PAIR_BASE)))
+    last = map(PAIRS.__getitem__, map(mod, values, repeat(PAIR_BASE)))
+    top = list(map(floordiv, rest, repeat(PAIR_BASE)))
+    third = map(PAIRS.__getitem__, map(mod, rest, repeat(PAIR_BASE)))
+    first = map(HEAD.__getitem__, map(floordiv, top, repeat(PAIR_BASE)))
+    second = map(PAIRS.__getitem__, map(mod, top, repeat(PAIR_BASE)))
+    return list(map(add, map(add, map(add, first, second), third), last))
+
+
+def generate_event_codes(sources):
+    return encode_base36_batch(hash_codes(sources))
+
+
+def find_short_id_owners(short_id, table_name=TABLE_NAME, index_name=INDEX_NAME):
+    """Return the user_ids whose profile already uses a short_id."""
+    response = dynamodb.query(
+        TableName=table_name,
+        IndexName=index_name,
+        KeyConditionExpression="short_id = :sid",
+        ExpressionAttributeValues={":sid": {"S": short_id}},
+        ProjectionExpression="PK",
+    )
+    return {item["PK"]["S"].split("#", 1)[1] for item in response.get("Items", [])}
+
+
+def load_existing_short_ids(table_name=TABLE_NAME, index_name=INDEX_NAME, error_rate=0.001):
+    """Build a Bloom filter with every short_id of the table, reading only the GSI keys."""
+    short_ids = []
+    kwargs = {"TableName": table_name, "IndexName": index_name, "ProjectionExpression": "short_id"}
+    while True:
+        response = dynamodb.scan(**kwargs)
+        short_ids.extend(item["short_id"]["S"] for item in response.get("Items", []))
+        if "LastEvaluatedKey" not in response:
+            break
+        kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+    # Dejamos espacio para los códigos que se van a asignar
+    existing = BloomFilter(max(len(short_ids) * 2, 10000), error_rate)
+    existing.update(short_ids)
+    return existing
+
+
+class ShortIdAllocator:
+    """Assign short_ids to attendees without reusing a code owned by someone else.
+
+    The candidate code is the one generate_event_code has always produced.
+    When it is taken, the source string is salted with #1, #2, ... until a
+    free code appears, so the same attendee against the same table always
+    gets the same code, and re-importing an attendee keeps their code.
+    The lookups only narrow the choice down: save_profile claims the code
+    with a conditional write and salts again when another import won it.
+
+    Args:
+        existing (BloomFilter): Codes already in the table. Codes it does not
+            contain are free without a lookup; None means every code is
+            checked with `lookup`.
+        lookup (callable): short_id -> set of user_ids that own it
+    """
+
+    def __init__(self, existing=None, lookup=find_short_id_owners):
+        self.existing = existing
+        self.lookup = lookup
+        self.assigned = {}
+        self.owners = {}
+        self.lookups = 0
+        self.collisions = 0
+
+    def _maybe_taken(self, code):
+        return self.existing is None or code in self.existing
+
+    def _owners(self, code):
+        if code not in self.owners:
+            self.lookups += 1
+            self.owners[code] = self.lookup(code)
+        return self.owners[code]
+
+    def is_free(self, code, user_id, maybe_taken=None):
+        owner = self.assigned.get(code)
+        if owner is not None:
+            return owner == user_id
+        if code not in self.owners and not (self._maybe_taken(code) if maybe_taken is None else maybe_taken):
+            return True
+        owners = self._owners(code)
+        return not owners or owners == {user_id}
+
+    def assign(self, attendees):
+        """Set short_id on every attendee dict and return the list of codes."""
+        sources = [event_code_source(data) for data in attendees]
+        codes = generate_event_codes(sources)
+        maybe_taken = [self._maybe_taken(code) for code in codes]
+
+        # Las búsquedas de la primera ronda van en paralelo, las de colisiones son raras
+        pending = list({code for code, maybe in zip(codes, maybe_taken) if maybe and code not in self.owners})
+        if len(pending) > 1:
+            with ThreadPoolExecutor(max_workers=min(LOOKUP_WORKERS, len(pending))) as executor:
+                self.owners.update(zip(pending, executor.map(self.lookup, pending)))
+            self.lookups += len(pending)
+
+        for index, (data, source) in enumerate(zip(attendees, sources)):
+            user_id = data["barcode"]
+            salt = 0
+            while not self.is_free(codes[index], user_id, maybe_taken[index] if not salt else None):
+                salt += 1
+                if salt > MAX_SALT:
+                    raise ShortIdExhausted(f"Could not find a free short_id for {user_id}")
+                codes[index] = generate_event_codes([f"{source}#{salt}"])[0]
+            if salt:
+                self.collisions += 1
+            self.assigned[codes[index]] = user_id
+            data["short_id"] = codes[index]
+
+        return codes
@@ -0,0 +1,162 @@
+import hashlib
+import math
+import time
+from itertools import repeat
+from operator import mod
+
+
+class BloomFilter:
+    """Bloom filter over strings backed by a bytearray.
+
+    The k bit positions come from a single blake2b digest split in two
+    64-bit halves (double hashing), so adding or testing a value costs one
+    hash no matter how many positions are used.
+    """
+
+    def __init__(self, capacity, error_rate=0.001):
+        self.capacity = max(int(capacity), 1)
+        self.error_rate = error_rate
+        self.size = max(8, int(-self.capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / self.capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, value):
+        digest = hashlib.blake2b(value.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        return map(mod, range(first, first + self.hashes * second, second), repeat(self.size))
+
+    def add(self, value):
+        """Add a value and return True if it was (probably) already present."""
+        present = True
+        for position in self._positions(value):
+            mask = 1 << (position & 7)
+            if not self.bits[position >> 3] & mask:
+                present = False
+                self.bits[position >> 3] |= mask
+        if not present:
+            self.count += 1
+        return present
+
+    def update(self, values):
+        for value in values:
+            self.add(value)
+
+    def __contains__(self, value):
+        bits = self.bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self._positions(value))
+
+    def __len__(self):
+        return self.count
+
+
+class WindowedBloomFilter:
+    """Remember values for roughly `window` seconds with bounded memory.
+
+    Two Bloom filters take turns: values go to the current one and are
+    looked up in both, and when the window elapses (or the current filter
+    reaches its capacity) the previous filter is discarded. A value is
+    therefore remembered for at least one window and at most two.
+    """
+
+    def __init__(self, capacity, error_rate=0.01, window=600, clock=time.monotonic):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.window = window
+        self.clock = clock
+        self.current = BloomFilter(capacity, error_rate)
+        self.previous = None
+        self.started = clock()
+
+    def _rotate(self):
+        now = self.clock()
+        if now - self.started >= self.window or len(self.current) >= self.capacity:
+            # Si pasaron dos ventanas sin actividad, lo anterior ya expiró
+            self.previous = self.current if now - self.started < 2 * self.window else None
+            self.current = BloomFilter(self.capacity, self.error_rate)
+            self.started = now
+
+    def add(self, value):
+        """Add a value and return True if it was (probably) seen within the window."""
+        self._rotate()
+        if self.previous is not None and value in self.previous:
+            self.current.add(value)
+            return True
+        return self.current.add(value)
+
+    def __contains__(self, value):
+        return value in self.current or (self.previous is not None and value in self.previous)
+
+    @property
+    def nbytes(self):
+        return len(self.current.bits) + (len(self.previous.bits) if self.previous is not None else 0)
+
+
+# 2^-r para cada valor posible de un registro
+_INVERSE_POWERS = [2.0 ** -rank for rank in range(65)]
+
+
+class HyperLogLog:
+    """HyperLogLog distinct counter with one byte per register.
+
+    The relative standard error is about 1.04 / sqrt(2^precision): 4.6% with
+    the default 512 registers, and small counts are exact or close to exact
+    thanks to the linear counting correction. Sketches with the same
+    precision merge with a register-wise max, so adding the same value twice
+    or merging the same sketch again never changes the estimate.
+    """
+
+    def __init__(self, precision=9, registers=None):
+        if not 4 <= precision <= 16:
+            raise ValueError("precision must be between 4 and 16")
+        self.precision = precision
+        self.size = 1 << precision
+        self.registers = bytearray(registers) if registers is not None else bytearray(self.size)
+        if len(self.registers) != self.size:
+            raise ValueError("registers do not match the precision")
+
+    def add(self, value):
+        """Add a value and return True if the sketch changed."""
+        hashed = int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), "little")
+        index = hashed & (self.size - 1)
+        rank = 64 - self.precision - (hashed >> self.precision).bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+            return True
+        return False
+
+    def update(self, values):
+        changed = False
+        for value in values:
+            changed = self.add(value) or changed
+        return changed
+
+    def merge(self, other):
+        """Merge another sketch into this one and return True if it changed."""
+        if other.precision != self.precision:
+            raise ValueError("cannot merge sketches with different precision")
+        merged = bytearray(map(max, self.registers, other.registers))
+        changed = merged != self.registers
+        self.registers = merged
+        return changed
+
+    def count(self):
+        size = self.size
+        alpha = 0.7213 / (1 + 1.079 / size) if size >= 128 else {16: 0.673, 32: 0.697, 64: 0.709}[size]
+        estimate = alpha * size * size / sum(map(_INVERSE_POWERS.__getitem__, self.registers))
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * size and zeros:
+            # Linear counting, más preciso con pocos valores
+            estimate = size * math.log(size / zeros)
+        return round(estimate)
+
+    def __len__(self):
+        return self.count()
+
+    def to_bytes(self):
+        return bytes([self.precision]) + bytes(self.registers)
+
+    @classmethod
+    def from_bytes(cls, data):
+        return cls(data[0], data[1:])
@@ -0,0 +1,175 @@
+import base64
+import hashlib
+import hmac
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from clients import LazyClient
+from models import Sponsor, projection
+
+# Inicializamos el cliente de DynamoDB
+dynamodb = LazyClient("dynamodb")
+
+table_name = os.environ.get("DYNAMODB_TABLE_NAME")
+
+# Clave secreta para firmar y verificar el JWT (debería almacenarse de forma segura)
+SECRET_KEY = "my_super_secret_key"
+
+# Una tablet manda el mismo token en cada sello durante sus 24 horas de vida,
+# así que guardamos los tokens ya verificados (por su digest) hasta que expiren
+JWT_CACHE_MAX_ITEMS = int(os.environ.get("JWT_CACHE_MAX_ITEMS", "256"))
+# Perfiles de sponsor para el login y para revisar la llave de los tokens; 0 desactiva
+# el cache. Es también lo que tarda una llave cambiada o revocada en dejar de funcionar
+SPONSOR_CACHE_TTL_SECONDS = float(os.environ.get("SPONSOR_CACHE_TTL_SECONDS", "60"))
+
+# secret_key -> objeto HMAC con la llave ya procesada, se copia para cada firma
+_hmac_keys = {}
+# (secret_key, digest del token) -> payload
+_verified = OrderedDict()
+# sponsor_id -> (expira_en, Sponsor)
+_sponsors = {}
+_lock = threading.Lock()
+
+
+def base64url_encode(input: bytes):
+    return base64.urlsafe_b64encode(input).decode("utf-8").replace("=", "")
+
+
+def base64url_decode(input: str):
+    rem = len(input) % 4
+    if rem > 0:
+        input += "=" * (4 - rem)
+    return base64.urlsafe_b64decode(input)
+
+
+def sign(signing_input: bytes, secret_key):
+    """HMAC-SHA256 of signing_input, reusing the prepared key of secret_key."""
+    prepared = _hmac_keys.get(secret_key)
+    if prepared is None:
+        prepared = _hmac_keys[secret_key] = hmac.new(secret_key.encode(), digestmod=hashlib.sha256)
+    mac = prepared.copy()
+    mac.update(signing_input)
+    return mac.digest()
+
+
+def _expired(payload, now):
+    return "exp" in payload and now > payload["exp"]
+
+
+def verify_jwt(token, secret_key):
+    """Return the payload of a valid, unexpired HS256 token, or None.
+
+    Verified tokens are kept in a bounded LRU keyed by their SHA-256 digest,
+    so repeated stamps with the same token skip the base64/HMAC/JSON work.
+    Invalid tokens are never cached.
+    """
+    now = time.time()
+    try:
+        key = (secret_key, hashlib.sha256(token.encode()).digest())
+    except AttributeError as e:
+        print(f"Error verifying JWT: {e}")
+        return None
+
+    with _lock:
+        payload = _verified.get(key)
+        if payload is not None:
+            if _expired(payload, now):
+                del _verified[key]
+                return None
+            _verified.move_to_end(key)
+            return dict(payload)
+
+    try:
+        # Separar el token en sus tres partes (header, payload, signature)
+        header_b64, payload_b64, signature_b64 = token.split(".")
+
+        # Verificar la firma
+        signature = base64url_decode(signature_b64)
+        expected_signature = sign(f"{header_b64}.{payload_b64}".encode(), secret_key)
+
+        if not hmac.compare_digest(signature, expected_signature):
+            return None
+
+        # Decodificar el payload
+        payload = json.loads(base64url_decode(payload_b64).decode("utf-8"))
+    except Exception as e:
+        print(f"Error verifying JWT: {e}")
+        return None
+
+    # Verificar que el token no haya expirado
+    if not isinstance(payload, dict) or _expired(payload, now):
+        return None
+
+    with _lock:
+        _verified[key] = payload
+        while len(_verified) > JWT_CACHE_MAX_ITEMS:
+            _verified.popitem(last=False)
+    return dict(payload)
+
+
+def key_version(key):
+    """Fingerprint of a sponsor key, carried in its tokens so that changing the key revokes them."""
+    return hashlib.sha256(key.encode()).hexdigest()[:16]
+
+
+def verify_sponsor_jwt(token, secret_key):
+    """Return the payload of a valid token whose sponsor key is still current, or None.
+
+    verify_jwt only checks the signature and exp, and its cache outlives a
+    key rotation. Tokens carry the key_version of the key used to log in,
+    which is compared with the sponsor profile on every verification, cache
+    hits included. The profile comes from the get_sponsor cache, so a
+    rotated or removed key stops working within SPONSOR_CACHE_TTL_SECONDS;
+    a mismatch reads the profile again, in case the token comes from a login
+    with a key newer than the cached one. Tokens issued before key_version
+    existed are accepted until they expire.
+    """
+    payload = verify_jwt(token, secret_key)
+    if payload is None or "key_version" not in payload:
+        return payload
+
+    sponsor_id = payload.get("sponsor_id")
+    sponsor = get_sponsor(sponsor_id)
+    if sponsor is None or not sponsor.key or key_version(sponsor.key) != payload["key_version"]:
+        sponsor = get_sponsor(sponsor_id, refresh=True)
+        if sponsor is None or not sponsor.key or key_version(sponsor.key) != payload["key_version"]:
+            return None
+    return payload
+
+
+def get_sponsor(sponsor_id, refresh=False):
+    """Return the Sponsor used to authenticate a login, or None if it does not exist.
+
+    Args:
+        sponsor_id (str): Sponsor id sent by the tablet
+        refresh (bool): Skip the cache (used when the key does not match,
+            in case it was rotated)
+    """
+    now = time.monotonic()
+    if not refresh and SPONSOR_CACHE_TTL_SECONDS > 0:
+        entry = _sponsors.get(sponsor_id)
+        if entry is not None and entry[0] > now:
+            return entry[1]
+
+    response = dynamodb.get_item(
+        TableName=table_name,
+        Key={"PK": {"S": f"SPONSOR#{sponsor_id}"}, "SK": {"S": "PROFILE"}},
+        **projection(Sponsor.ATTRIBUTES),
+    )
+    if "Item" not in response:
+        _sponsors.pop(sponsor_id, None)
+        return None
+
+    sponsor = Sponsor.from_item(response["Item"])
+    if SPONSOR_CACHE_TTL_SECONDS > 0:
+        _sponsors[sponsor_id] = (now + SPONSOR_CACHE_TTL_SECONDS, sponsor)
+    return sponsor
+
+
+def clear_cache():
+    with _lock:
+        _verified.clear()
+    _sponsors.clear()
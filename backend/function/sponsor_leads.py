@@ -0,0 +1,203 @@
+import base64
+import csv
+import io
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from botocore.exceptions import ClientError
+from clients import LazyClient
+from instrumentation import instrument
+from models import Lead, Profile, projection
+from sponsor_auth import SECRET_KEY, verify_sponsor_jwt
+from utils import generate_http_response, generate_raw_response, get_header
+
+# Inicializar cliente de DynamoDB
+dynamodb = LazyClient("dynamodb")
+
+table_name = os.environ.get("DYNAMODB_TABLE_NAME")
+
+# aggregate_stamps escribe un LEAD#<user_id> por asistente en la partición del sponsor
+LEAD_PREFIX = "LEAD#"
+DEFAULT_PAGE_SIZE = 500
+MAX_PAGE_SIZE = 1000
+# BatchGetItem acepta hasta 100 llaves por llamada
+BATCH_GET_SIZE = 100
+BATCH_GET_RETRIES = 5
+MAX_WORKERS = 4
+
+# Solo lo que el sponsor puede ver; el correo y el teléfono se filtran con share_*
+PROFILE_ATTRIBUTES = ("PK", "short_id", "first_name", "last_name", "company", "role", "contact_information")
+COLUMNS = (
+    "short_id", "first_name", "last_name", "company", "role", "email", "phone",
+    "first_stamp_at", "stamp_count", "notes",
+)
+CONTENT_TYPES = {
+    "json": "application/json",
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+
+
+def encode_cursor(last_evaluated_key):
+    user_id = last_evaluated_key["SK"]["S"].removeprefix(LEAD_PREFIX)
+    return base64.urlsafe_b64encode(user_id.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """Return the user_id a page starts after; raises ValueError for a malformed cursor."""
+    padded = cursor + "=" * (-len(cursor) % 4)
+    user_id = base64.urlsafe_b64decode(padded.encode()).decode()
+    if not user_id or "#" in user_id:
+        raise ValueError("Invalid cursor")
+    return user_id
+
+
+def query_leads(sponsor_id, limit, after=None):
+    """Read one page of a sponsor's leads.
+
+    The cursor only carries the user_id of the last lead; the partition key
+    always comes from the JWT, so a cursor cannot reach another sponsor.
+
+    Returns:
+        tuple: (list of Lead, cursor of the next page or None)
+    """
+    kwargs = {
+        "TableName": table_name,
+        "KeyConditionExpression": "PK = :pk AND begins_with(SK, :prefix)",
+        "ExpressionAttributeValues": {
+            ":pk": {"S": f"SPONSOR#{sponsor_id}"},
+            ":prefix": {"S": LEAD_PREFIX},
+        },
+        "Limit": limit,
+        **projection(Lead.ATTRIBUTES),
+    }
+    if after is not None:
+        kwargs["ExclusiveStartKey"] = {
+            "PK": {"S": f"SPONSOR#{sponsor_id}"},
+            "SK": {"S": f"{LEAD_PREFIX}{after}"},
+        }
+    response = dynamodb.query(**kwargs)
+    leads = [Lead.from_item(item) for item in response.get("Items", [])]
+    last_key = response.get("LastEvaluatedKey")
+    return leads, encode_cursor(last_key) if last_key else None
+
+
+def batch_get_profiles(user_ids):
+    """Fetch up to BATCH_GET_SIZE profiles with BatchGetItem, retrying unprocessed keys."""
+    keys = [{"PK": {"S": f"USER#{user_id}"}, "SK": {"S": "PROFILE"}} for user_id in user_ids]
+    profiles = {}
+    for attempt in range(BATCH_GET_RETRIES):
+        response = dynamodb.batch_get_item(
+            RequestItems={table_name: {"Keys": keys, **projection(PROFILE_ATTRIBUTES)}}
+        )
+        for item in response.get("Responses", {}).get(table_name, []):
+            profile = Profile.from_item(item)
+            profiles[profile.user_id] = profile
+        keys = response.get("UnprocessedKeys", {}).get(table_name, {}).get("Keys", [])
+        if not keys:
+            return profiles
+        time.sleep(0.05 * 2**attempt)
+    raise RuntimeError(f"Could not read {len(keys)} profiles")
+
+
+def get_profiles(user_ids):
+    """Fetch the profiles of a page of leads, BATCH_GET_SIZE keys per call in parallel."""
+    chunks = [user_ids[start : start + BATCH_GET_SIZE] for start in range(0, len(user_ids), BATCH_GET_SIZE)]
+    profiles = {}
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        for chunk in executor.map(batch_get_profiles, chunks):
+            profiles.update(chunk)
+    return profiles
+
+
+def lead_row(lead, profile):
+    """Flatten a lead and its profile, leaving out the contact data the attendee does not share."""
+    contact = profile.contact_information
+    return {
+        "short_id": profile.short_id,
+        "first_name": profile.first_name,
+        "last_name": profile.last_name,
+        "company": profile.company or None,
+        "role": profile.role or None,
+        "email": contact.email if contact.share_email else None,
+        "phone": contact.phone if contact.share_phone else None,
+        "first_stamp_at": lead.first_stamp_at,
+        "stamp_count": lead.stamp_count,
+        "notes": lead.notes or None,
+    }
+
+
+def csv_cell(value):
+    if value is None:
+        return ""
+    value = str(value)
+    # Evitar que una hoja de cálculo interprete los datos del asistente como fórmula
+    if value[:1] in ("=", "+", "-", "@", "\t", "\r"):
+        return "'" + value
+    return value
+
+
+def render(rows, output_format, cursor):
+    if output_format == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(COLUMNS)
+        for row in rows:
+            writer.writerow([csv_cell(row[column]) for column in COLUMNS])
+        return buffer.getvalue()
+    if output_format == "ndjson":
+        return "".join(json.dumps(row) + "\n" for row in rows)
+    return json.dumps({"leads": rows, "next_cursor": cursor})
+
+
+def request_token(event, params):
+    # Preferimos el header para que el token no quede en los logs de acceso
+    authorization = get_header(event, "Authorization") or ""
+    if authorization.startswith("Bearer "):
+        return authorization[len("Bearer "):]
+    return params.get("jwt")
+
+
+# Función para que un sponsor descargue sus leads por páginas
+@instrument
+def lambda_handler(event, context):
+    params = event.get("queryStringParameters") or {}
+
+    jwt_token = request_token(event, params)
+    jwt_payload = verify_sponsor_jwt(jwt_token, SECRET_KEY) if jwt_token else None
+    if jwt_payload is None:
+        return generate_http_response(403, {"error": "Invalid or expired JWT"})
+
+    sponsor_id = jwt_payload.get("sponsor_id")
+    if not sponsor_id:
+        return generate_http_response(403, {"error": "JWT does not contain sponsor_id"})
+
+    output_format = params.get("format", "json")
+    if output_format not in CONTENT_TYPES:
+        return generate_http_response(400, {"error": f"format must be one of {', '.join(CONTENT_TYPES)}"})
+    try:
+        limit = int(params.get("limit", DEFAULT_PAGE_SIZE))
+        after = decode_cursor(params["cursor"]) if params.get("cursor") else None
+    except (ValueError, UnicodeDecodeError):
+        return generate_http_response(400, {"error": "Invalid limit or cursor"})
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        return generate_http_response(400, {"error": f"limit must be between 1 and {MAX_PAGE_SIZE}"})
+
+    try:
+        leads, cursor = query_leads(sponsor_id, limit, after)
+        profiles = get_profiles([lead.user_id for lead in leads]) if leads else {}
+    except ClientError as e:
+        print(f"Error accessing DynamoDB: {e}")
+        return generate_http_response(500, {"error": "Error accessing DynamoDB"})
+
+    # Los asistentes que ya no tienen perfil no se exportan
+    rows = [lead_row(lead, profiles[lead.user_id]) for lead in leads if lead.user_id in profiles]
+
+    headers = {"Content-Type": CONTENT_TYPES[output_format]}
+    if output_format != "json":
+        headers["Content-Disposition"] = f'attachment; filename="leads-{sponsor_id}.{output_format}"'
+        if cursor:
+            headers["X-Next-Cursor"] = cursor
+    return generate_raw_response(200, render(rows, output_format, cursor), headers)
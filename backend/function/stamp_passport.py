@@ -1,90 +1,213 @@
-import base64
-import hashlib
-import hmac
 import json
 import os
 from datetime import datetime, timedelta, timezone
 
-import boto3
 from botocore.exceptions import ClientError
+from clients import LazyClient
+from instrumentation import instrument
+from models import Stamp, projection
+from profile_cache import get_user_id
+from sponsor_auth import SECRET_KEY, verify_sponsor_jwt
 from utils import generate_http_response
 
 # Inicializar cliente de DynamoDB
-dynamodb = boto3.client("dynamodb")
+dynamodb = LazyClient("dynamodb")
 
 table_name = os.environ.get("DYNAMODB_TABLE_NAME")
-index_name = os.environ.get("INDEX_NAME")
 
-# Clave secreta para firmar y verificar el JWT
-SECRET_KEY = "my_super_secret_key"
+# Un asistente solo puede sellar con el mismo sponsor una vez cada 10 minutos
+STAMP_WINDOW = timedelta(minutes=10)
+# Ítem por (asistente, sponsor) con el último sello, la condición de la transacción
+LAST_STAMP_PREFIX = "LAST_STAMP#"
+# TransactWriteItems acepta hasta 100 operaciones, una es el "último sello"
+MAX_TRANSACTION_STAMPS = 99
+MAX_ATTEMPTS = 3
+# Las notas se escriben tal cual en el ítem del sello
+MAX_NOTES_LENGTH = int(os.environ.get("MAX_NOTES_LENGTH", "1000"))
 
 
-# Función para decodificar el JWT sin librerías externas
-def base64url_decode(input: str):
-    rem = len(input) % 4
-    if rem > 0:
-        input += "=" * (4 - rem)
-    return base64.urlsafe_b64decode(input)
+class StampContention(Exception):
+    """The stamp kept losing against concurrent writes of the same attendee and sponsor."""
 
 
-def verify_jwt(token, secret_key):
-    try:
-        # Separar el token en sus tres partes (header, payload, signature)
-        header_b64, payload_b64, signature_b64 = token.split(".")
+def valid_notes(notes):
+    return isinstance(notes, str) and len(notes) <= MAX_NOTES_LENGTH
 
-        # Verificar la firma
-        signing_input = f"{header_b64}.{payload_b64}".encode()
-        signature = base64url_decode(signature_b64)
-        key = secret_key.encode()
-        expected_signature = hmac.new(key, signing_input, hashlib.sha256).digest()
 
-        if not hmac.compare_digest(signature, expected_signature):
-            return None
+def is_conflict(error):
+    """True if a transaction was cancelled because another one touched the same items."""
+    reasons = error.response.get("CancellationReasons", [])
+    return any(reason.get("Code") == "TransactionConflict" for reason in reasons)
 
-        # Decodificar el payload
-        payload_json = base64url_decode(payload_b64).decode("utf-8")
-        payload = json.loads(payload_json)
 
-        # Verificar que el token no haya expirado
-        if "exp" in payload and datetime.utcnow().timestamp() > payload["exp"]:
-            return None
+def last_stamp_key(user_id, sponsor_id):
+    return {"PK": {"S": f"USER#{user_id}"}, "SK": {"S": f"{LAST_STAMP_PREFIX}{sponsor_id}"}}
 
-        return payload
-    except Exception as e:
-        print(f"Error verifying JWT: {e}")
-        return None
 
-def can_register(user_id, sponsor_id):
-    now = datetime.now(timezone.utc)
-    ten_minutes_ago = now - timedelta(minutes=10)
+def stamp_item(user_id, sponsor_id, created_at, notes=""):
+    created_at_iso = created_at.isoformat()
+    item = {
+        "PK": {"S": f"USER#{user_id}"},
+        "SK": {"S": f"SPONSOR#{sponsor_id}#{created_at_iso}"},
+        "created_at": {"S": created_at_iso},
+    }
+    if notes:
+        item["notes"] = {"S": notes}
+    return item
 
-    # Query the latest session for the user with the sponsor
-    response = dynamodb.query(
-        TableName=table_name,
-        KeyConditionExpression="PK = :user_pk AND begins_with(SK, :sponsor_sk)",
-        ExpressionAttributeValues={
+
+def get_existing_stamps(user_id, sponsor_id, start, end):
+    """Return the stamp timestamps of a user with a sponsor between start and end.
+
+    The read is strongly consistent so that, after reading the "last stamp"
+    item, every stamp written before it is visible.
+    """
+    prefix = f"SPONSOR#{sponsor_id}#"
+    timestamps = []
+    kwargs = {
+        "TableName": table_name,
+        "KeyConditionExpression": "PK = :user_pk AND SK BETWEEN :start AND :end",
+        "ExpressionAttributeValues": {
             ":user_pk": {"S": f"USER#{user_id}"},
-            ":sponsor_sk": {"S": f"SPONSOR#{sponsor_id}"},
+            ":start": {"S": f"{prefix}{start.isoformat()}"},
+            ":end": {"S": f"{prefix}{end.isoformat()}"},
         },
-        ScanIndexForward=False,  # Sort in descending order to get the latest session first
-        Limit=1
+        "ConsistentRead": True,
+        **projection(Stamp.ATTRIBUTES),
+    }
+    while True:
+        response = dynamodb.query(**kwargs)
+        for item in response.get("Items", []):
+            timestamps.append(datetime.fromisoformat(Stamp.from_item(item).created_at))
+        if "LastEvaluatedKey" not in response:
+            return timestamps
+        kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+
+def get_last_stamp(user_id, sponsor_id):
+    """Read the "last stamp" item of a user with a sponsor.
+
+    Returns:
+        tuple: (created_at, version) or None when the item does not exist.
+            version is None for items written before it was tracked
+    """
+    response = dynamodb.get_item(
+        TableName=table_name,
+        Key=last_stamp_key(user_id, sponsor_id),
+        ConsistentRead=True,
+    )
+    item = response.get("Item")
+    if item is None:
+        return None
+    version = item.get("version", {}).get("N")
+    return datetime.fromisoformat(item["created_at"]["S"]), int(version) if version else None
+
+
+def write_stamps(user_id, sponsor_id, stamps, latest, condition, values=None):
+    """Write stamp rows and move the "last stamp" item in a single transaction.
+
+    Every stamp of a (user, sponsor) pair, live or from the batch endpoint,
+    goes through here: the "last stamp" item keeps the newest created_at and
+    a version that grows with each write, so a condition on it rejects any
+    write that raced with another one.
+
+    Args:
+        stamps (list): (created_at, notes) tuples, at most MAX_TRANSACTION_STAMPS
+        latest (datetime): created_at the "last stamp" item ends up with
+        condition (str): ConditionExpression on the "last stamp" item
+        values (dict): ExpressionAttributeValues used by the condition
+
+    Returns:
+        tuple: (True, None) if the stamps were written, or (False, item) when
+            the condition failed; item is the current "last stamp" item, or
+            None when it does not exist
+    """
+    transact_items = [
+        {
+            "Update": {
+                "TableName": table_name,
+                "Key": last_stamp_key(user_id, sponsor_id),
+                "UpdateExpression": "SET created_at = :created_at ADD version :one",
+                "ConditionExpression": condition,
+                "ExpressionAttributeValues": {
+                    ":created_at": {"S": latest.isoformat()},
+                    ":one": {"N": "1"},
+                    **(values or {}),
+                },
+                "ReturnValuesOnConditionCheckFailure": "ALL_OLD",
+            }
+        }
+    ]
+    transact_items.extend(
+        {"Put": {"TableName": table_name, "Item": stamp_item(user_id, sponsor_id, created_at, notes)}}
+        for created_at, notes in stamps
     )
 
-    # Check if there is a recent session
-    items = response.get('Items', [])
-    if items:
-        last_session = items[0]
-        last_timestamp = datetime.fromisoformat(last_session['created_at']['S'])
-
-        # Ensure the last session was more than 10 minutes ago
-        if last_timestamp > ten_minutes_ago:
-            return False
-
-    # Otherwise, allow the registration
-    return True
+    try:
+        dynamodb.transact_write_items(TransactItems=transact_items)
+    except ClientError as e:
+        reasons = e.response.get("CancellationReasons", [])
+        if reasons and reasons[0].get("Code") == "ConditionalCheckFailed":
+            return False, reasons[0].get("Item")
+        raise
+
+    return True, None
+
+
+def register_stamp(user_id, sponsor_id, created_at, notes=""):
+    """Write a stamp unless the user already has one with the sponsor in the last 10 minutes.
+
+    The check and the write happen in a single transaction: the per-(user,
+    sponsor) "last stamp" item is conditionally updated next to the history
+    row, so two tablets scanning at the same time cannot both register the
+    stamp. Pairs without that item (first stamp, or stamps from before it
+    existed) are checked against the history before the item is created,
+    and the creation is itself conditional.
+
+    Args:
+        user_id (str): Attendee user_id
+        sponsor_id (str): Sponsor that scanned the badge
+        created_at (datetime): Aware UTC datetime of the scan
+        notes (str): Optional sponsor notes
+
+    Returns:
+        bool: True if the stamp was saved, False if it falls inside the window
+
+    Raises:
+        StampContention: every attempt lost against a concurrent write
+    """
+    cutoff = created_at - STAMP_WINDOW
+    stamps = [(created_at, notes)]
+
+    for _ in range(MAX_ATTEMPTS):
+        try:
+            saved, current = write_stamps(
+                user_id, sponsor_id, stamps, created_at,
+                "created_at <= :cutoff", {":cutoff": {"S": cutoff.isoformat()}},
+            )
+            if saved:
+                return True
+            if current is not None:
+                return False
+
+            # Sin "último sello" revisamos el historial (sellos de antes de que existiera)
+            existing = get_existing_stamps(user_id, sponsor_id, cutoff, created_at)
+            if any(created_at - other < STAMP_WINDOW for other in existing):
+                return False
+            saved, _ = write_stamps(user_id, sponsor_id, stamps, created_at, "attribute_not_exists(PK)")
+            if saved:
+                return True
+            # Otro sello creó el ítem mientras tanto, volvemos a evaluar contra él
+        except ClientError as e:
+            # Otra transacción sobre los mismos ítems: se reintenta igual que una condición fallida
+            if not is_conflict(e):
+                raise
+
+    raise StampContention(f"Could not register the stamp of {user_id} with {sponsor_id}")
 
 
 # Función para guardar o actualizar el sello y los comentarios
+@instrument
 def lambda_handler(event, context):
     # Parsear el cuerpo de la solicitud
     try:
@@ -95,7 +218,7 @@ def lambda_handler(event, context):
         return generate_http_response(400, {"error": "Invalid input"})
 
     # Verificar el JWT y extraer el sponsor_id
-    jwt_payload = verify_jwt(jwt_token, SECRET_KEY)
+    jwt_payload = verify_sponsor_jwt(jwt_token, SECRET_KEY)
     if jwt_payload is None:
         return generate_http_response(403, {"error": "Invalid or expired JWT"})
 
@@ -103,41 +226,30 @@ def lambda_handler(event, context):
     if not sponsor_id:
         return generate_http_response(403, {"error": "JWT does not contain sponsor_id"})
 
-    notes = body.get("notes", "")  # Notas opcionales
+    notes = body.get("notes") or ""  # Notas opcionales
+    if not valid_notes(notes):
+        return generate_http_response(400, {"error": f"notes must be a string of at most {MAX_NOTES_LENGTH} characters"})
 
     try:
-        # Buscar al usuario por short_id
-        response_user = dynamodb.query(
-            TableName=table_name,
-            IndexName=index_name,
-            KeyConditionExpression="short_id = :sid",
-            ExpressionAttributeValues={":sid": {"S": short_id}},
-        )
+        # Buscar al usuario por short_id (índice KEYS_ONLY, solo necesitamos el user_id)
+        user_id = get_user_id(short_id)
 
         # Verificar si el usuario existe
-        if not response_user["Items"]:
+        if user_id is None:
             return generate_http_response(404, {"error": "User not found"})
 
-        user_id = response_user["Items"][0]["user_id"]["S"]
-
-        now = datetime.now(timezone.utc).isoformat()
+        now = datetime.now(timezone.utc)
 
-        if not can_register(user_id, sponsor_id):
+        if not register_stamp(user_id, sponsor_id, now, notes):
             return generate_http_response(403, {"error": "User already registered"})
 
-        dynamodb.put_item(
-            TableName=table_name,
-            Item={
-                "PK": {"S": f"USER#{user_id}"},
-                "SK": {"S": f"SPONSOR#{sponsor_id}#{now}"},
-                "created_at": {"S": now},
-            },
-        )
-
         return generate_http_response(
             200, {"message": "Stamp and notes saved successfully"}
         )
 
+    except StampContention as e:
+        print(f"Stamp contention: {e}")
+        return generate_http_response(409, {"error": "The stamp is being registered by another request, try again"})
     except ClientError as e:
         print(f"Error accessing DynamoDB: {e}")
         return generate_http_response(500, {"error": "Error accessing DynamoDB"})
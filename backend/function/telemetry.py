@@ -0,0 +1,161 @@
+import atexit
+import json
+import os
+import signal
+import threading
+import time
+from collections import deque
+
+from clients import LazyClient
+
+# Inicializar cliente de SQS
+sqs = LazyClient("sqs")
+
+# Mensajes pendientes como máximo; si SQS no da abasto se descartan los más viejos
+MAX_BUFFER = int(os.environ.get("TELEMETRY_MAX_BUFFER", "1000"))
+# Intentos por mensaje antes de descartarlo
+MAX_ATTEMPTS = int(os.environ.get("TELEMETRY_MAX_ATTEMPTS", "3"))
+# Tiempo máximo que un handler espera al buffer antes de responder
+RETURN_FLUSH_SECONDS = float(os.environ.get("TELEMETRY_RETURN_FLUSH_SECONDS", "0.1"))
+# Tiempo máximo para vaciar el buffer cuando el entorno se apaga
+SHUTDOWN_FLUSH_SECONDS = float(os.environ.get("TELEMETRY_SHUTDOWN_FLUSH_SECONDS", "0.5"))
+
+# SendMessageBatch acepta hasta 10 mensajes por llamada
+SQS_BATCH_SIZE = 10
+RETRY_BACKOFF_SECONDS = 0.05
+
+
+class TelemetryEmitter:
+    """Ship telemetry messages to SQS from a background thread.
+
+    `emit` only appends to an in-memory buffer, so the send overlaps with
+    the rest of the request. A daemon thread drains the buffer with
+    SendMessageBatch (up to 10 messages per call) and retries failed entries
+    a few times. When SQS cannot keep up, the buffer is bounded and the
+    oldest messages are dropped.
+
+    Lambda freezes the environment as soon as the handler returns and can
+    reclaim it without running atexit handlers, so handlers call
+    `flush(RETURN_FLUSH_SECONDS)` before returning. Whatever is still
+    pending after that bound stays buffered and goes out on the next
+    invocation of the same environment.
+    """
+
+    def __init__(self, queue_url, client=sqs, max_buffer=MAX_BUFFER, max_attempts=MAX_ATTEMPTS):
+        self.queue_url = queue_url
+        self.client = client
+        self.max_buffer = max_buffer
+        self.max_attempts = max_attempts
+        # (body, intentos)
+        self._buffer = deque()
+        self._in_flight = 0
+        self._condition = threading.Condition()
+        self._thread = None
+        self.sent = 0
+        self.dropped = 0
+        self.failed = 0
+
+    def emit(self, message):
+        """Queue a message (any JSON-serializable value) without blocking."""
+        body = json.dumps(message)
+        with self._condition:
+            if len(self._buffer) >= self.max_buffer:
+                self._buffer.popleft()
+                self.dropped += 1
+            self._buffer.append((body, 0))
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="telemetry", daemon=True)
+                self._thread.start()
+            self._condition.notify_all()
+
+    def flush(self, timeout=None):
+        """Wait until every queued message was sent or dropped.
+
+        Returns:
+            bool: False if the timeout expired with messages still pending
+        """
+        with self._condition:
+            return self._condition.wait_for(
+                lambda: not self._buffer and not self._in_flight, timeout
+            )
+
+    def pending(self):
+        with self._condition:
+            return len(self._buffer) + self._in_flight
+
+    def _run(self):
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._buffer)
+                batch = [self._buffer.popleft() for _ in range(min(SQS_BATCH_SIZE, len(self._buffer)))]
+                self._in_flight = len(batch)
+
+            retry = self._send(batch)
+
+            with self._condition:
+                self._in_flight = 0
+                # Los reintentos vuelven al frente para no alterar el orden
+                self._buffer.extendleft(reversed(retry))
+                while len(self._buffer) > self.max_buffer:
+                    self._buffer.popleft()
+                    self.dropped += 1
+                self._condition.notify_all()
+
+            if retry:
+                time.sleep(RETRY_BACKOFF_SECONDS * retry[0][1])
+
+    def _send(self, batch):
+        entries = [{"Id": str(index), "MessageBody": body} for index, (body, _) in enumerate(batch)]
+        try:
+            response = self.client.send_message_batch(QueueUrl=self.queue_url, Entries=entries)
+            failed = {entry["Id"]: entry.get("SenderFault", False) for entry in response.get("Failed", [])}
+        except Exception as e:
+            print(f"Error sending telemetry to SQS: {e}")
+            failed = {entry["Id"]: False for entry in entries}
+
+        retry = []
+        for index, (body, attempts) in enumerate(batch):
+            sender_fault = failed.get(str(index))
+            if sender_fault is None:
+                self.sent += 1
+            elif sender_fault or attempts + 1 >= self.max_attempts:
+                # Los errores del mensaje (tamaño, formato) no se arreglan reintentando
+                self.failed += 1
+            else:
+                retry.append((body, attempts + 1))
+        if len(retry) < len(failed):
+            print(f"Dropped {len(failed) - len(retry)} telemetry messages after failed sends")
+        return retry
+
+
+_emitters = []
+
+
+def get_emitter(queue_url):
+    """Return the shared emitter of a queue, flushed when the environment shuts down."""
+    for emitter in _emitters:
+        if emitter.queue_url == queue_url:
+            return emitter
+    emitter = TelemetryEmitter(queue_url)
+    _emitters.append(emitter)
+    return emitter
+
+
+def flush_all(timeout=SHUTDOWN_FLUSH_SECONDS):
+    for emitter in _emitters:
+        emitter.flush(timeout)
+
+
+def _on_sigterm(signum, frame, previous=signal.getsignal(signal.SIGTERM)):
+    # Lambda solo manda SIGTERM al runtime cuando hay extensiones registradas, y
+    # fuera de Lambda atexit sí corre: es un respaldo del flush antes de responder
+    flush_all()
+    if callable(previous):
+        previous(signum, frame)
+    elif previous != signal.SIG_IGN:
+        raise SystemExit(0)
+
+
+atexit.register(flush_all)
+if threading.current_thread() is threading.main_thread():
+    signal.signal(signal.SIGTERM, _on_sigterm)
@@ -2,18 +2,33 @@ import json
 import os
 import uuid
 
-import boto3
 from botocore.exceptions import ClientError
-from utils import generate_http_response
+from clients import LazyClient
+from instrumentation import instrument
+from models import Profile
+from profile_cache import get_profile, invalidate_profile
+from public_card import card_unlock_key_request
+from rate_limit import RequestLimiter
+from utils import generate_http_response, generate_throttled_response
 
 # Inicializamos el cliente de DynamoDB
-dynamodb = boto3.client("dynamodb")
+dynamodb = LazyClient("dynamodb")
 
 # Definir el nombre de la tabla
 table_name = os.environ.get("DYNAMODB_TABLE_NAME")
-index_name = os.environ.get("INDEX_NAME")
 
+# La llave del perfil y los datos con los que se valida el desbloqueo
+PROFILE_ATTRIBUTES = ("PK", "SK", "contact_information.email", "contact_information.phone")
 
+# Los últimos 6 dígitos del teléfono se adivinan por fuerza bruta: 15 intentos
+# por short_id cada 15 minutos entre todas las instancias. El límite por IP es
+# amplio porque los asistentes activan su perfil desde el WiFi del evento
+limits = RequestLimiter(
+    "activate", ip_rate=20, ip_burst=200, short_id_rate=10 / 900, short_id_burst=5, short_id_window=900
+)
+
+
+@instrument
 def lambda_handler(event, context):
     # Obtener el short_id y el valor desde la solicitud HTTP
     try:
@@ -24,39 +39,47 @@ def lambda_handler(event, context):
     except KeyError:
         return generate_http_response(400, {"error": "short_id and value are required"})
 
+    # Cortamos el tráfico excesivo antes de consultar DynamoDB
+    retry_after = limits.check(event, short_id)
+    if retry_after:
+        return generate_throttled_response(retry_after)
+
     try:
-        # Realizamos el query usando el índice global secundario (GSI)
-        response = dynamodb.query(
-            TableName=table_name,
-            IndexName=index_name,
-            KeyConditionExpression="short_id = :sid",
-            ExpressionAttributeValues={":sid": {"S": short_id}},
-        )
+        # Los escritores siempre leen del GSI para no validar contra datos viejos
+        item = get_profile(short_id, refresh=True, attributes=PROFILE_ATTRIBUTES)
 
         # Revisar si el ítem existe
-        if "Items" not in response or len(response["Items"]) == 0:
+        if item is None:
             return generate_http_response(404, {"error": "short_id not found"})
 
         # Obtener la información de contacto
-        item = response["Items"][0]
-        contact_info = item.get("contact_information", {}).get("M", {})
+        contact_info = Profile.from_item(item).contact_information
 
-        email = contact_info.get("email", {}).get("S")
-        phone = contact_info.get("phone", {}).get("S")
+        email = contact_info.email
+        phone = contact_info.phone
 
         # Validar si el valor corresponde al correo o los últimos 6 dígitos del teléfono
         if value == email or (phone and phone[-6:] == value):
             # Si es válido, generar un UUIDv4 como unlock_key
             unlock_key = str(uuid.uuid4())
 
-            # Guardar el unlock_key en la base de datos, agregándolo al registro del usuario
+            # Guardar el unlock_key en el registro del usuario y en la tarjeta pública
+            # (la necesita para servir la variante completa) en la misma transacción
             try:
-                dynamodb.update_item(
-                    TableName=table_name,
-                    Key={"PK": item["PK"], "SK": item["SK"]},
-                    UpdateExpression="SET unlock_key = :unlock_key",
-                    ExpressionAttributeValues={":unlock_key": {"S": unlock_key}},
+                dynamodb.transact_write_items(
+                    TransactItems=[
+                        {
+                            "Update": {
+                                "TableName": table_name,
+                                "Key": {"PK": item["PK"], "SK": item["SK"]},
+                                "UpdateExpression": "SET unlock_key = :unlock_key",
+                                "ExpressionAttributeValues": {":unlock_key": {"S": unlock_key}},
+                            }
+                        },
+                        card_unlock_key_request(short_id, item["PK"]["S"], unlock_key),
+                    ]
                 )
+                invalidate_profile(short_id)
 
                 # Retornar el unlock_key generado
                 return generate_http_response(200, {"unlock_key": unlock_key})
@@ -1,18 +1,23 @@
 import json
 import os
+from dataclasses import replace
 
-import boto3
 from botocore.exceptions import ClientError
+from clients import LazyClient
+from instrumentation import instrument
+from models import ContactInformation, Profile, SocialLink, serialize
+from profile_cache import get_profile, invalidate_profile
+from public_card import card_put_request
 from utils import generate_http_response
 
 # Inicializamos el cliente de DynamoDB
-dynamodb = boto3.client("dynamodb")
+dynamodb = LazyClient("dynamodb")
 
 # Definir el nombre de la tabla
 table_name = os.environ.get("DYNAMODB_TABLE_NAME")
-index_name = os.environ.get("INDEX_NAME")
 
 
+@instrument
 def lambda_handler(event, context):
     # Parseamos el cuerpo de la solicitud
     try:
@@ -35,61 +40,75 @@ def lambda_handler(event, context):
         return generate_http_response(400, {"error": "Invalid input"})
 
     try:
-        # Realizamos el query usando el índice global secundario (GSI)
-        response = dynamodb.query(
-            TableName=table_name,
-            IndexName=index_name,
-            KeyConditionExpression="short_id = :sid",
-            ExpressionAttributeValues={":sid": {"S": short_id}},
-        )
+        # Los escritores siempre leen del GSI para no validar contra datos viejos
+        item = get_profile(short_id, refresh=True)
 
         # Revisar si el ítem existe
-        if "Items" not in response or len(response["Items"]) == 0:
+        if item is None:
             return generate_http_response(404, {"error": "short_id not found"})
 
-        # Obtener el item de DynamoDB
-        item = response["Items"][0]
-        stored_unlock_key = item.get("unlock_key", {}).get("S")
+        current = Profile.from_item(item)
 
         # Validar el unlock_key recibido
-        if stored_unlock_key != unlock_key:
+        if current.unlock_key != unlock_key:
             return generate_http_response(403, {"error": "Invalid unlock_key"})
 
         # Crear el objeto social_links para DynamoDB
-        social_links_dynamo = []
-        for link in social_links:
-            social_links_dynamo.append(
-                {"M": {"name": {"S": link["name"]}, "url": {"S": link["url"]}}}
-            )
+        social_links = [SocialLink(link["name"], link["url"]) for link in social_links]
+
+        values = {
+            ":email": serialize(email),
+            ":phone": serialize(phone),
+            ":share_email": serialize(share_email),
+            ":share_phone": serialize(share_phone),
+            ":pin": serialize(pin),
+            ":social_links": serialize([{"name": link.name, "url": link.url} for link in social_links]),
+            ":gender": serialize(gender or None),
+            ":profile": serialize(profile or None),
+            ":age_range": serialize(age_range or None),
+            ":area_of_interest": serialize(area_of_interest or None),
+            ":initialized": serialize(True),
+            ":company": serialize(company),
+            ":role": serialize(role),
+        }
+
+        # El perfil como queda después del update, para renderizar su tarjeta pública
+        updated = replace(
+            current,
+            company=company,
+            role=role,
+            pin=pin,
+            gender=gender or "",
+            profile=profile or None,
+            age_range=age_range or None,
+            area_of_interest=area_of_interest or None,
+            unlock_key=None,
+            initialized=True,
+            contact_information=ContactInformation(email, phone, bool(share_email), bool(share_phone)),
+            social_links=social_links,
+        )
 
-        # Actualizamos los datos en DynamoDB, incluyendo las preguntas demográficas
-        dynamodb.update_item(
-            TableName=table_name,
-            Key={"PK": item["PK"], "SK": item["SK"]},
-            UpdateExpression="SET contact_information.email = :email, company = :company, #r = :role, \
+        # Actualizamos los datos en DynamoDB, incluyendo las preguntas demográficas,
+        # y la tarjeta pública en la misma transacción
+        dynamodb.transact_write_items(
+            TransactItems=[
+                {
+                    "Update": {
+                        "TableName": table_name,
+                        "Key": {"PK": item["PK"], "SK": item["SK"]},
+                        "UpdateExpression": "SET contact_information.email = :email, company = :company, #r = :role, \
                              contact_information.phone = :phone, contact_information.share_email = :share_email, \
                              contact_information.share_phone = :share_phone, pin = :pin, social_links = :social_links, \
                              gender = :gender, profile = :profile, age_range = :age_range, area_of_interest = :area_of_interest, \
                              initialized = :initialized REMOVE unlock_key",
-            ExpressionAttributeValues={
-                ":email": {"S": email},
-                ":phone": {"S": phone},
-                ":share_email": {"BOOL": share_email},
-                ":share_phone": {"BOOL": share_phone},
-                ":pin": {"S": pin},
-                ":social_links": {"L": social_links_dynamo},
-                ":gender": {"S": gender} if gender else {"NULL": True},
-                ":profile": {"S": profile} if profile else {"NULL": True},
-                ":age_range": {"S": age_range} if age_range else {"NULL": True},
-                ":area_of_interest": (
-                    {"S": area_of_interest} if area_of_interest else {"NULL": True}
-                ),
-                ":initialized": {"BOOL": True},
-                ":company": {"S": company},
-                ":role": {"S": role},
-            },
-            ExpressionAttributeNames={"#r": "role"},
+                        "ExpressionAttributeValues": values,
+                        "ExpressionAttributeNames": {"#r": "role"},
+                    }
+                },
+                card_put_request(updated),
+            ]
         )
+        invalidate_profile(short_id)
 
         return generate_http_response(200, {"message": "Profile updated successfully"})
 
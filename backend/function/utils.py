@@ -1,4 +1,12 @@
 import json
+import math
+
+CORS_HEADERS = {
+    "Access-Control-Allow-Origin": "*",
+    "Access-Control-Allow-Methods": "GET, POST, OPTIONS",
+    "Access-Control-Allow-Headers": "Content-Type, If-None-Match",
+    "Access-Control-Expose-Headers": "ETag, Retry-After, X-Next-Cursor",
+}
 
 
 def generate_http_response(status_code: int, body: dict) -> dict:
@@ -11,13 +19,56 @@ def generate_http_response(status_code: int, body: dict) -> dict:
     Returns:
         dict: _description_
     """
+    return generate_raw_response(status_code, json.dumps(body))
+
+
+def generate_raw_response(status_code: int, body: str, headers: dict = None) -> dict:
+    """Generate a HTTP response with CORS headers from an already serialized body
+
+    Args:
+        status_code (int): HTTP status code
+        body (str): JSON body, or an empty string (e.g. for 304)
+        headers (dict): Extra headers such as ETag or Cache-Control
+
+    Returns:
+        dict: API Gateway proxy response
+    """
     return {
         "statusCode": status_code,
-        "headers": {
-            "Content-Type": "application/json",
-            "Access-Control-Allow-Origin": "*",
-            "Access-Control-Allow-Methods": "GET, POST, OPTIONS",
-            "Access-Control-Allow-Headers": "Content-Type",
-        },
-        "body": json.dumps(body),
+        "headers": {"Content-Type": "application/json", **CORS_HEADERS, **(headers or {})},
+        "body": body,
     }
+
+
+def generate_throttled_response(retry_after: float) -> dict:
+    """Generate a 429 response telling the client when it may retry
+
+    Args:
+        retry_after (float): Seconds until the rate limit allows the request
+
+    Returns:
+        dict: API Gateway proxy response
+    """
+    return generate_raw_response(
+        429,
+        json.dumps({"error": "Too many requests"}),
+        {"Retry-After": str(max(1, math.ceil(retry_after)))},
+    )
+
+
+def get_header(event: dict, name: str):
+    """Return a request header by name, ignoring its case."""
+    name = name.lower()
+    for key, value in (event.get("headers") or {}).items():
+        if key.lower() == name:
+            return value
+    return None
+
+
+def etag_matches(event: dict, etag: str) -> bool:
+    """Check the If-None-Match header of a request against an ETag."""
+    header = get_header(event, "If-None-Match")
+    if not header:
+        return False
+    tags = [tag.strip().removeprefix("W/") for tag in header.split(",")]
+    return "*" in tags or etag in tags
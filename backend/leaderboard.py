@@ -0,0 +1,57 @@
+"""Leaderboards and sponsor-visit distributions over snapshot columns.
+
+Everything works on the integer columns of a snapshot.Snapshot: counting is
+done by Counter/set over whole memoryviews (C loops) instead of building one
+dict per stamp or per profile.
+"""
+import heapq
+from collections import Counter
+from itertools import repeat
+from operator import add, floordiv, mod, mul
+
+
+def top_k(values, k=10):
+    """Return the indexes of the k largest values, largest first."""
+    return heapq.nlargest(k, range(len(values)), key=values.__getitem__)
+
+
+class SponsorVisits:
+    """Stamp counts of an event grouped by user and by sponsor."""
+
+    def __init__(self, event_snapshot):
+        self.snapshot = event_snapshot
+        users = event_snapshot.stamps.column('user_id')
+        sponsors = event_snapshot.stamps.column('sponsor_id')
+
+        # Filas de sellos por asistente y por sponsor, como en top_sponsors.py
+        self.stamps_per_user = Counter(users)
+        self.stamps_per_sponsor = Counter(sponsors)
+
+        # Visitas distintas (asistente, sponsor) codificadas como un solo entero
+        base = event_snapshot.header['strings']['count']
+        visits = set(map(add, map(mul, users, repeat(base)), sponsors))
+        self.sponsors_per_user = Counter(map(floordiv, visits, repeat(base)))
+        self.reach_per_sponsor = Counter(map(mod, visits, repeat(base)))
+
+        profile_users = event_snapshot.profiles.column('user_id')
+        self.profile_rows = dict(zip(profile_users, range(len(profile_users))))
+
+    def users_with_stamps(self, count):
+        """Return the user codes with exactly `count` stamp rows."""
+        return [user for user, stamps in self.stamps_per_user.items() if stamps == count]
+
+    def sponsor_histogram(self):
+        """Return {number of distinct sponsors: number of users}, including users with 0."""
+        histogram = Counter(self.sponsors_per_user.values())
+        histogram[0] = sum(1 for user in self.profile_rows if user not in self.sponsors_per_user)
+        return dict(sorted(histogram.items()))
+
+    def sponsor_reach(self):
+        """Return (sponsor_id, distinct visitors, stamps) sorted by reach."""
+        return [
+            (self.snapshot.string(sponsor), visitors, self.stamps_per_sponsor[sponsor])
+            for sponsor, visitors in self.reach_per_sponsor.most_common()
+        ]
+
+    def profile_row(self, user):
+        return self.profile_rows.get(user)
@@ -0,0 +1,78 @@
+import heapq
+
+
+class ProfileRecord:
+    """Compact copy of the profile fields used by the reports."""
+
+    __slots__ = ('user_id', 'short_id', 'first_name', 'last_name', 'company', 'role', 'scanned_count', 'completed_passport')
+
+    def __init__(self, user_id, short_id, first_name, last_name, company, role, scanned_count, completed_passport):
+        self.user_id = user_id
+        self.short_id = short_id
+        self.first_name = first_name
+        self.last_name = last_name
+        self.company = company
+        self.role = role
+        self.scanned_count = scanned_count
+        self.completed_passport = completed_passport
+
+    @classmethod
+    def from_item(cls, item):
+        return cls(
+            item.get('user_id') or item['PK'].split('#', 1)[1],
+            item.get('short_id'),
+            item.get('first_name', ''),
+            item.get('last_name', ''),
+            item.get('company', ''),
+            item.get('role', ''),
+            int(item.get('scanned_count', 0)),
+            bool(item.get('completed_passport', False)),
+        )
+
+    @property
+    def full_name(self):
+        return f"{self.first_name} {self.last_name}"
+
+
+class ProfileIndex:
+    """In-memory profile index keyed by user_id and short_id."""
+
+    __slots__ = ('_by_user_id', '_by_short_id')
+
+    def __init__(self, records=()):
+        self._by_user_id = {}
+        self._by_short_id = {}
+        for record in records:
+            self.add(record)
+
+    @classmethod
+    def from_items(cls, items):
+        """Build the index from profile items without keeping the original dicts."""
+        return cls(ProfileRecord.from_item(item) for item in items)
+
+    def add(self, record):
+        self._by_user_id[record.user_id] = record
+        if record.short_id:
+            self._by_short_id[record.short_id] = record
+
+    def __len__(self):
+        return len(self._by_user_id)
+
+    def __iter__(self):
+        return iter(self._by_user_id.values())
+
+    def get(self, user_id):
+        return self._by_user_id.get(user_id)
+
+    def get_by_short_id(self, short_id):
+        return self._by_short_id.get(short_id)
+
+    def get_by_pk(self, pk):
+        """Look up a profile by its USER#<user_id> partition key."""
+        return self._by_user_id.get(pk.split('#', 1)[1])
+
+    def most_scans(self, limit=10):
+        return heapq.nlargest(limit, self._by_user_id.values(), key=lambda record: record.scanned_count)
+
+    def completed_passports(self):
+        return [record for record in self._by_user_id.values() if record.completed_passport]
@@ -0,0 +1,96 @@
+import os
+import queue
+import threading
+
+import boto3
+import simplejson as json
+
+# Cuántas páginas puede tener cada segmento esperando a ser consumidas
+PAGES_PER_SEGMENT = 2
+
+_DONE = object()
+
+
+def _scan_segment(table_name, segment, total_segments, scan_kwargs, pages, stop):
+    try:
+        # Los recursos de boto3 no son thread-safe, cada segmento usa su propia sesión
+        table = boto3.session.Session().resource('dynamodb').Table(table_name)
+        kwargs = dict(scan_kwargs, Segment=segment, TotalSegments=total_segments)
+
+        while not stop.is_set():
+            response = table.scan(**kwargs)
+            pages.put(response['Items'])
+            if 'LastEvaluatedKey' not in response:
+                break
+            kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+        pages.put(_DONE)
+    except Exception as e:
+        pages.put(e)
+
+
+def parallel_scan(table_name, total_segments=4, **scan_kwargs):
+    """Yield the items of a DynamoDB parallel scan as soon as their pages arrive.
+
+    Each segment runs in its own thread and the pages go through a bounded
+    queue, so memory usage does not grow with the size of the table.
+    """
+    pages = queue.Queue(maxsize=total_segments * PAGES_PER_SEGMENT)
+    stop = threading.Event()
+    threads = [
+        threading.Thread(
+            target=_scan_segment,
+            args=(table_name, segment, total_segments, scan_kwargs, pages, stop),
+            daemon=True
+        )
+        for segment in range(total_segments)
+    ]
+    for thread in threads:
+        thread.start()
+
+    pending = total_segments
+    try:
+        while pending:
+            page = pages.get()
+            if page is _DONE:
+                pending -= 1
+            elif isinstance(page, Exception):
+                raise page
+            else:
+                yield from page
+    finally:
+        # Si el consumidor se detiene antes, liberamos a los hilos que esperan en la cola
+        stop.set()
+        while any(thread.is_alive() for thread in threads):
+            try:
+                pages.get(timeout=0.1)
+            except queue.Empty:
+                pass
+
+
+def write_jsonl(items, filename):
+    """Write items as JSON Lines one by one and return how many were written.
+
+    The file is written under a temporary name and renamed at the end, so an
+    interrupted scan never leaves a partial file that looks recent.
+    """
+    count = 0
+    tmp_filename = f'{filename}.tmp'
+    with open(tmp_filename, 'w') as f:
+        for item in items:
+            f.write(json.dumps(item, use_decimal=True))
+            f.write('\n')
+            count += 1
+    os.replace(tmp_filename, filename)
+    return count
+
+
+def read_items(filename):
+    """Yield the items of a JSON Lines file, or of a JSON array for older caches."""
+    with open(filename, 'r') as f:
+        if not filename.endswith('.jsonl'):
+            yield from json.load(f, use_decimal=True)
+            return
+        for line in f:
+            if line.strip():
+                yield json.loads(line, use_decimal=True)
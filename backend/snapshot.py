@@ -0,0 +1,241 @@
+"""Columnar snapshot of profiles and stamps for the offline reports.
+
+Layout of a snapshot file:
+
+    MAGIC | header length (uint32) | header (JSON) | column blocks (8-byte aligned)
+
+Numeric columns are stored as raw little-endian arrays. String columns are
+dictionary encoded: each value is an int32 code into a string table shared by
+the whole file, so the user ids of the profiles and of the stamps get the same
+codes and the tables can be joined with plain integers. Reading a snapshot maps
+the file into memory and exposes every column as a zero-copy memoryview.
+"""
+import argparse
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from datetime import datetime, timedelta
+
+from boto3.dynamodb.conditions import Attr
+
+from leaderboard import top_k
+from scanner import parallel_scan
+
+MAGIC = b'NPSNAP1\n'
+ALIGNMENT = 8
+
+PROFILE_STRING_COLUMNS = ('user_id', 'short_id', 'first_name', 'last_name', 'company', 'role')
+STRING_COLUMNS = {'profiles': PROFILE_STRING_COLUMNS, 'stamps': ('user_id', 'sponsor_id')}
+
+
+class StringTable:
+    def __init__(self):
+        self.codes = {}
+        self.values = []
+
+    def encode(self, value):
+        value = value or ''
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+
+class SnapshotBuilder:
+    """Accumulate profile and stamp rows as compact arrays."""
+
+    def __init__(self):
+        self.strings = StringTable()
+        self.profiles = {name: array('i') for name in PROFILE_STRING_COLUMNS}
+        self.profiles['scanned_count'] = array('i')
+        self.profiles['completed_passport'] = array('B')
+        self.stamps = {'user_id': array('i'), 'sponsor_id': array('i'), 'created_at': array('q')}
+
+    def add_profile(self, item):
+        item = dict(item, user_id=item.get('user_id') or item['PK'].split('#', 1)[1])
+        for name in PROFILE_STRING_COLUMNS:
+            self.profiles[name].append(self.strings.encode(item.get(name)))
+        self.profiles['scanned_count'].append(int(item.get('scanned_count', 0)))
+        self.profiles['completed_passport'].append(1 if item.get('completed_passport') else 0)
+
+    def add_stamp(self, item):
+        # SK = SPONSOR#<sponsor_id>#<timestamp>
+        _, sponsor_id, created_at = item['SK'].split('#', 2)
+        self.stamps['user_id'].append(self.strings.encode(item['PK'].split('#', 1)[1]))
+        self.stamps['sponsor_id'].append(self.strings.encode(sponsor_id))
+        self.stamps['created_at'].append(int(datetime.fromisoformat(created_at).timestamp()))
+
+    def write(self, filename):
+        blob = bytearray()
+        offsets = array('q', [0])
+        for value in self.strings.values:
+            blob += value.encode('utf-8')
+            offsets.append(len(blob))
+
+        blocks = []
+        header = {'byteorder': 'little', 'tables': {}, 'strings': {}}
+
+        def add_block(data):
+            blocks.append(data)
+            return len(blocks) - 1
+
+        header['strings'] = {'offsets': add_block(offsets), 'blob': add_block(bytes(blob)), 'count': len(self.strings.values)}
+        for table_name, columns in (('profiles', self.profiles), ('stamps', self.stamps)):
+            header['tables'][table_name] = {
+                'rows': len(next(iter(columns.values()))),
+                'columns': {
+                    name: {
+                        'typecode': values.typecode,
+                        'block': add_block(values),
+                        'strings': name in STRING_COLUMNS[table_name],
+                    }
+                    for name, values in columns.items()
+                },
+            }
+
+        # Las posiciones dependen del tamaño del header y viceversa, iteramos hasta que no cambie
+        encoded_header = b''
+        while True:
+            position = _align(len(MAGIC) + 4 + len(encoded_header))
+            header['blocks'] = []
+            for data in blocks:
+                size = len(data) * data.itemsize if isinstance(data, array) else len(data)
+                header['blocks'].append([position, size])
+                position = _align(position + size)
+            previous_length = len(encoded_header)
+            encoded_header = json.dumps(header).encode()
+            if _align(len(MAGIC) + 4 + len(encoded_header)) == _align(len(MAGIC) + 4 + previous_length):
+                break
+
+        tmp_filename = f'{filename}.tmp'
+        with open(tmp_filename, 'wb') as f:
+            f.write(MAGIC)
+            f.write(struct.pack('<I', len(encoded_header)))
+            f.write(encoded_header)
+            for data, (position, _) in zip(blocks, header['blocks']):
+                f.write(b'\0' * (position - f.tell()))
+                if isinstance(data, array):
+                    if sys.byteorder != 'little':
+                        data = array(data.typecode, data)
+                        data.byteswap()
+                    data.tofile(f)
+                else:
+                    f.write(data)
+        os.replace(tmp_filename, filename)
+
+
+def _align(position):
+    return (position + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+class Table:
+    def __init__(self, snapshot, spec):
+        self.snapshot = snapshot
+        self.rows = spec['rows']
+        self.spec = spec['columns']
+
+    def __len__(self):
+        return self.rows
+
+    def column(self, name):
+        """Return the raw values (or string codes) of a column as a memoryview."""
+        column = self.spec[name]
+        return self.snapshot.block(column['block']).cast(column['typecode'])
+
+    def value(self, name, row):
+        values = self.column(name)
+        if self.spec[name]['strings']:
+            return self.snapshot.string(values[row])
+        return values[row]
+
+
+class Snapshot:
+    """Memory-mapped snapshot; columns are read lazily straight from the file."""
+
+    def __init__(self, filename):
+        with open(filename, 'rb') as f:
+            self.mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.mmap[:len(MAGIC)] != MAGIC:
+            raise ValueError(f'{filename} is not a snapshot file')
+        (header_length,) = struct.unpack_from('<I', self.mmap, len(MAGIC))
+        start = len(MAGIC) + 4
+        self.header = json.loads(self.mmap[start:start + header_length])
+        if self.header['byteorder'] != sys.byteorder:
+            raise ValueError('Snapshot was written with a different byte order')
+        self.view = memoryview(self.mmap)
+
+        strings = self.header['strings']
+        self.string_offsets = self.block(strings['offsets']).cast('q')
+        self.string_blob = self.block(strings['blob'])
+        self.profiles = Table(self, self.header['tables']['profiles'])
+        self.stamps = Table(self, self.header['tables']['stamps'])
+
+    def block(self, index):
+        position, size = self.header['blocks'][index]
+        return self.view[position:position + size]
+
+    def string(self, code):
+        return str(self.string_blob[self.string_offsets[code]:self.string_offsets[code + 1]], 'utf-8')
+
+    def close(self):
+        for name in ('string_offsets', 'string_blob', 'view'):
+            getattr(self, name).release()
+        try:
+            self.mmap.close()
+        except BufferError:
+            # Todavía hay columnas en uso, el mapa se libera cuando se recolecten
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def get_most_scans(snapshot, limit=10):
+    """Return the profile rows with the highest scanned_count."""
+    return top_k(snapshot.profiles.column('scanned_count'), limit)
+
+
+def get_completed_passport_rows(snapshot):
+    completed = snapshot.profiles.column('completed_passport').tobytes()
+    rows = []
+    row = completed.find(1)
+    while row != -1:
+        rows.append(row)
+        row = completed.find(1, row + 1)
+    return rows
+
+
+def build_snapshot(filename, table_name='communitydaymx24', segments=4):
+    builder = SnapshotBuilder()
+    for item in parallel_scan(table_name, total_segments=segments, FilterExpression=Attr('PK').begins_with('USER#') & Attr('SK').eq('PROFILE')):
+        builder.add_profile(item)
+    for item in parallel_scan(table_name, total_segments=segments, FilterExpression=Attr('PK').begins_with('USER#') & Attr('SK').begins_with('SPONSOR#')):
+        builder.add_stamp(item)
+    builder.write(filename)
+
+
+def get_snapshot(filename='event_snapshot.bin', max_age_hours=24, segments=4):
+    if os.path.exists(filename) and datetime.now() - datetime.fromtimestamp(os.path.getmtime(filename)) < timedelta(hours=max_age_hours):
+        print("Loading snapshot...")
+    else:
+        print("Scanning DynamoDB table...")
+        build_snapshot(filename, segments=segments)
+    return Snapshot(filename)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Build a columnar snapshot of profiles and stamps')
+    parser.add_argument('--output', default='event_snapshot.bin')
+    parser.add_argument('--segments', type=int, default=4)
+    args = parser.parse_args()
+
+    build_snapshot(args.output, segments=args.segments)
+    with Snapshot(args.output) as snapshot:
+        print(f"{len(snapshot.profiles)} profiles, {len(snapshot.stamps)} stamps written to {args.output}")
@@ -0,0 +1,76 @@
+import os
+import sys
+import threading
+
+import pytest
+
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+os.environ.setdefault("AWS_ACCESS_KEY_ID", "testing")
+os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "testing")
+os.environ["DYNAMODB_TABLE_NAME"] = "passport-tests"
+os.environ["INDEX_NAME"] = "ShortIdGSI"
+os.environ["KEYS_INDEX_NAME"] = "ShortIdKeysGSI"
+os.environ["PASSPORT_SPONSORS"] = "4"
+os.environ["INSTRUMENTATION_ENABLED"] = "false"
+
+import boto3
+from moto import mock_aws
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "function"))
+
+TABLE = os.environ["DYNAMODB_TABLE_NAME"]
+
+
+def create_table(client):
+    """Create the table with the keys and indexes of template.yaml."""
+    client.create_table(
+        TableName=TABLE,
+        BillingMode="PAY_PER_REQUEST",
+        AttributeDefinitions=[
+            {"AttributeName": name, "AttributeType": "S"} for name in ("PK", "SK", "short_id")
+        ],
+        KeySchema=[
+            {"AttributeName": "PK", "KeyType": "HASH"},
+            {"AttributeName": "SK", "KeyType": "RANGE"},
+        ],
+        GlobalSecondaryIndexes=[
+            {
+                "IndexName": os.environ["INDEX_NAME"],
+                "KeySchema": [{"AttributeName": "short_id", "KeyType": "HASH"}],
+                "Projection": {"ProjectionType": "ALL"},
+            },
+            {
+                "IndexName": os.environ["KEYS_INDEX_NAME"],
+                "KeySchema": [{"AttributeName": "short_id", "KeyType": "HASH"}],
+                "Projection": {"ProjectionType": "KEYS_ONLY"},
+            },
+        ],
+    )
+
+
+@pytest.fixture
+def table():
+    """Empty table behind moto."""
+    with mock_aws():
+        client = boto3.client("dynamodb")
+        create_table(client)
+        yield client
+
+
+@pytest.fixture
+def serialized_requests(monkeypatch):
+    """Apply each DynamoDB request atomically, as DynamoDB does.
+
+    moto evaluates a transaction's conditions and writes without a lock, so
+    requests sent from several threads could interleave inside one call.
+    """
+    from moto.dynamodb.responses import DynamoHandler
+
+    lock = threading.Lock()
+    call_action = DynamoHandler.call_action
+
+    def serialized(self):
+        with lock:
+            return call_action(self)
+
+    monkeypatch.setattr(DynamoHandler, "call_action", serialized)
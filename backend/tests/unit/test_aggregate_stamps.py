@@ -0,0 +1,236 @@
+import aggregate_stamps
+import pytest
+from botocore.exceptions import ClientError
+from conftest import TABLE
+from models import Lead, deserialize_item, serialize
+
+
+def stamp(user_id, sponsor_id, minute, notes=""):
+    image = {
+        "PK": {"S": f"USER#{user_id}"},
+        "SK": {"S": f"SPONSOR#{sponsor_id}#2024-10-05T10:{minute:02d}:00+00:00"},
+    }
+    if notes:
+        image["notes"] = {"S": notes}
+    return {"eventName": "INSERT", "dynamodb": {"Keys": {key: image[key] for key in ("PK", "SK")}, "NewImage": image}}
+
+
+def profile(user_id, old_scans=None, new_scans=None):
+    """INSERT of a profile, or a MODIFY that moves its scanned_count."""
+    keys = {"PK": {"S": f"USER#{user_id}"}, "SK": {"S": "PROFILE"}}
+    if old_scans is None and new_scans is None:
+        return {"eventName": "INSERT", "dynamodb": {"Keys": keys, "NewImage": dict(keys)}}
+    return {
+        "eventName": "MODIFY",
+        "dynamodb": {
+            "Keys": keys,
+            "OldImage": {**keys, "scanned_count": {"N": str(old_scans)}},
+            "NewImage": {**keys, "scanned_count": {"N": str(new_scans)}},
+        },
+    }
+
+
+def stream(*records):
+    """Number the records like a shard does."""
+    for number, record in enumerate(records, start=1):
+        record["dynamodb"]["SequenceNumber"] = str(10**20 + number)
+    return list(records)
+
+
+def redelivered(records, response):
+    """Records the stream sends again after a response with batchItemFailures."""
+    failures = response["batchItemFailures"]
+    if not failures:
+        return []
+    first = int(failures[0]["itemIdentifier"])
+    return [record for record in records if int(record["dynamodb"]["SequenceNumber"]) >= first]
+
+
+def handle(records):
+    return aggregate_stamps.lambda_handler({"Records": records}, None)
+
+
+def snapshot(table):
+    """Aggregates, passports and leads, without the versions used for optimistic writes.
+
+    Counters at zero (a histogram bucket a user went through) are left out.
+    """
+    items = {}
+    for page in table.get_paginator("scan").paginate(TableName=TABLE):
+        for item in page["Items"]:
+            data = deserialize_item(item)
+            if (
+                data["PK"] == aggregate_stamps.AGGREGATE_PK
+                or data["SK"] in ("PASSPORT", "PROFILE")
+                or data["SK"].startswith(aggregate_stamps.LEAD_PREFIX)
+            ):
+                data.pop("version", None)
+                items[(data["PK"], data["SK"])] = {name: value for name, value in data.items() if value != 0}
+    return items
+
+
+def serialize_item(data):
+    return {name: serialize(value) for name, value in data.items()}
+
+
+def reset(table):
+    """Drop what aggregate_stamps wrote, leaving the bare profiles."""
+    for pk, sk in snapshot(table):
+        key = {"PK": {"S": pk}, "SK": {"S": sk}}
+        if sk == "PROFILE":
+            table.put_item(TableName=TABLE, Item=key)
+        else:
+            table.delete_item(TableName=TABLE, Key=key)
+
+
+@pytest.fixture
+def users(table):
+    for user_id in ("a", "b", "c"):
+        table.put_item(TableName=TABLE, Item={"PK": {"S": f"USER#{user_id}"}, "SK": {"S": "PROFILE"}})
+    return table
+
+
+@pytest.fixture
+def records():
+    return stream(
+        profile("c"),
+        stamp("a", "1", 0),
+        stamp("a", "2", 1),
+        stamp("b", "1", 2, "Interesado"),
+        profile("a", 3, 4),
+        stamp("a", "1", 20),
+        stamp("a", "3", 21),
+        stamp("c", "4", 22),
+        stamp("a", "4", 23),
+        profile("a", 4, 6),
+        profile("b", 0, 2),
+    )
+
+
+class FlakyClient:
+    """Stand-in for the DynamoDB client that fails some transactions."""
+
+    def __init__(self, client, fails):
+        self.client = client
+        self.fails = fails
+        self.transactions = 0
+
+    def transact_write_items(self, **kwargs):
+        self.transactions += 1
+        if self.fails(kwargs["TransactItems"]):
+            raise ClientError(
+                {
+                    "Error": {"Code": "TransactionCanceledException", "Message": "Transaction cancelled"},
+                    "CancellationReasons": [{"Code": "TransactionConflict"}],
+                },
+                "TransactWriteItems",
+            )
+        return self.client.transact_write_items(**kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+
+def writes_passport(user_id):
+    key = {"PK": {"S": f"USER#{user_id}"}, "SK": {"S": "PASSPORT"}}
+    return lambda transact_items: any(item["Update"]["Key"] == key for item in transact_items)
+
+
+def test_batch_builds_rollups_and_counters(users, records):
+    assert handle(records) == {"batchItemFailures": []}
+
+    state = snapshot(users)
+    passport = state[("USER#a", "PASSPORT")]
+    assert passport["sponsors"] == {"1", "2", "3", "4"}
+    assert passport["stamp_count"] == 5
+    assert state[("USER#b", "PASSPORT")]["stamp_count"] == 1
+
+    histogram = state[("AGGREGATE", "HISTOGRAM")]
+    assert histogram == {
+        "PK": "AGGREGATE", "SK": "HISTOGRAM",
+        "users_with_4": 1, "users_with_1": 2, "profiles": 1, "total_scans": 5,
+    }
+    assert state[("AGGREGATE", "SPONSOR_STATS#1")]["stamps"] == 3
+    assert state[("AGGREGATE", "SPONSOR_STATS#1")]["visitors"] == 2
+    assert state[("AGGREGATE", "SPONSOR_STATS#4")]["visitors"] == 2
+    assert state[("AGGREGATE", "COMPLETED")]["users"] == {"a"}
+    assert state[("USER#a", "PROFILE")]["completed_passport"] is True
+    assert state[("AGGREGATE", "TOP_SCANNED")]["leaders"] == {"a": 6, "b": 2}
+
+    lead = Lead.from_item(serialize_item(state[("SPONSOR#1", "LEAD#a")]))
+    assert (lead.stamp_count, lead.first_stamp_at) == (2, "2024-10-05T10:00:00+00:00")
+    assert state[("SPONSOR#1", "LEAD#b")]["notes"] == "Interesado"
+    assert len([key for key in state if key[1].startswith("LEAD#")]) == 6
+
+
+def test_redelivered_batch_adds_nothing(users, records):
+    handle(records)
+    expected = snapshot(users)
+
+    assert handle(records) == {"batchItemFailures": []}
+    assert snapshot(users) == expected
+
+
+def test_overlapping_redeliveries_match_one_batch(users, records):
+    handle(records)
+    expected = snapshot(users)
+    reset(users)
+
+    # Mismo stream en lotes que se traslapan, como después de varios reintentos
+    for start, end in ((0, 4), (2, 8), (1, 6), (5, 11), (0, 11)):
+        assert handle(records[start:end]) == {"batchItemFailures": []}
+    assert snapshot(users) == expected
+
+
+def test_partial_failure_retry_matches_a_clean_run(users, records, monkeypatch):
+    handle(records)
+    expected = snapshot(users)
+    reset(users)
+
+    # Un asistente por transacción: la de "b" falla en todos los intentos
+    monkeypatch.setattr(aggregate_stamps, "MAX_TRANSACTION_ITEMS", 3)
+    monkeypatch.setattr(aggregate_stamps.time, "sleep", lambda seconds: None)
+    flaky = FlakyClient(aggregate_stamps.dynamodb, writes_passport("b"))
+    monkeypatch.setattr(aggregate_stamps, "dynamodb", flaky)
+
+    response = handle(records)
+    assert response["batchItemFailures"] == [{"itemIdentifier": records[3]["dynamodb"]["SequenceNumber"]}]
+    partial = snapshot(users)
+    assert partial[("USER#a", "PASSPORT")]["stamp_count"] == 5
+    assert ("USER#b", "PASSPORT") not in partial
+
+    # El stream reenvía desde el primer registro de "b", con registros de "a" ya aplicados
+    monkeypatch.setattr(aggregate_stamps, "dynamodb", flaky.client)
+    assert handle(redelivered(records, response)) == {"batchItemFailures": []}
+    assert snapshot(users) == expected
+
+
+def test_failure_after_the_transaction_is_retried(users, records, monkeypatch):
+    handle(records)
+    expected = snapshot(users)
+    reset(users)
+
+    mark_completed = aggregate_stamps.mark_completed
+
+    def failing(user_ids):
+        raise ClientError({"Error": {"Code": "ProvisionedThroughputExceededException", "Message": "Slow down"}}, "UpdateItem")
+
+    monkeypatch.setattr(aggregate_stamps, "mark_completed", failing)
+    response = handle(records)
+    assert response["batchItemFailures"] == [{"itemIdentifier": records[1]["dynamodb"]["SequenceNumber"]}]
+    assert "completed_passport" not in snapshot(users)[("USER#a", "PROFILE")]
+
+    monkeypatch.setattr(aggregate_stamps, "mark_completed", mark_completed)
+    assert handle(redelivered(records, response)) == {"batchItemFailures": []}
+    assert snapshot(users) == expected
+
+
+def test_transaction_conflicts_are_retried_in_the_same_invocation(users, records, monkeypatch):
+    monkeypatch.setattr(aggregate_stamps.time, "sleep", lambda seconds: None)
+    conflicts = iter([True, True])
+    flaky = FlakyClient(aggregate_stamps.dynamodb, lambda transact_items: next(conflicts, False))
+    monkeypatch.setattr(aggregate_stamps, "dynamodb", flaky)
+
+    assert handle(records) == {"batchItemFailures": []}
+    assert flaky.transactions == 3
+    assert snapshot(users)[("AGGREGATE", "HISTOGRAM")]["users_with_4"] == 1
@@ -0,0 +1,84 @@
+import attendees
+from conftest import TABLE
+from models import deserialize_item
+
+
+def attendee(barcode, first_name):
+    return {
+        "barcode": barcode, "first_name": first_name, "last_name": "Apellido", "email": f"{barcode}@example.com",
+        "cell_phone": "", "job_title": "", "company": "", "gender": "", "short_id": f"S{barcode}", "initialized": False,
+    }
+
+
+def profile(table, barcode):
+    item = table.get_item(TableName=TABLE, Key={"PK": {"S": f"USER#{barcode}"}, "SK": {"S": "PROFILE"}})
+    return deserialize_item(item["Item"])
+
+
+def test_initialized_profiles_are_skipped(table):
+    table.put_item(
+        TableName=TABLE,
+        Item={"PK": {"S": "USER#B1"}, "SK": {"S": "PROFILE"}, "first_name": {"S": "Elegido"}, "initialized": {"BOOL": True}},
+    )
+    attendees.save_profile(attendee("B2", "Viejo"), TABLE)
+
+    saved, skipped = attendees.save_profiles(
+        [attendee("B1", "Eventbrite"), attendee("B2", "Nuevo"), attendee("B3", "Uno"), attendee("B3", "Otro")], TABLE,
+    )
+
+    assert [data["barcode"] for data in saved] == ["B2", "B3"]
+    assert [data["barcode"] for data in skipped] == ["B1"]
+    assert profile(table, "B1")["first_name"] == "Elegido"
+    assert profile(table, "B2")["first_name"] == "Nuevo"
+    assert profile(table, "B3")["first_name"] == "Otro"
+
+
+def test_profile_initialized_during_the_batch_is_kept(table, monkeypatch):
+    save_profile = attendees.save_profile
+
+    def initialized_first(data, table_name):
+        # El asistente activa su perfil justo antes de que llegue el PutItem del lote
+        if data["barcode"] == "B5":
+            table.put_item(
+                TableName=TABLE,
+                Item={"PK": {"S": "USER#B5"}, "SK": {"S": "PROFILE"}, "first_name": {"S": "Activo"}, "initialized": {"BOOL": True}},
+            )
+        return save_profile(data, table_name)
+
+    monkeypatch.setattr(attendees, "save_profile", initialized_first)
+    saved, skipped = attendees.save_profiles([attendee(f"B{n}", "Eventbrite") for n in range(10)], TABLE)
+
+    assert len(saved) == 9
+    assert [data["barcode"] for data in skipped] == ["B5"]
+    assert profile(table, "B5")["first_name"] == "Activo"
+
+
+def card(table, short_id):
+    item = table.get_item(TableName=TABLE, Key={"PK": {"S": f"CARD#{short_id}"}, "SK": {"S": "CARD"}})
+    return deserialize_item(item["Item"]) if "Item" in item else None
+
+
+def test_taken_short_id_is_salted_again(table):
+    data = attendee("B7", "Nuevo")
+    data["short_id"] = attendees.generate_event_code(data)
+    # Otra importación ya reservó el código y el del primer salt
+    for salt in (0, 1):
+        table.put_item(
+            TableName=TABLE,
+            Item={"PK": {"S": f"CARD#{attendees.generate_event_code(data, salt)}"}, "SK": {"S": "CARD"}, "user_pk": {"S": "USER#OTRO"}},
+        )
+
+    assert attendees.save_profile(data, TABLE)
+
+    assert data["short_id"] == attendees.generate_event_code(data, 2)
+    assert profile(table, "B7")["short_id"] == data["short_id"]
+    assert card(table, data["short_id"])["user_pk"] == "USER#B7"
+
+
+def test_reimported_profile_keeps_its_short_id(table):
+    data = attendee("B8", "Nuevo")
+    assert attendees.save_profile(data, TABLE)
+    assert attendees.save_profile(dict(data, first_name="Otro"), TABLE)
+
+    assert profile(table, "B8")["short_id"] == "SB8"
+    assert card(table, "SB8") == {"PK": "CARD#SB8", "SK": "CARD", "user_pk": "USER#B8", "user_sk": "PROFILE"}
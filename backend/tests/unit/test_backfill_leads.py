@@ -0,0 +1,74 @@
+import os
+import sys
+
+import aggregate_stamps
+from conftest import TABLE
+from models import Lead
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from backfill_leads import group_leads, merge_lead
+
+SPONSOR_ID = "1"
+
+
+def stamp_row(user_id, minute, notes=""):
+    row = {"PK": f"USER#{user_id}", "SK": f"SPONSOR#{SPONSOR_ID}#2024-10-05T10:{minute:02d}:00+00:00"}
+    if notes:
+        row["notes"] = notes
+    return row
+
+
+def stream_record(row):
+    image = {"PK": {"S": row["PK"]}, "SK": {"S": row["SK"]}}
+    if "notes" in row:
+        image["notes"] = {"S": row["notes"]}
+    return {"eventName": "INSERT", "dynamodb": {"Keys": {"PK": image["PK"], "SK": image["SK"]}, "NewImage": image}}
+
+
+def lead(table, user_id):
+    response = table.get_item(
+        TableName=TABLE,
+        Key={"PK": {"S": f"SPONSOR#{SPONSOR_ID}"}, "SK": {"S": f"LEAD#{user_id}"}},
+        ConsistentRead=True,
+    )
+    return Lead.from_item(response["Item"]), response["Item"]
+
+
+def backfill(table, rows):
+    return sum(merge_lead(table, TABLE, *key, *value) for key, value in group_leads(rows).items())
+
+
+def test_backfill_and_stream_count_each_stamp_once(table):
+    old = [stamp_row("a", 0, "Demo"), stamp_row("a", 5)]
+    new = [stamp_row("a", 20, "Precios"), stamp_row("a", 30)]
+
+    # El stream procesa un sello que el scan del backfill también ve
+    aggregate_stamps.lambda_handler({"Records": [stream_record(row) for row in new[:1]]}, None)
+    assert backfill(table, old + new[:1]) == 2
+    aggregate_stamps.lambda_handler({"Records": [stream_record(row) for row in new]}, None)
+
+    result, _ = lead(table, "a")
+    assert (result.stamp_count, result.first_stamp_at) == (4, "2024-10-05T10:00:00+00:00")
+    assert result.notes == "Precios"
+
+    # Repetir el backfill no cambia nada
+    assert backfill(table, old + new) == 0
+    assert lead(table, "a")[0] == result
+
+
+def test_backfill_replaces_counters_of_older_leads(table):
+    table.put_item(
+        TableName=TABLE,
+        Item={
+            "PK": {"S": f"SPONSOR#{SPONSOR_ID}"}, "SK": {"S": "LEAD#b"},
+            "first_stamp_at": {"S": "2024-10-05T10:10:00+00:00"}, "stamp_count": {"N": "1"},
+        },
+    )
+    assert lead(table, "b")[0].stamp_count == 1
+
+    assert backfill(table, [stamp_row("b", 10), stamp_row("b", 40, "Llamar")]) == 2
+
+    result, item = lead(table, "b")
+    assert (result.stamp_count, result.first_stamp_at, result.notes) == (2, "2024-10-05T10:10:00+00:00", "Llamar")
+    assert "stamp_count" not in item and "first_stamp_at" not in item
@@ -0,0 +1,91 @@
+import json
+
+import count_scans
+import pytest
+from clients import RETRY_MAX_SECONDS
+from conftest import TABLE
+from models import deserialize_item
+
+
+def add_profile(table, user_id, **attributes):
+    table.put_item(
+        TableName=TABLE,
+        Item={"PK": {"S": f"USER#{user_id}"}, "SK": {"S": "PROFILE"},
+              **{name: {"N": str(value)} for name, value in attributes.items()}},
+    )
+
+
+def scans(user_id, *devices):
+    records = [
+        {"messageId": f"{user_id}-{device}", "body": json.dumps({"PK": f"USER#{user_id}", "SK": "PROFILE", "device": device})}
+        for device in devices
+    ]
+    return count_scans.lambda_handler({"Records": records}, None)
+
+
+def item(table, user_id, sk):
+    response = table.get_item(TableName=TABLE, Key={"PK": {"S": f"USER#{user_id}"}, "SK": {"S": sk}}, ConsistentRead=True)
+    return deserialize_item(response["Item"])
+
+
+def test_count_from_before_the_sketches_is_kept(table):
+    # Perfil contado con ADD antes de que existieran los ítems SCANS
+    add_profile(table, "a", scanned_count=40)
+
+    assert scans("a", "d1", "d2") == {"batchItemFailures": []}
+    assert item(table, "a", "PROFILE")["scanned_count"] == 42
+    assert item(table, "a", count_scans.SKETCH_SK)["base_count"] == 40
+
+    assert scans("a", "d2", "d3") == {"batchItemFailures": []}
+    assert item(table, "a", "PROFILE")["scanned_count"] == 43
+
+
+def test_profiles_without_a_count_start_at_zero(table):
+    add_profile(table, "b")
+
+    scans("b", *[f"d{n}" for n in range(5)])
+    assert item(table, "b", "PROFILE")["scanned_count"] == 5
+    assert item(table, "b", count_scans.SKETCH_SK)["base_count"] == 0
+
+
+def test_scanned_count_never_decreases(table, monkeypatch):
+    add_profile(table, "c")
+    scans("c", "d1", "d2", "d3")
+
+    # Una estimación menor que la anterior (cambio de rama del HyperLogLog) no resta
+    monkeypatch.setattr(count_scans.HyperLogLog, "count", lambda self: 1)
+    scans("c", "d4")
+    assert item(table, "c", "PROFILE")["scanned_count"] == 3
+
+
+
+class ThrottledTable:
+    """Leaves every key unprocessed for the first calls, like a saturated table."""
+
+    def __init__(self, client, throttled_calls):
+        self.client = client
+        self.throttled_calls = throttled_calls
+
+    def batch_get_item(self, RequestItems):
+        if self.throttled_calls:
+            self.throttled_calls -= 1
+            return {"Responses": {}, "UnprocessedKeys": RequestItems}
+        return self.client.batch_get_item(RequestItems=RequestItems)
+
+
+def test_unprocessed_keys_are_retried_with_backoff(table, monkeypatch):
+    add_profile(table, "d", scanned_count=3)
+    delays = []
+    monkeypatch.setattr(count_scans.time, "sleep", delays.append)
+
+    monkeypatch.setattr(count_scans, "dynamodb", ThrottledTable(table, 2))
+    items = count_scans.batch_get([("USER#d", "PROFILE")], "PK, scanned_count")
+
+    assert [item["scanned_count"]["N"] for item in items] == ["3"]
+    assert len(delays) == 2
+    assert all(0 <= delay <= RETRY_MAX_SECONDS for delay in delays)
+
+    # Sin llaves procesadas en MAX_ATTEMPTS el lote falla y SQS lo vuelve a entregar
+    monkeypatch.setattr(count_scans, "dynamodb", ThrottledTable(table, count_scans.MAX_ATTEMPTS))
+    with pytest.raises(RuntimeError):
+        count_scans.batch_get([("USER#d", "PROFILE")], "PK, scanned_count")
@@ -0,0 +1,27 @@
+import os
+import statistics
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "benchmarks"))
+
+from import_budget import BUDGETS_MS, FORBIDDEN_MODULES, MissingDependency, measure
+
+RUNS = 3
+# Máquinas de CI lentas pueden escalar todos los presupuestos
+SCALE = float(os.environ.get("IMPORT_BUDGET_SCALE", "1.0"))
+
+
+@pytest.mark.parametrize("module", sorted(BUDGETS_MS))
+def test_handler_import_stays_within_budget(module):
+    timings = []
+    try:
+        for _ in range(RUNS):
+            elapsed, loaded = measure(module)
+            timings.append(elapsed)
+    except MissingDependency as e:
+        pytest.skip(str(e))
+
+    assert not [name for name in FORBIDDEN_MODULES if name in loaded]
+    assert statistics.median(timings) <= BUDGETS_MS[module] * SCALE
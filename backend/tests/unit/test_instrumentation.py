@@ -0,0 +1,55 @@
+import json
+
+import boto3
+import instrumentation
+import pytest
+from botocore.config import Config
+from botocore.exceptions import EndpointConnectionError
+from conftest import TABLE
+
+
+@pytest.fixture
+def enabled(monkeypatch):
+    # La suite corre con INSTRUMENTATION_ENABLED=false; aquí se prende el módulo
+    monkeypatch.setattr(instrumentation, "INSTRUMENTATION_ENABLED", True)
+
+
+def records(capsys):
+    return [json.loads(line) for line in capsys.readouterr().out.splitlines() if line.startswith("{")]
+
+
+def test_calls_are_recorded(table, enabled, capsys):
+    client = boto3.client("dynamodb")
+    instrumentation.register_client(client)
+
+    @instrumentation.instrument
+    def handler(event, context):
+        client.get_item(TableName=TABLE, Key={"PK": {"S": "USER#a"}, "SK": {"S": "PROFILE"}})
+        return {"statusCode": 200, "body": "{}"}
+
+    handler({}, None)
+    (record,) = records(capsys)
+    assert record["DynamoDBCalls"] == 1
+    assert record["AwsErrors"] == 0
+    assert record["calls"]["dynamodb.GetItem"]["count"] == 1
+
+
+def test_connection_errors_are_recorded_and_raised(enabled, capsys):
+    client = boto3.client("dynamodb", config=Config(retries={"max_attempts": 1, "mode": "standard"}))
+    instrumentation.register_client(client)
+
+    def unreachable(request, **kwargs):
+        raise EndpointConnectionError(endpoint_url=request.url)
+
+    client.meta.events.register("before-send.dynamodb.*", unreachable)
+
+    @instrumentation.instrument
+    def handler(event, context):
+        client.get_item(TableName=TABLE, Key={"PK": {"S": "USER#a"}, "SK": {"S": "PROFILE"}})
+
+    with pytest.raises(EndpointConnectionError):
+        handler({}, None)
+    (record,) = records(capsys)
+    assert record["DynamoDBCalls"] == 1
+    assert record["AwsErrors"] == 1
+    assert record["calls"]["dynamodb.GetItem"]["errors"] == 1
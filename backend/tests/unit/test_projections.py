@@ -0,0 +1,95 @@
+import json
+from datetime import datetime, timedelta, timezone
+
+import batch_stamp_passport
+import check_existence
+import get_passport_status
+import profile_cache
+import pytest
+import rate_limit
+import stamp_passport
+import unlock_activation
+from conftest import TABLE, create_table
+from create_sponsor_jwt import jwt
+from models import serialize
+
+SPONSOR_ID = "1"
+PROFILES = 12
+# Mismo momento en las dos vueltas, dentro de la ventana offline del lote
+SCANNED_AT = (datetime.now(timezone.utc) - timedelta(hours=1)).isoformat()
+
+
+def make_profile(n):
+    profile = {
+        "PK": f"USER#{n:025d}",
+        "SK": "PROFILE",
+        "user_id": f"{n:025d}",
+        "short_id": f"S{n:06d}",
+        "first_name": f"Nombre {n}",
+        "last_name": f"Apellido {n}",
+        "company": "AWS Community",
+        "initialized": n % 3 != 0,
+        "contact_information": {"email": f"user{n}@example.com", "share_email": n % 4 != 0, "share_phone": n % 2 == 0},
+        "social_links": [{"name": "github", "url": f"https://example.com/{n}"}],
+        "pin": "1234",
+        "unlock_key": f"KEY{n}",
+    }
+    # Perfiles sin teléfono o sin rol, para cubrir las ramas de las respuestas
+    if n % 2:
+        profile["contact_information"]["phone"] = f"55{n:08d}"
+    if n % 5:
+        profile["role"] = "Cloud Engineer"
+    return {key: serialize(value) for key, value in profile.items()}
+
+
+def event(query=None, body=None):
+    return {"queryStringParameters": query, "body": json.dumps(body) if body is not None else None, "headers": {}}
+
+
+def responses(client):
+    """Call every short_id handler on a freshly seeded table."""
+    client.delete_table(TableName=TABLE)
+    create_table(client)
+    for n in range(PROFILES):
+        client.put_item(TableName=TABLE, Item=make_profile(n))
+    profile_cache.clear_cache()
+
+    token = jwt(SPONSOR_ID, "Sponsor", stamp_passport.SECRET_KEY)
+    short_ids = [f"S{n:06d}" for n in range(PROFILES)] + ["MISSING"]
+    results = []
+    for _ in range(2):
+        # La segunda vuelta pasa por el cache ya caliente
+        for short_id in short_ids:
+            results.append(check_existence.lambda_handler(event({"short_id": short_id}), None))
+            results.append(get_passport_status.lambda_handler(event({"short_id": short_id}), None))
+            results.append(unlock_activation.lambda_handler(event({"short_id": short_id, "value": "wrong"}), None))
+    for short_id in short_ids[::2]:
+        results.append(stamp_passport.lambda_handler(event(body={"short_id": short_id, "jwt": token}), None))
+    stamps = [{"short_id": short_id, "scanned_at": SCANNED_AT} for short_id in short_ids[1::2]]
+    results.append(batch_stamp_passport.lambda_handler(event(body={"jwt": token, "stamps": stamps}), None))
+    return [(response["statusCode"], response["body"]) for response in results]
+
+
+@pytest.fixture
+def queries(monkeypatch):
+    """Record the attributes each short_id query asks for."""
+    calls = []
+    query_short_id = profile_cache._query_short_id
+
+    def recording(short_id, attributes=None, index=None):
+        calls.append((attributes, index))
+        return query_short_id(short_id, attributes, index)
+
+    monkeypatch.setattr(profile_cache, "_query_short_id", recording)
+    return calls
+
+
+def test_projected_reads_answer_like_full_items(table, queries, monkeypatch):
+    # Las dos vueltas repiten las mismas llamadas; aquí no se mide el rate limit
+    monkeypatch.setattr(rate_limit, "RATE_LIMIT_ENABLED", False)
+    projected = responses(table)
+    assert queries and all(attributes or index for attributes, index in queries)
+
+    query_short_id = profile_cache._query_short_id
+    monkeypatch.setattr(profile_cache, "_query_short_id", lambda short_id, attributes=None, index=None: query_short_id(short_id))
+    assert responses(table) == projected
@@ -0,0 +1,67 @@
+import json
+
+import create_sponsor_jwt
+import pytest
+import sponsor_auth
+from conftest import TABLE
+from create_sponsor_jwt import jwt
+from sponsor_auth import SECRET_KEY, verify_sponsor_jwt
+
+SPONSOR_ID = "7"
+
+
+def set_key(table, key):
+    table.put_item(
+        TableName=TABLE,
+        Item={
+            "PK": {"S": f"SPONSOR#{SPONSOR_ID}"},
+            "SK": {"S": "PROFILE"},
+            "sponsor_id": {"S": SPONSOR_ID},
+            "sponsor_name": {"S": "Sponsor"},
+            "key": {"S": key},
+        },
+    )
+
+
+def login(key):
+    event = {"body": json.dumps({"sponsor_id": SPONSOR_ID, "sponsor_key": key})}
+    response = create_sponsor_jwt.lambda_handler(event, None)
+    return response["statusCode"], json.loads(response["body"]).get("token")
+
+
+@pytest.fixture
+def sponsor(table):
+    sponsor_auth.clear_cache()
+    set_key(table, "vieja")
+    yield table
+    sponsor_auth.clear_cache()
+
+
+def test_rotated_key_revokes_tokens_after_the_cache_ttl(sponsor, monkeypatch):
+    _, token = login("vieja")
+    assert verify_sponsor_jwt(token, SECRET_KEY)["sponsor_id"] == SPONSOR_ID
+
+    set_key(sponsor, "nueva")
+    # Dentro del TTL el perfil en cache todavía tiene la llave anterior
+    assert verify_sponsor_jwt(token, SECRET_KEY) is not None
+    assert login("vieja")[0] == 200
+
+    monkeypatch.setattr(sponsor_auth, "SPONSOR_CACHE_TTL_SECONDS", 0)
+    assert verify_sponsor_jwt(token, SECRET_KEY) is None
+    assert login("vieja")[0] == 403
+
+
+def test_token_from_a_newer_key_is_accepted_with_a_stale_cache(sponsor):
+    _, old_token = login("vieja")
+    verify_sponsor_jwt(old_token, SECRET_KEY)
+
+    set_key(sponsor, "nueva")
+    status, token = login("nueva")
+
+    assert status == 200
+    assert verify_sponsor_jwt(token, SECRET_KEY)["sponsor_id"] == SPONSOR_ID
+    assert verify_sponsor_jwt(old_token, SECRET_KEY) is None
+
+
+def test_tokens_without_key_version_are_accepted_until_they_expire(sponsor):
+    assert verify_sponsor_jwt(jwt(SPONSOR_ID, "Sponsor", SECRET_KEY), SECRET_KEY)["sponsor_id"] == SPONSOR_ID
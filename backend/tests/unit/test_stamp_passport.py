@@ -0,0 +1,231 @@
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+import batch_stamp_passport
+import pytest
+import stamp_passport
+from botocore.exceptions import ClientError
+from conftest import TABLE
+from create_sponsor_jwt import jwt
+from sponsor_auth import SECRET_KEY
+
+USER_ID = "0000000000000000000000001"
+SHORT_ID = "ABC123"
+SPONSOR_ID = "7"
+WORKERS = 16
+
+
+@pytest.fixture
+def profile(table):
+    table.put_item(
+        TableName=TABLE,
+        Item={
+            "PK": {"S": f"USER#{USER_ID}"},
+            "SK": {"S": "PROFILE"},
+            "short_id": {"S": SHORT_ID},
+            "initialized": {"BOOL": True},
+        },
+    )
+    return table
+
+
+def stamp_times(table, sponsor_id=SPONSOR_ID):
+    response = table.query(
+        TableName=TABLE,
+        KeyConditionExpression="PK = :pk AND begins_with(SK, :prefix)",
+        ExpressionAttributeValues={
+            ":pk": {"S": f"USER#{USER_ID}"},
+            ":prefix": {"S": f"SPONSOR#{sponsor_id}#"},
+        },
+        ConsistentRead=True,
+    )
+    return sorted(datetime.fromisoformat(item["created_at"]["S"]) for item in response["Items"])
+
+
+def in_parallel(*calls):
+    """Run the calls at the same time and return their results in order."""
+    barrier = threading.Barrier(len(calls))
+
+    def run(call):
+        barrier.wait()
+        return call()
+
+    with ThreadPoolExecutor(max_workers=len(calls)) as executor:
+        return list(executor.map(run, calls))
+
+
+def batch_request(*scanned_at):
+    event = {
+        "body": json.dumps({
+            "jwt": jwt(SPONSOR_ID, "Sponsor", SECRET_KEY),
+            "stamps": [{"short_id": SHORT_ID, "scanned_at": value.isoformat()} for value in scanned_at],
+        })
+    }
+    response = batch_stamp_passport.lambda_handler(event, None)
+    assert response["statusCode"] == 200, response
+    return [result["status"] for result in json.loads(response["body"])["results"]]
+
+
+def test_parallel_stamps_land_once_per_window(table, serialized_requests):
+    now = datetime.now(timezone.utc)
+
+    first = in_parallel(*[
+        lambda offset=offset: stamp_passport.register_stamp(USER_ID, SPONSOR_ID, now + timedelta(seconds=offset))
+        for offset in range(WORKERS)
+    ])
+    assert first.count(True) == 1
+
+    later = now + stamp_passport.STAMP_WINDOW + timedelta(minutes=1)
+    second = in_parallel(*[
+        lambda offset=offset: stamp_passport.register_stamp(USER_ID, SPONSOR_ID, later + timedelta(seconds=offset))
+        for offset in range(WORKERS)
+    ])
+    assert second.count(True) == 1
+
+    times = stamp_times(table)
+    assert len(times) == 2
+    assert times[1] - times[0] >= stamp_passport.STAMP_WINDOW
+
+
+def test_window_is_per_sponsor(table):
+    now = datetime.now(timezone.utc)
+    assert stamp_passport.register_stamp(USER_ID, SPONSOR_ID, now)
+    assert stamp_passport.register_stamp(USER_ID, "8", now)
+    assert not stamp_passport.register_stamp(USER_ID, SPONSOR_ID, now + timedelta(minutes=9))
+
+
+def test_stamps_without_last_stamp_item_are_enforced(table):
+    # Sello escrito antes de que existieran los ítems LAST_STAMP#
+    now = datetime.now(timezone.utc)
+    table.put_item(TableName=TABLE, Item=stamp_passport.stamp_item(USER_ID, SPONSOR_ID, now - timedelta(minutes=5)))
+
+    assert not stamp_passport.register_stamp(USER_ID, SPONSOR_ID, now)
+    assert stamp_passport.register_stamp(USER_ID, SPONSOR_ID, now + timedelta(minutes=6))
+    assert len(stamp_times(table)) == 2
+
+
+def test_batch_moves_last_stamp_in_the_same_transaction(profile):
+    now = datetime.now(timezone.utc)
+    statuses = batch_request(now - timedelta(minutes=40), now - timedelta(minutes=35), now - timedelta(minutes=20))
+    assert statuses == ["stamped", "duplicate", "stamped"]
+
+    created_at, version = stamp_passport.get_last_stamp(USER_ID, SPONSOR_ID)
+    assert created_at == now - timedelta(minutes=20)
+    assert version == 1
+
+    assert not stamp_passport.register_stamp(USER_ID, SPONSOR_ID, now - timedelta(minutes=15))
+    assert stamp_passport.register_stamp(USER_ID, SPONSOR_ID, now)
+    # Un sello offline viejo no mueve el "último sello" hacia atrás
+    assert batch_request(now - timedelta(hours=2)) == ["stamped"]
+    assert stamp_passport.get_last_stamp(USER_ID, SPONSOR_ID) == (now, 3)
+
+
+def test_batch_accepts_last_stamp_items_without_version(profile):
+    now = datetime.now(timezone.utc)
+    profile.put_item(
+        TableName=TABLE,
+        Item={
+            **stamp_passport.last_stamp_key(USER_ID, SPONSOR_ID),
+            "created_at": {"S": (now - timedelta(hours=1)).isoformat()},
+        },
+    )
+    assert batch_request(now - timedelta(minutes=30)) == ["stamped"]
+    assert stamp_passport.get_last_stamp(USER_ID, SPONSOR_ID) == (now - timedelta(minutes=30), 1)
+
+
+def test_batch_and_live_stamps_race(profile, serialized_requests):
+    for minutes in (0, 30, 60, 90):
+        now = datetime.now(timezone.utc) + timedelta(minutes=minutes)
+        scanned_at = now - timedelta(minutes=3)
+        live, batch = in_parallel(
+            lambda: stamp_passport.register_stamp(USER_ID, SPONSOR_ID, now),
+            lambda: batch_stamp_passport.stamp_user(USER_ID, SPONSOR_ID, [(scanned_at, 0, "")])[0],
+        )
+        assert [live, batch].count(True) + [live, batch].count("stamped") == 1, (live, batch)
+
+    times = stamp_times(profile)
+    assert len(times) == 4
+    assert all(later - earlier >= stamp_passport.STAMP_WINDOW for earlier, later in zip(times, times[1:]))
+
+
+def stamp_request(**body):
+    event = {"body": json.dumps({"short_id": SHORT_ID, "jwt": jwt(SPONSOR_ID, "Sponsor", SECRET_KEY), **body})}
+    return stamp_passport.lambda_handler(event, None)
+
+
+@pytest.mark.parametrize("notes", [5, ["a"], {"text": "a"}, "x" * (stamp_passport.MAX_NOTES_LENGTH + 1)])
+def test_invalid_notes_are_rejected(profile, notes):
+    response = stamp_request(notes=notes)
+    assert response["statusCode"] == 400
+    assert stamp_times(profile) == []
+
+
+def test_contention_answers_409(profile, monkeypatch):
+    conflict = ClientError(
+        {
+            "Error": {"Code": "TransactionCanceledException", "Message": "Transaction cancelled"},
+            "CancellationReasons": [{"Code": "TransactionConflict"}, {"Code": "None"}],
+        },
+        "TransactWriteItems",
+    )
+
+    def conflicting(*args, **kwargs):
+        raise conflict
+
+    monkeypatch.setattr(stamp_passport, "write_stamps", conflicting)
+    response = stamp_request(notes="Interesado")
+    assert response["statusCode"] == 409
+
+    monkeypatch.undo()
+    assert stamp_request(notes="Interesado")["statusCode"] == 200
+
+
+def test_batch_rejects_backdated_scans_and_bad_notes(profile):
+    now = datetime.now(timezone.utc)
+    event = {
+        "body": json.dumps({
+            "jwt": jwt(SPONSOR_ID, "Sponsor", SECRET_KEY),
+            "stamps": [
+                {"short_id": SHORT_ID, "scanned_at": "1970-01-01T00:00:00Z"},
+                {"short_id": SHORT_ID, "scanned_at": (now - batch_stamp_passport.MAX_OFFLINE_AGE - timedelta(minutes=1)).isoformat()},
+                {"short_id": SHORT_ID, "scanned_at": now.isoformat(), "notes": 5},
+                {"short_id": SHORT_ID, "scanned_at": now.isoformat(), "notes": "Demo"},
+            ],
+        })
+    }
+    response = batch_stamp_passport.lambda_handler(event, None)
+    statuses = [result["status"] for result in json.loads(response["body"])["results"]]
+    assert statuses == ["invalid", "invalid", "invalid", "stamped"]
+
+
+def test_batch_reports_failures_per_attendee(profile, monkeypatch):
+    profile.put_item(
+        TableName=TABLE,
+        Item={"PK": {"S": "USER#other"}, "SK": {"S": "PROFILE"}, "short_id": {"S": "OTHER1"}, "initialized": {"BOOL": True}},
+    )
+    write_stamps = batch_stamp_passport.write_stamps
+
+    def throttled_for_user(user_id, *args, **kwargs):
+        if user_id == USER_ID:
+            raise ClientError(
+                {"Error": {"Code": "ProvisionedThroughputExceededException", "Message": "Slow down"}},
+                "TransactWriteItems",
+            )
+        return write_stamps(user_id, *args, **kwargs)
+
+    monkeypatch.setattr(batch_stamp_passport, "write_stamps", throttled_for_user)
+    now = datetime.now(timezone.utc)
+    event = {
+        "body": json.dumps({
+            "jwt": jwt(SPONSOR_ID, "Sponsor", SECRET_KEY),
+            "stamps": [
+                {"short_id": "OTHER1", "scanned_at": now.isoformat()},
+                {"short_id": SHORT_ID, "scanned_at": now.isoformat()},
+            ],
+        })
+    }
+    response = batch_stamp_passport.lambda_handler(event, None)
+    assert response["statusCode"] == 200
+    assert [result["status"] for result in json.loads(response["body"])["results"]] == ["stamped", "error"]
@@ -0,0 +1,66 @@
+import threading
+import time
+
+import get_information
+import pytest
+import rate_limit
+import telemetry
+from models import Profile, serialize
+from public_card import PublicCard, render_card
+from sketches import WindowedBloomFilter
+
+
+class SlowSQS:
+    def __init__(self, latency):
+        self.latency = latency
+        self.messages = 0
+        self.lock = threading.Lock()
+
+    def send_message_batch(self, QueueUrl, Entries):
+        time.sleep(self.latency)
+        with self.lock:
+            self.messages += len(Entries)
+        return {"Successful": [{"Id": entry["Id"]} for entry in Entries], "Failed": []}
+
+
+@pytest.fixture
+def handler(monkeypatch):
+    item = {key: serialize(value) for key, value in {
+        "PK": "USER#0000000000000000000000001", "SK": "PROFILE", "user_id": "0000000000000000000000001",
+        "short_id": "ABC1234", "first_name": "Nombre", "last_name": "Apellido", "initialized": True,
+        "contact_information": {"email": "user@example.com", "share_email": True, "share_phone": False},
+    }.items()}
+    card = PublicCard.from_item(render_card(Profile.from_item(item)))
+    monkeypatch.setattr(get_information, "get_card", lambda short_id: card)
+    monkeypatch.setattr(get_information, "recent_scans", WindowedBloomFilter(100, 1e-9))
+    monkeypatch.setattr(rate_limit, "RATE_LIMIT_ENABLED", False)
+
+    def scan(device):
+        event = {"queryStringParameters": {"short_id": "ABC1234", "device": device}, "headers": {}}
+        response = get_information.lambda_handler(event, None)
+        assert response["statusCode"] == 200
+    return scan
+
+
+def test_scan_is_sent_before_the_handler_returns(handler, monkeypatch):
+    client = SlowSQS(0.02)
+    monkeypatch.setattr(get_information, "scans", telemetry.TelemetryEmitter("scans", client=client))
+
+    for n in range(3):
+        handler(f"device-{n}")
+        # Después de responder Lambda congela el entorno: el mensaje ya debe haber salido
+        assert client.messages == n + 1
+
+
+def test_slow_sqs_delays_the_response_at_most_the_flush_bound(handler, monkeypatch):
+    client = SlowSQS(1)
+    emitter = telemetry.TelemetryEmitter("scans", client=client)
+    monkeypatch.setattr(get_information, "scans", emitter)
+    monkeypatch.setattr(get_information, "RETURN_FLUSH_SECONDS", 0.05)
+
+    start = time.perf_counter()
+    handler("device-1")
+    assert time.perf_counter() - start < 0.5
+    assert emitter.pending() == 1
+    assert emitter.flush(timeout=5)
+    assert client.messages == 1
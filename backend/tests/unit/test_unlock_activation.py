@@ -0,0 +1,61 @@
+import json
+
+import profile_cache
+import pytest
+import rate_limit
+import unlock_activation
+from conftest import TABLE
+from models import deserialize_item, serialize
+
+PROFILE = {
+    "PK": "USER#B1",
+    "SK": "PROFILE",
+    "user_id": "B1",
+    "short_id": "ABC123",
+    "first_name": "Nombre",
+    "last_name": "Apellido",
+    "initialized": False,
+    "contact_information": {"email": "b1@example.com", "phone": "5512345678"},
+}
+
+
+@pytest.fixture
+def profile(table, monkeypatch):
+    monkeypatch.setattr(rate_limit, "RATE_LIMIT_ENABLED", False)
+    profile_cache.clear_cache()
+    table.put_item(TableName=TABLE, Item={key: serialize(value) for key, value in PROFILE.items()})
+    return table
+
+
+def item(table, pk, sk):
+    response = table.get_item(TableName=TABLE, Key={"PK": {"S": pk}, "SK": {"S": sk}})
+    return deserialize_item(response["Item"]) if "Item" in response else None
+
+
+def activate(value):
+    return unlock_activation.lambda_handler({"queryStringParameters": {"short_id": "ABC123", "value": value}}, None)
+
+
+def test_unlock_key_is_written_to_the_profile_and_the_card(profile):
+    response = activate("345678")
+
+    assert response["statusCode"] == 200
+    unlock_key = json.loads(response["body"])["unlock_key"]
+    assert item(profile, "USER#B1", "PROFILE")["unlock_key"] == unlock_key
+    assert item(profile, "CARD#ABC123", "CARD") == {
+        "PK": "CARD#ABC123", "SK": "CARD", "user_pk": "USER#B1", "user_sk": "PROFILE", "unlock_key": unlock_key,
+    }
+
+
+def test_profile_keeps_its_unlock_key_when_the_card_write_fails(profile):
+    # Otro perfil es dueño de la tarjeta: la transacción completa se cancela
+    profile.put_item(
+        TableName=TABLE,
+        Item={"PK": {"S": "CARD#ABC123"}, "SK": {"S": "CARD"}, "user_pk": {"S": "USER#OTRO"}},
+    )
+
+    response = activate("b1@example.com")
+
+    assert response["statusCode"] == 500
+    assert "unlock_key" not in item(profile, "USER#B1", "PROFILE")
+    assert "unlock_key" not in item(profile, "CARD#ABC123", "CARD")
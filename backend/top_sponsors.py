@@ -1,29 +1,24 @@
+import argparse
 import boto3
 from boto3.dynamodb.conditions import Key, Attr
 import json
 import os
 from datetime import datetime, timedelta
 from collections import defaultdict
+from aggregates import get_table, load_aggregates, get_sponsor_histogram, get_sponsor_stats, get_completed_users, get_profiles
+from scanner import parallel_scan, write_jsonl, read_items
+from analytics import get_profile_index
+from leaderboard import SponsorVisits
+import snapshot
 
-def scan_dynamo_table():
-    dynamodb = boto3.resource('dynamodb')
+def scan_dynamo_table(segments=4):
     table_name = 'communitydaymx24'
-    table = dynamodb.Table(table_name)
 
-    items = []
-    response = table.scan(
+    return parallel_scan(
+        table_name,
+        total_segments=segments,
         FilterExpression=Attr('PK').begins_with('USER#') & Attr('SK').begins_with('SPONSOR#')
     )
-    items.extend(response['Items'])
-
-    while 'LastEvaluatedKey' in response:
-        response = table.scan(
-            FilterExpression=Attr('PK').begins_with('USER#') & Attr('SK').begins_with('SPONSOR#'),
-            ExclusiveStartKey=response['LastEvaluatedKey']
-        )
-        items.extend(response['Items'])
-
-    return items
 
 def save_to_file(data, filename):
     with open(filename, 'w') as f:
@@ -39,14 +34,13 @@ def is_file_recent(filename, max_age_hours=24):
     file_time = datetime.fromtimestamp(os.path.getmtime(filename))
     return datetime.now() - file_time < timedelta(hours=max_age_hours)
 
-def get_users_with_four_sponsors(filename='user_sponsors.json', max_age_hours=24):
+def get_users_with_four_sponsors(filename='user_sponsors.jsonl', max_age_hours=24, segments=4):
     if is_file_recent(filename, max_age_hours):
         print("Loading data from file...")
-        items = load_from_file(filename)
     else:
         print("Scanning DynamoDB table...")
-        items = scan_dynamo_table()
-        save_to_file(items, filename)
+        write_jsonl(scan_dynamo_table(segments), filename)
+    items = read_items(filename)
 
     # Group sponsors by user
     user_sponsors = defaultdict(list)
@@ -62,19 +56,74 @@ def get_users_with_four_sponsors(filename='user_sponsors.json', max_age_hours=24
 
     return users_with_four_sponsors
 
-# Usage
-users_with_four_sponsors = get_users_with_four_sponsors()
-print(f"Total users with exactly 4 sponsors: {len(users_with_four_sponsors)}")
+def print_report_from_scan(segments=4):
+    users_with_four_sponsors = get_users_with_four_sponsors(segments=segments)
+    print(f"Total users with exactly 4 sponsors: {len(users_with_four_sponsors)}")
+
+    profile_index = get_profile_index(segments=segments)
+
+    # Process and print details of users with 4 sponsors
+    for user, sponsors in users_with_four_sponsors.items():
+        profile = profile_index.get_by_pk(user)
+        if profile:
+            print(profile.full_name)
+
+def print_report_from_snapshot(segments=4):
+    with snapshot.get_snapshot(segments=segments) as event_snapshot:
+        visits = SponsorVisits(event_snapshot)
+        profiles = event_snapshot.profiles
+
+        users_with_four_sponsors = visits.users_with_stamps(4)
+        print(f"Total users with exactly 4 sponsors: {len(users_with_four_sponsors)}")
+
+        for user in users_with_four_sponsors:
+            row = visits.profile_row(user)
+            if row is not None:
+                print(f"{profiles.value('first_name', row)} {profiles.value('last_name', row)}")
 
-profiles_filename = 'user_profiles.json'
+        print("Users by number of sponsors:")
+        for sponsors, users in visits.sponsor_histogram().items():
+            print(f"\t{sponsors} sponsors: {users} users")
 
-with open(profiles_filename, 'r') as f:
-    user_profiles = json.load(f)
+        print("Sponsors:")
+        for sponsor_id, visitors, stamps in visits.sponsor_reach():
+            print(f"\tSponsor {sponsor_id} - {visitors} visitors, {stamps} stamps")
 
-# Process and print details of users with 4 sponsors
-for user, sponsors in users_with_four_sponsors.items():
-    user_id = user.split('#')[1]
-    profile = next((profile for profile in user_profiles if profile['user_id'] == user_id), None)
-    if profile:
+def print_report_from_aggregates():
+    table = get_table()
+    aggregates = load_aggregates(table)
+
+    histogram, complete = get_sponsor_histogram(aggregates)
+    print("Users by number of sponsors:")
+    for sponsors, users in histogram.items():
+        print(f"\t{sponsors} sponsors: {users} users")
+    if not complete:
+        print("\t(incomplete: the stream did not count every profile, run with --full-scan for the 0 sponsors bucket)")
+
+    print("Sponsors:")
+    for sponsor_id, stats in sorted(get_sponsor_stats(aggregates).items(), key=lambda s: s[1]['visitors'], reverse=True):
+        print(f"\tSponsor {sponsor_id} - {stats['visitors']} visitors, {stats['stamps']} stamps")
+
+    completed_users = get_completed_users(aggregates)
+    print(f"Total users with completed passport: {len(completed_users)}")
+
+    for profile in get_profiles(table, completed_users).values():
         print(f"{profile['first_name']} {profile['last_name']}")
-        
\ No newline at end of file
+
+# Usage
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Sponsor passport report')
+    parser.add_argument('--full-scan', action='store_true', help='Scan the whole table (default)')
+    parser.add_argument('--aggregates', action='store_true', help='Read the AGGREGATE items kept by the table stream; they only include changes made after the stream was enabled')
+    parser.add_argument('--snapshot', action='store_true', help='Read the columnar snapshot, rebuilding it when it is older than 24 hours')
+    parser.add_argument('--segments', type=int, default=4, help='Parallel scan segments used with --full-scan and --snapshot')
+    args = parser.parse_args()
+
+    # Los agregados solo reflejan lo que pasó por el stream (no hay backfill), por
+    # eso el scan completo sigue siendo el reporte por defecto
+    if args.aggregates:
+        print_report_from_aggregates()
+    elif args.snapshot:
+        print_report_from_snapshot(args.segments)
+    else:
+        print_report_from_scan(args.segments)